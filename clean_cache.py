@@ -0,0 +1,101 @@
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import pandas as pd
+import data_ingestion
+import data_cleaning
+import fuzzy_dedup
+
+# Cache em memória dos resultados da higienização, compartilhado entre as sessões do processo.
+# A chave junta o hash do upload, o perfil, as colunas essenciais, a distância e a versão do
+# código de limpeza; assim um rerun do Streamlit (ex: editar o nome do arquivo ou o título
+# do PDF) reaproveita o resultado em vez de limpar tudo de novo.
+CLEAN_RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Módulos cujo código define o resultado: qualquer alteração neles invalida o cache
+_CODE_MODULES = (data_ingestion, data_cleaning, fuzzy_dedup)
+
+_RESULTS = OrderedDict() # chave -> (resultado, bytes)
+_RESULTS_BYTES = 0
+# As sessões do Streamlit rodam em threads do mesmo processo
+_LOCK = threading.Lock()
+
+
+def _code_version():
+    digest = hashlib.blake2b(digest_size=8)
+    for module in _CODE_MODULES:
+        try:
+            with open(module.__file__, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(module.__name__.encode('utf-8'))
+    return digest.hexdigest()
+
+CLEANING_CODE_VERSION = _code_version()
+
+
+def clean_result_key(upload_key, essential_cols, distancia_padrao, profile_name=None):
+    """Chave do resultado da limpeza de um upload (ou None, se o upload não tem chave)."""
+    if upload_key is None:
+        return None
+    params = [upload_key, list(essential_cols), distancia_padrao, profile_name, CLEANING_CODE_VERSION]
+    return hashlib.blake2b(json.dumps(params).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _result_size(result):
+    """Memória aproximada do resultado: os DataFrames contados com o conteúdo dos textos."""
+    return sum(int(item.memory_usage(index=True, deep=True).sum()) for item in result if isinstance(item, pd.DataFrame))
+
+
+def _copy_result(result):
+    # Quem recebe o resultado pode alterar os DataFrames sem afetar a entrada do cache
+    return tuple(item.copy() if isinstance(item, pd.DataFrame) else item for item in result)
+
+
+def get_clean_result(key):
+    """Resultado guardado para a chave (os DataFrames são cópias), ou None."""
+    if key is None:
+        return None
+    with _LOCK:
+        entry = _RESULTS.get(key)
+        if entry is None:
+            return None
+        _RESULTS.move_to_end(key)
+    logging.info(f"[CLEAN_CACHE] Resultado reaproveitado ({key}).")
+    return _copy_result(entry[0])
+
+
+def put_clean_result(key, result, max_bytes=CLEAN_RESULT_CACHE_MAX_BYTES):
+    """Guarda o resultado (tupla) e remove os menos usados recentemente até caber em `max_bytes`.
+
+    Resultados maiores que o limite não são guardados. Retorna True se o resultado entrou no cache.
+    """
+    global _RESULTS_BYTES
+    if key is None:
+        return False
+    size = _result_size(result)
+    if size > max_bytes:
+        logging.info(f"[CLEAN_CACHE] Resultado de {size} bytes excede o limite; não guardado.")
+        return False
+    result = _copy_result(result)
+    with _LOCK:
+        previous = _RESULTS.pop(key, None)
+        if previous is not None:
+            _RESULTS_BYTES -= previous[1]
+        _RESULTS[key] = (result, size)
+        _RESULTS_BYTES += size
+        while _RESULTS_BYTES > max_bytes:
+            evicted, (_, evicted_size) = _RESULTS.popitem(last=False)
+            _RESULTS_BYTES -= evicted_size
+            logging.info(f"[CLEAN_CACHE] Resultado {evicted} removido do cache ({evicted_size} bytes).")
+    return True
+
+
+def clear_clean_results():
+    """Esvazia o cache de resultados."""
+    global _RESULTS_BYTES
+    with _LOCK:
+        _RESULTS.clear()
+        _RESULTS_BYTES = 0
@@ -1,7 +1,13 @@
+import os
+import re
 import pandas as pd
 import unicodedata
 import logging
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from stage_timing import timed_stage, summarize_stages
+from fuzzy_dedup import apply_fuzzy_dedup, FUZZY_DUPLICATE_COL
 
 # Ordem final das colunas de saída
 FIXED_OUTPUT_ORDER = [
@@ -9,6 +15,74 @@ FIXED_OUTPUT_ORDER = [
     "SOCIO1Nome", "SOCIO1Celular1", "SOCIO1Celular2"
 ]
 
+# Colunas essenciais para cada tipo de estrutura
+ASSERTIVA_ESSENTIAL_COLS = [
+    "Razao", "Logradouro", "Numero", "Bairro", "Cidade", "UF", "CEP",
+    "SOCIO1Nome", "SOCIO1Celular1", "SOCIO1Celular2"
+]
+
+LEMIT_ESSENTIAL_COLS = [
+    "NOME", "Whats", "CEL", "DDD", "FONE"
+]
+
+def _numbered(name, copies=3):
+    """Nome da coluna seguido das cópias numeradas que o pandas cria para cabeçalhos repetidos."""
+    return [name] + [f"{name}.{i}" for i in range(1, copies + 1)]
+
+# Mapeamento de nomes padrão para possíveis nomes de colunas de origem
+DEFAULT_COLUMN_ALIASES = {
+    "Razao": ["Razao", "RAZAO_SOCIAL", "NOME/RAZAO_SOCIAL", "Fantasia"],
+    "SOCIO1Nome": ["SOCIO1Nome", "NOME"],
+    "Logradouro": _numbered("Logradouro") + _numbered("FULL-LOGRADOURO"),
+    "Numero": _numbered("NUMERO"),
+    "Bairro": _numbered("BAIRRO"),
+    "Cidade": _numbered("CIDADE"),
+    "UF": _numbered("UF"),
+    "CNPJ": ["CNPJ", "CPF/CNPJ"],
+    "Whats": ["Whats", "WhatsApp", "Telefone", "Celular", "Contato"],
+    "CEL": ["CEL", "Celular", "Telefone", "Whats", "WhatsApp"],
+    "DDD": ["DDD", "TELEFONE_DDD", "FONE_DDD"],
+    "FONE": ["FONE", "TELEFONE_NUMERO", "FONE_NUMERO", "NUMERO_TELEFONE"]
+}
+
+# Colunas de celular da saída e se recebem o prefixo +55 na formatação final
+PHONE_OUTPUT_COLS = {"SOCIO1Celular1": True, "SOCIO1Celular2": False, "Whats": True, "CEL": False}
+
+# Tudo que não é dígito ASCII (limpeza vetorizada de telefones e documentos); `\D` manteria
+# dígitos Unicode (ex: fullwidth), que não formam telefones nem CPFs válidos
+_NON_DIGITS = re.compile(r'[^0-9]')
+# DDD + número de 8 ou 9 dígitos, já só com dígitos (formatação vetorizada de telefones)
+_PHONE_PARTS = re.compile(r'^(\d{2})(\d{4,5})(\d{4})$')
+
+# Campos de sócio e colunas SOCIO<n><campo> (SOCIO1Nome, SOCIO2Celular1, ...) usadas no fallback
+SOCIO_FIELDS = ["Nome", "Celular1", "Celular2", "CPF"]
+_SOCIO_COL = re.compile(r'^SOCIO(\d+)(' + '|'.join(SOCIO_FIELDS) + r')$')
+
+# Pesos dos dois dígitos verificadores (módulo 11) de CPF e CNPJ
+_CPF_WEIGHTS = (np.arange(10, 1, -1), np.arange(11, 1, -1))
+_CNPJ_WEIGHTS = (np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]), np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+
+# Prioridade das chaves de desduplicação (a primeira disponível no resultado é usada)
+DEFAULT_DEDUP_KEYS = [["CNPJ"], ["SOCIO1Celular1"], ["Whats"], ["Razao", "Logradouro"]]
+# Chave exata complementada pela detecção de quase-duplicatas (ver fuzzy_dedup) e o modo padrão
+FUZZY_DEDUP_KEY = ["Razao", "Logradouro"]
+DEFAULT_FUZZY_DEDUP = "collapse"
+
+# Planos de resolução de colunas guardados por perfil (um por assinatura de cabeçalho)
+COLUMN_PLAN_CACHE_MAX_ENTRIES = 64
+# Linhas inspecionadas antes da verificação completa de coluna vazia
+EMPTY_CHECK_SAMPLE_ROWS = 256
+
+# Modo paralelo: abaixo deste número de linhas o custo de enviar as partes aos processos
+# supera o ganho; o padrão de processos usa os núcleos disponíveis (no máximo 8)
+PARALLEL_MIN_ROWS = 50000
+PARALLEL_WORKERS = min(os.cpu_count() or 1, 8)
+
+# Perfis de estrutura (fornecedores de listas) na ordem em que são testados na detecção.
+# Novos fornecedores entram com `register_structure_profile`, sem alterar a limpeza.
+STRUCTURE_PROFILES = OrderedDict()
+_ADHOC_PROFILES = {}
+
 def normalize_colname(name):
     """Remove acentos, espaços e converte para minúsculas."""
     nfkd = unicodedata.normalize('NFKD', str(name))
@@ -55,259 +129,548 @@ def _format_phone_with_ddd(phone_str, include_country_code=False):
     else:
         return f"{ddd} {formatted_number}"
 
-def _is_valid_cpf(cpf_str):
-    """Valida se a string é um CPF de 11 dígitos (apenas números)."""
-    if pd.isna(cpf_str) or not isinstance(cpf_str, str):
-        return False
-    cleaned = ''.join(filter(str.isdigit, cpf_str))
-    return len(cleaned) == 11
-
-def identify_structure(df, ASSERTIVA_ESSENTIAL_COLS, LEMIT_ESSENTIAL_COLS):
-    """Identifica a estrutura do DataFrame (Assertiva ou Lemit)."""
-    norm_cols = {normalize_colname(col) for col in df.columns}
-    
-    # Contar quantas colunas essenciais de cada tipo estão presentes
-    assertiva_matches = sum(1 for col in ASSERTIVA_ESSENTIAL_COLS if normalize_colname(col) in norm_cols)
-    lemit_matches = sum(1 for col in LEMIT_ESSENTIAL_COLS if normalize_colname(col) in norm_cols)
-
-    # Decidir com base na contagem de correspondências
-    if lemit_matches > assertiva_matches:
-        return "Lemit"
+def _format_phone_series(values, include_country_code=False):
+    """Versão vetorizada de `_format_phone_with_ddd` para uma Series inteira.
+
+    Retorna "+55 DD XXXXX-XXXX" / "DD XXXX-XXXX" (ou sem o +55); valores nulos, que não sejam
+    texto ou sem 10/11 dígitos viram NaN, como na versão por valor.
+    """
+    values = values.astype(object)
+    text = values.where(values.map(lambda v: isinstance(v, str)))
+    if text.isna().all():
+        return pd.Series(np.nan, index=values.index)
+    parts = text.str.replace(_NON_DIGITS, '', regex=True).str.extract(_PHONE_PARTS)
+    formatted = parts[0] + " " + parts[1] + "-" + parts[2]
+    if include_country_code:
+        formatted = "+55 " + formatted
+    # Sem nenhum telefone válido a coluna fica float (só NaN), como com o `apply`
+    return formatted.infer_objects()
+
+def _digit_matrix(values, width):
+    """Matriz (n, width) com os dígitos de cada valor e a máscara das linhas com exatamente `width` dígitos.
+
+    Valores numéricos (lidos sem os zeros à esquerda) são completados com zeros; linhas
+    inválidas ficam zeradas na matriz.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        digits = values.round().astype('Int64').astype('string').str.zfill(width)
     else:
-        return "Assertiva"
+        digits = values.astype('string').str.replace(_NON_DIGITS, '', regex=True)
+    valid = (digits.str.len() == width).fillna(False).to_numpy(dtype=bool)
+    matrix = np.zeros((len(values), width), dtype=np.int64)
+    if valid.any():
+        raw = ''.join(digits[valid].tolist()).encode('ascii')
+        matrix[valid] = np.frombuffer(raw, dtype=np.uint8).reshape(-1, width) - ord('0')
+    return matrix, valid
+
+def _check_digits_match(matrix, valid, first_weights, second_weights):
+    """Confere os dois dígitos verificadores (módulo 11) de todas as linhas com produtos matriz-vetor."""
+    body = len(first_weights)
+    first = matrix[:, :body] @ first_weights % 11
+    first = np.where(first < 2, 0, 11 - first)
+    second = matrix[:, :body + 1] @ second_weights % 11
+    second = np.where(second < 2, 0, 11 - second)
+    # Sequências de um só dígito (000..., 111...) passam na conta, mas não são documentos
+    repeated = (matrix == matrix[:, :1]).all(axis=1)
+    return valid & ~repeated & (matrix[:, body] == first) & (matrix[:, body + 1] == second)
+
+def valid_cpf_mask(values):
+    """Máscara booleana (array) dos CPFs válidos da coluna: 11 dígitos e dígitos verificadores corretos."""
+    matrix, valid = _digit_matrix(values, 11)
+    return _check_digits_match(matrix, valid, *_CPF_WEIGHTS)
+
+def valid_cnpj_mask(values):
+    """Máscara booleana (array) dos CNPJs válidos da coluna: 14 dígitos e dígitos verificadores corretos."""
+    matrix, valid = _digit_matrix(values, 14)
+    return _check_digits_match(matrix, valid, *_CNPJ_WEIGHTS)
+
+# Chaves de desduplicação de coluna única que só identificam a linha quando o valor é válido
+DEDUP_KEY_VALIDATORS = {"CNPJ": valid_cnpj_mask}
+
+def _drop_key_duplicates(df, key):
+    """Remove as duplicatas pela chave, ou retorna None se a chave não se aplica a este DataFrame.
+
+    Chaves compostas bastam existir; uma chave de coluna única precisa de algum valor
+    preenchido e, se tiver validador (ex: CNPJ), só as linhas com valor válido são
+    comparadas entre si, pelos dígitos (as demais são mantidas).
+    """
+    if not all(col in df.columns for col in key):
+        return None
+    if len(key) == 1:
+        validator = DEDUP_KEY_VALIDATORS.get(key[0])
+        if validator is not None:
+            valid = validator(df[key[0]])
+            if not valid.any():
+                return None
+            # Compara só os dígitos: "11.222.333/0001-81" e "11222333000181" são a mesma empresa
+            digits = df[key[0]].astype('string').str.replace(_NON_DIGITS, '', regex=True)
+            return df[~(digits.duplicated(keep='first').to_numpy() & valid)]
+        if not bool(df[key[0]].notna().any()):
+            return None
+    return df.drop_duplicates(subset=key, keep='first')
+
+def build_structure_profile(name, essential_cols, detect_cols=None, aliases=None, phone_layout=None,
+                            phone_targets=None, socio_fallback=None, dedup_keys=None, output_order=None,
+                            fuzzy_dedup=DEFAULT_FUZZY_DEDUP):
+    """Monta um perfil de estrutura (dicionário) que descreve como ler e limpar uma lista.
+
+    - `detect_cols`: colunas que precisam estar no cabeçalho para o perfil ser reconhecido;
+    - `aliases`: nomes de origem aceitos para cada coluna padrão (sobrepõe DEFAULT_COLUMN_ALIASES);
+    - `phone_layout`: {"kind": "ddd_pairs", "ddd": ..., "numbers": [...], "slots": N} para DDD e número
+      em colunas separadas (DDD, DDD.1, ...) ou {"kind": "direct", "sources": {destino: origem}};
+    - `phone_targets`: colunas que recebem o 1º e o 2º telefone no layout "ddd_pairs";
+    - `dedup_keys` e `output_order`: chaves de desduplicação e colunas da saída final;
+    - `fuzzy_dedup`: quando a chave usada é Razao + Logradouro, "collapse" também remove as
+      quase-duplicatas, "flag" apenas as marca em FUZZY_DUPLICATE_COL e None fica só na exata.
+    Parâmetros omitidos seguem as regras usadas antes dos perfis, deduzidas de `essential_cols`.
+    """
+    essential_cols = list(essential_cols)
+    if phone_layout is None:
+        if "DDD" in essential_cols or "FONE" in essential_cols:
+            phone_layout = {"kind": "ddd_pairs", "ddd": "DDD", "numbers": ["FONE", "CEL"], "slots": 8}
+        else:
+            phone_layout = {"kind": "direct", "sources": {c: c for c in ("SOCIO1Celular1", "SOCIO1Celular2") if c in essential_cols}}
+    if phone_targets is None:
+        phone_targets = [
+            next((c for c in ("SOCIO1Celular1", "Whats") if c in essential_cols), None),
+            next((c for c in ("SOCIO1Celular2", "CEL") if c in essential_cols), None),
+        ]
+    return {
+        "name": name,
+        "essential_cols": essential_cols,
+        "detect_cols": list(detect_cols or essential_cols),
+        "aliases": {**DEFAULT_COLUMN_ALIASES, **(aliases or {})},
+        "phone_layout": phone_layout,
+        "phone_targets": phone_targets,
+        "socio_fallback": "SOCIO1Nome" in essential_cols if socio_fallback is None else socio_fallback,
+        "dedup_keys": dedup_keys or DEFAULT_DEDUP_KEYS,
+        "output_order": output_order or FIXED_OUTPUT_ORDER,
+        "fuzzy_dedup": fuzzy_dedup,
+        # Cache de `column_resolution_plan`, preenchido sob demanda
+        "column_plans": OrderedDict(),
+    }
 
-def clean_and_filter_data(df, essential_cols, distancia_padrao="100 km"):
+def register_structure_profile(name, essential_cols, **options):
+    """Registra (ou substitui) um perfil de estrutura; aceita as mesmas opções de `build_structure_profile`."""
+    profile = build_structure_profile(name, essential_cols, **options)
+    STRUCTURE_PROFILES[name] = profile
+    return profile
+
+def get_structure_profile(name):
+    """Retorna o perfil registrado com esse nome, ou None."""
+    return STRUCTURE_PROFILES.get(name)
+
+def match_structure_profile(columns):
+    """Reconhece o perfil a partir apenas dos nomes das colunas (o cabeçalho), ou retorna None."""
+    norm_cols = {normalize_colname(col) for col in columns}
+    for profile in STRUCTURE_PROFILES.values():
+        if all(normalize_colname(col) in norm_cols for col in profile["detect_cols"]):
+            return profile
+    return None
+
+def profile_for_essential_cols(essential_cols):
+    """Perfil registrado com exatamente essas colunas essenciais, ou um perfil ad hoc deduzido delas."""
+    for profile in STRUCTURE_PROFILES.values():
+        if profile["essential_cols"] == list(essential_cols):
+            return profile
+    # Perfis ad hoc são reaproveitados para que seus planos de colunas fiquem em cache
+    key = tuple(essential_cols)
+    if key not in _ADHOC_PROFILES:
+        _ADHOC_PROFILES[key] = build_structure_profile("Personalizada", essential_cols)
+    return _ADHOC_PROFILES[key]
+
+def column_resolution_plan(profile, columns, essential_cols=None):
+    """Plano de resolução de colunas do perfil para um cabeçalho, calculado uma vez por assinatura.
+
+    O plano traz, para cada coluna essencial, as colunas de origem candidatas presentes no
+    cabeçalho (aliases e variações numeradas, base primeiro) e os pares DDD/número do layout
+    de telefones. Arquivos seguintes com o mesmo cabeçalho reaproveitam o plano.
+    """
+    essential_cols = list(essential_cols or profile["essential_cols"])
+    signature = (tuple(essential_cols), tuple(map(str, columns)))
+    plans = profile["column_plans"]
+    plan = plans.get(signature)
+    if plan is not None:
+        plans.move_to_end(signature)
+        return plan
+
+    present = set(signature[1])
+    candidates = []
+    for std_col in essential_cols:
+        sources = [col for col in profile["aliases"].get(std_col, [std_col]) if col in present]
+        sources.sort(key=lambda x: (len(x), x)) # Base primeiro, depois as numeradas
+        candidates.append((std_col, sources))
+
+    phone_pairs = []
+    layout = profile["phone_layout"]
+    if layout["kind"] == "ddd_pairs":
+        for i in range(layout["slots"]):
+            ddd_col = f"{layout['ddd']}.{i}" if i > 0 else layout["ddd"]
+            for number_base in layout["numbers"]:
+                number_col = f"{number_base}.{i}" if i > 0 else number_base
+                if number_col in present:
+                    phone_pairs.append((ddd_col if ddd_col in present else None, number_col))
+
+    plan = {"candidates": candidates, "phone_pairs": phone_pairs}
+    plans[signature] = plan
+    if len(plans) > COLUMN_PLAN_CACHE_MAX_ENTRIES:
+        plans.popitem(last=False)
+    return plan
+
+def _column_has_data(values):
+    """Equivale a `values.astype(str).str.strip().any()` sem converter a coluna inteira para texto.
+
+    Nulos e valores que não são texto viram textos não vazios ('nan', '1.0', ...), então
+    só uma coluna de textos vazios ou em branco conta como vazia. As primeiras linhas são
+    verificadas antes, o que resolve quase todas as colunas preenchidas.
+    """
+    if len(values) == 0:
+        return False
+    if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+        return True # Números, datas e categorias sempre têm representação textual
+    for part in (values.iloc[:EMPTY_CHECK_SAMPLE_ROWS], values):
+        if part.isna().any():
+            return True
+        try:
+            lengths = part.str.len()
+        except AttributeError: # Coluna object sem nenhum texto
+            return True
+        if lengths.isna().any(): # Algum valor não é texto
+            return True
+        filled = part[lengths > 0]
+        if len(filled) and bool(filled.str.strip().ne('').any()):
+            return True
+    return False
+
+def profile_source_columns(profile, header_columns):
+    """Colunas do cabeçalho que o plano de limpeza do perfil lê (as demais não precisam ser carregadas)."""
+    wanted = set()
+    for std_col in profile["essential_cols"]:
+        wanted.update(profile["aliases"].get(std_col, [std_col]))
+    layout = profile["phone_layout"]
+    if layout["kind"] == "ddd_pairs":
+        for base in [layout["ddd"]] + layout["numbers"]:
+            wanted.update(f"{base}.{i}" if i > 0 else base for i in range(layout["slots"]))
+    else:
+        wanted.update(layout["sources"].values())
+    if profile["socio_fallback"]:
+        wanted.update(col for col in header_columns if _SOCIO_COL.match(str(col)))
+    return [col for col in header_columns if col in wanted]
+
+register_structure_profile(
+    "Assertiva", ASSERTIVA_ESSENTIAL_COLS,
+    dedup_keys=[["CNPJ"], ["SOCIO1Celular1"], ["Razao", "Logradouro"]],
+)
+register_structure_profile(
+    "Lemit", LEMIT_ESSENTIAL_COLS,
+    phone_layout={"kind": "ddd_pairs", "ddd": "DDD", "numbers": ["FONE", "CEL"], "slots": 8},
+    phone_targets=["Whats", "CEL"],
+    dedup_keys=[["CNPJ"], ["Whats"], ["Razao", "Logradouro"]],
+    output_order=["NOME", "Whats", "CEL"],
+)
+
+def _clean_phone_series(values):
+    """Versão vetorizada de `_clean_phone_number`: só os dígitos; vazio para valores nulos ou ''."""
+    values = values.astype(object)
+    text = values.astype(str)
+    return text.str.replace(_NON_DIGITS, '', regex=True).where(values.notna() & (text != ''), "")
+
+def _stripped_text(df, col):
+    """Coluna como texto (`str(valor).strip()`, inclusive 'nan' para nulos), ou None se não existir."""
+    if col not in df.columns:
+        return None
+    return df[col].astype(object).astype(str).str.strip()
+
+def _resolve_ddd_phones(df, layout, phone_pairs=None):
+    """Resolve os dois primeiros telefones de cada linha no layout DDD + número, sem iterar linhas.
+
+    Os grupos DDD/FONE/CEL, DDD.1/FONE.1/CEL.1, ... são empilhados lado a lado, na ordem em
+    que seriam visitados linha a linha: cada número não vazio é um candidato (com o DDD na
+    frente, quando houver). Os dois primeiros candidatos de cada linha são escolhidos de uma
+    vez e limpos (apenas dígitos). Retorna duas Series, com NaN onde não houver candidato.
+    `phone_pairs` (pares DDD/número presentes) vem do plano de colunas; sem ele, é calculado aqui.
+    """
+    if phone_pairs is None:
+        phone_pairs = [
+            (f"{layout['ddd']}.{i}" if i > 0 else layout["ddd"], f"{number_base}.{i}" if i > 0 else number_base)
+            for i in range(layout["slots"]) for number_base in layout["numbers"]
+        ]
+    candidates = []
+    ddd_texts = {}
+    for ddd_col, number_col in phone_pairs:
+        number = _stripped_text(df, number_col)
+        if number is None:
+            continue
+        if ddd_col not in ddd_texts:
+            ddd_texts[ddd_col] = _stripped_text(df, ddd_col) if ddd_col is not None else None
+        ddd = ddd_texts[ddd_col]
+        # Combina com o DDD; sem DDD, o número deve vir completo
+        combined = number if ddd is None else (ddd + number).where(ddd != '', number)
+        candidates.append(combined.where(number != ''))
+
+    if not candidates:
+        empty = pd.Series(np.nan, index=df.index, dtype=object)
+        return empty, empty.copy()
+
+    values = np.column_stack([c.to_numpy(dtype=object) for c in candidates])
+    valid = np.column_stack([c.notna().to_numpy() for c in candidates])
+    rank = valid.cumsum(axis=1)
+    rows = np.arange(len(df))
+
+    def _nth(n):
+        hit = valid & (rank == n)
+        picked = values[rows, hit.argmax(axis=1)]
+        picked[~hit.any(axis=1)] = np.nan
+        return pd.Series(picked, index=df.index, dtype=object).str.replace(_NON_DIGITS, '', regex=True)
+
+    return _nth(1), _nth(2)
+
+def _socio_numbers(columns):
+    """Números dos sócios (1, 2, ..., n) presentes nas colunas, em ordem crescente."""
+    return sorted({int(m.group(1)) for m in map(_SOCIO_COL.match, map(str, columns)) if m})
+
+def _socio_field_valid(field, values):
+    """Máscara de valores válidos de um campo de sócio: não nulo, não vazio e, para CPF, com dígitos verificadores corretos."""
+    values = values.astype(object)
+    text = values.astype(str)
+    valid = values.notna() & (text.str.strip() != "")
+    if field == "CPF":
+        valid &= valid_cpf_mask(text)
+    return valid
+
+def _socio_values(df_processed, df, number, field):
+    """Valores do campo `field` do sócio `number`, já no formato da saída (ou None se a coluna não existir).
+
+    O sócio 1 vem do DataFrame processado (celulares já formatados); os demais vêm da planilha
+    original e têm os celulares limpos e formatados da mesma forma.
+    """
+    target = f"SOCIO1{field}"
+    if number == 1 and target in df_processed.columns:
+        return df_processed[target]
+    col = f"SOCIO{number}{field}"
+    if col not in df.columns:
+        return None
+    values = df[col]
+    if target in PHONE_OUTPUT_COLS:
+        values = _format_phone_series(_clean_phone_series(values), include_country_code=PHONE_OUTPUT_COLS[target])
+    return values
+
+def _resolve_socios(df_processed, df):
+    """Fallback de sócios por máscaras, com SOCIO1..SOCIOn.
+
+    Para cada campo (nome, celulares, CPF), SOCIO1<campo> recebe o primeiro valor válido entre
+    os sócios 1, 2, ..., n (NaN se nenhum for válido). Linhas sem nenhum campo válido em nenhum
+    sócio são removidas de uma vez.
+    """
+    numbers = sorted(set(_socio_numbers(df.columns)) | {1})
+    any_valid = pd.Series(False, index=df_processed.index)
+    for field in SOCIO_FIELDS:
+        resolved = pd.Series(np.nan, index=df_processed.index, dtype=object)
+        pending = pd.Series(True, index=df_processed.index)
+        for number in numbers:
+            values = _socio_values(df_processed, df, number, field)
+            if values is None:
+                continue
+            valid = _socio_field_valid(field, values).reindex(df_processed.index, fill_value=False)
+            take = pending & valid
+            if take.any():
+                resolved[take] = values.reindex(df_processed.index)[take].astype(object)
+                if number > 1:
+                    logging.info(f"[FALLBACK] SOCIO1{field}: {int(take.sum())} linhas usando SOCIO{number}{field}.")
+            pending &= ~valid
+        any_valid |= ~pending
+        df_processed[f"SOCIO1{field}"] = resolved.infer_objects()
+
+    if not any_valid.all():
+        logging.info(f"Removidas {int((~any_valid).sum())} linhas sem sócios válidos após fallbacks.")
+        df_processed = df_processed[any_valid].copy()
+    return df_processed
+
+def identify_structure(df, ASSERTIVA_ESSENTIAL_COLS=None, LEMIT_ESSENTIAL_COLS=None):
+    """Identifica a estrutura do DataFrame pelo perfil registrado que casa com suas colunas.
+
+    Os parâmetros de colunas essenciais são ignorados (mantidos por compatibilidade).
+    """
+    profile = match_structure_profile(df.columns)
+    return profile["name"] if profile else "Desconhecida"
+
+def clean_and_filter_data(df, essential_cols, distancia_padrao="100 km", profile=None, report=False, workers=None):
+    """Limpa e filtra a lista segundo o plano do perfil de estrutura.
+
+    Sem `profile`, usa o perfil registrado com essas `essential_cols` (ou um deduzido delas).
+    Com `report=True`, retorna também uma lista com tempo, linhas e variação de memória
+    de cada etapa (ver `stage_timing`). Com `workers` > 1 e ao menos PARALLEL_MIN_ROWS
+    linhas, as etapas linha a linha rodam em processos (ver `_clean_rows_parallel`).
+    """
+    stages = [] if report else None
     if df.empty:
         logging.warning("DataFrame de entrada está vazio.")
         print("DEBUG: clean_and_filter_data returning (empty df, empty missing, Unknown structure) - df.empty path")
-        return pd.DataFrame(), [], "Unknown"
-
-    # A estrutura agora é passada como argumento ou detectada em load_data
-    # Removendo a chamada identify_structure(df) daqui
-    # structure = identify_structure(df)
-    # logging.info(f"Estrutura de dados identificada: {structure}")
-
-    df_processed = pd.DataFrame()
-
-    # Mapeamento de nomes padrão para possíveis nomes de colunas de origem
-    MAPPING = {
-        "Razao": ["Razao", "RAZAO_SOCIAL", "NOME/RAZAO_SOCIAL", "Fantasia"],
-        "SOCIO1Nome": ["SOCIO1Nome", "NOME"],
-        "Logradouro": ["Logradouro", "FULL_LOGRADOURO", "Endereco", "ENDERECO_COMPLETO"],
-        "Numero": ["Numero", "NUMERO"],
-        "Bairro": ["Bairro", "BAIRRO"],
-        "Cidade": ["Cidade", "CIDADE"],
-        "UF": ["UF", "ESTADO"],
-        "CNPJ": ["CNPJ", "CPF/CNPJ"],
-        "Whats": ["Whats", "WhatsApp", "Telefone", "Celular", "Contato"],
-        "CEL": ["CEL", "Celular", "Telefone", "Whats", "WhatsApp"],
-        "DDD": ["DDD", "TELEFONE_DDD", "FONE_DDD"],
-        "FONE": ["FONE", "TELEFONE_NUMERO", "FONE_NUMERO", "NUMERO_TELEFONE"]
-    }
-
-    # Constrói o DataFrame processado de forma segura, coluna por coluna
-    for std_col in essential_cols:
-        source_options = MAPPING.get(std_col, [std_col]) # Usa o nome da coluna essencial como fallback
-        found_valid_col = False
-        
-        # Para colunas como Logradouro, Numero, Bairro, Cidade, UF, procure por variações com sufixos numéricos
-        potential_source_cols = []
-        if std_col == "Logradouro":
-            potential_source_cols = [col for col in ["Logradouro", "FULL-LOGRADOURO", "Logradouro.1", "FULL-LOGRADOURO.1", "Logradouro.2", "FULL-LOGRADOURO.2", "Logradouro.3", "FULL-LOGRADOURO.3"] if col in df.columns]
-        elif std_col == "Numero":
-            potential_source_cols = [col for col in ["NUMERO", "NUMERO.1", "NUMERO.2", "NUMERO.3"] if col in df.columns]
-        elif std_col == "Bairro":
-            potential_source_cols = [col for col in ["BAIRRO", "BAIRRO.1", "BAIRRO.2", "BAIRRO.3"] if col in df.columns]
-        elif std_col == "Cidade":
-            potential_source_cols = [col for col in ["CIDADE", "CIDADE.1", "CIDADE.2", "CIDADE.3"] if col in df.columns]
-        elif std_col == "UF":
-            potential_source_cols = [col for col in ["UF", "UF.1", "UF.2", "UF.3"] if col in df.columns]
-        else:
-            potential_source_cols = [col for col in source_options if col in df.columns]
-
-        # Ensure the order is maintained (base first, then numbered)
-        potential_source_cols.sort(key=lambda x: (len(x), x))
+        return (pd.DataFrame(), [], "Unknown", stages) if report else (pd.DataFrame(), [], "Unknown")
 
+    profile = profile or profile_for_essential_cols(essential_cols)
+    parallel = bool(workers and workers > 1 and len(df) >= PARALLEL_MIN_ROWS)
+    if parallel:
+        df_processed = _clean_rows_parallel(df, essential_cols, profile, workers, stages)
+    else:
+        df_processed = _clean_rows(df, essential_cols, profile, stages)
+    result = _finalize_output(df_processed, essential_cols, profile, stages)
+    if report:
+        # No modo paralelo há um registro por processo para cada etapa
+        return result + (summarize_stages(stages) if parallel else stages,)
+    return result
+
+def clean_and_filter_data_chunked(chunks, essential_cols, distancia_padrao="100 km", profile=None, report=False):
+    """Versão por blocos de `clean_and_filter_data` para arquivos grandes.
+
+    Recebe um iterável de DataFrames (ex: `load_data(..., chunksize=...)`), aplica
+    as etapas linha a linha em cada bloco e descarta o bloco bruto em seguida.
+    A desduplicação global, a projeção e a ordenação rodam uma única vez no final,
+    sobre o resultado já reduzido, produzindo a mesma saída do modo em memória.
+    Com `report=True`, o relatório de etapas soma os tempos de todos os blocos.
+    """
+    stages = [] if report else None
+    profile = profile or profile_for_essential_cols(essential_cols)
+    # Se a chave de maior prioridade se aplica a um bloco, ela se aplica ao todo e será a chave
+    # final de desduplicação; dá para reduzir cada bloco desde já.
+    first_key = profile["dedup_keys"][0]
+    processed_chunks = []
+    for chunk in chunks:
+        if chunk is None or chunk.empty:
+            continue
+        df_chunk = _clean_rows(chunk, essential_cols, profile, stages)
+        reduced = _drop_key_duplicates(df_chunk, first_key)
+        if reduced is not None:
+            df_chunk = reduced
+        processed_chunks.append(df_chunk)
+        logging.info(f"[CHUNK] Bloco processado: {len(chunk)} linhas de entrada, {len(df_chunk)} mantidas.")
+
+    if not processed_chunks:
+        logging.warning("Nenhum bloco com dados recebido para limpeza.")
+        return (pd.DataFrame(), [], "Unknown", stages) if report else (pd.DataFrame(), [], "Unknown")
+
+    df_processed = pd.concat(processed_chunks)
+    del processed_chunks
+    result = _finalize_output(df_processed, essential_cols, profile, stages)
+    return result + (summarize_stages(stages),) if report else result
+
+def _mapped_sources(df, plan):
+    """Coluna de origem escolhida para cada coluna essencial: a primeira candidata com algum valor (ou None)."""
+    sources = []
+    for std_col, potential_source_cols in plan["candidates"]:
+        chosen = None
         for source_col in potential_source_cols:
-            if source_col in df.columns:
-                col_data = df[source_col].astype(str).str.strip()
-                logging.debug(f"[DEBUG_MAP] Coluna '{std_col}': Tentando '{source_col}'. Conteúdo (primeiras 5): {col_data.head().tolist()}. Any non-empty: {col_data.any()}")
-                # Check if the column has any non-null/non-empty values (after stripping whitespace)
-                if col_data.any():
-                    df_processed[std_col] = df[source_col]
-                    found_valid_col = True
-                    logging.info(f"Coluna '{std_col}' mapeada de '{source_col}' com dados.")
-                    break # Pega a primeira correspondência com dados e vai para a próxima coluna padrão
-                else:
-                    logging.warning(f"Coluna '{source_col}' encontrada para '{std_col}' mas está vazia. Tentando outras opções...")
-        if not found_valid_col:
+            # Pega a primeira candidata com algum valor não vazio
+            if _column_has_data(df[source_col]):
+                chosen = source_col
+                logging.info(f"Coluna '{std_col}' mapeada de '{source_col}' com dados.")
+                break
+            logging.warning(f"Coluna '{source_col}' encontrada para '{std_col}' mas está vazia. Tentando outras opções...")
+        if chosen is None:
             logging.warning(f"Nenhuma coluna válida encontrada para '{std_col}' entre as opções: {potential_source_cols}. Definindo como NaN.")
-            df_processed[std_col] = np.nan
+        sources.append((std_col, chosen))
+    return sources
+
+def _clean_rows(df, essential_cols, profile, stages=None, sources=None):
+    """Executa as etapas linha a linha (mapeamento, telefones, fallback de sócios).
+
+    Não faz desduplicação nem ordenação, para que possa ser aplicada bloco a bloco.
+    Cada etapa é registrada em `stages` (se informado). `sources` fixa as colunas de origem
+    (ver `_mapped_sources`); sem ele, a escolha é feita sobre este DataFrame.
+    """
+    # A estrutura é detectada em load_data (pelo cabeçalho) e chega aqui como perfil
+    plan = column_resolution_plan(profile, df.columns, essential_cols)
+
+    with timed_stage(stages, "Mapeamento de colunas", len(df)) as stage:
+        if sources is None:
+            sources = _mapped_sources(df, plan)
+        df_processed = pd.DataFrame()
+        # Constrói o DataFrame processado coluna por coluna, seguindo o plano do cabeçalho
+        for std_col, source_col in sources:
+            df_processed[std_col] = df[source_col] if source_col is not None else np.nan
+        stage["rows_out"] = len(df_processed)
+
+    logging.debug("DataFrame após mapeamento inicial de colunas:")
+    logging.debug(df_processed.head())
+
+    with timed_stage(stages, "Resolução de telefones", len(df_processed)) as stage:
+        # Inicializa colunas de celular como string para evitar FutureWarnings
+        # Apenas inicializa se elas estiverem nas essential_cols
+        for phone_col in PHONE_OUTPUT_COLS:
+            if phone_col in essential_cols:
+                df_processed[phone_col] = ""
+
+        # --- Lógica dedicada para os telefones, conforme o layout do perfil ---
+        layout = profile["phone_layout"]
+        first_target, second_target = profile["phone_targets"]
+
+        if layout["kind"] == "ddd_pairs":
+            # Até 2 números por linha combinando DDD e FONE/CEL, resolvidos coluna a coluna
+            first_phone, second_phone = _resolve_ddd_phones(df, layout, plan["phone_pairs"])
+            if first_target:
+                df_processed[first_target] = first_phone.fillna("")
+            if second_target:
+                df_processed[second_target] = second_phone.fillna("")
+
+        else: # Layout direto: cada celular vem em uma coluna própria
+            for target_col, source_col in layout["sources"].items():
+                if source_col in df.columns:
+                    df_processed[target_col] = _clean_phone_series(df[source_col])
+                else:
+                    df_processed[target_col] = ""
+        stage["rows_out"] = len(df_processed)
 
-    logging.info("DataFrame após mapeamento inicial de colunas:")
-    logging.info(df_processed.head())
-    
-    # Inicializa colunas de celular como string para evitar FutureWarnings
-    # Apenas inicializa se elas estiverem nas essential_cols
-    if "SOCIO1Celular1" in essential_cols:
-        df_processed["SOCIO1Celular1"] = ""
-    if "SOCIO1Celular2" in essential_cols:
-        df_processed["SOCIO1Celular2"] = ""
-    if "Whats" in essential_cols:
-        df_processed["Whats"] = ""
-    if "CEL" in essential_cols:
-        df_processed["CEL"] = ""
-
-    # --- Lógica dedicada para SOCIO1Celular1 e SOCIO1Celular2 / DDD/FONE/Whats/CEL ---
-
-    # Prioriza a combinação DDD + FONE/CEL para Lemit, ou usa colunas diretas para Assertiva
-    # A lógica de detecção de estrutura foi movida para load_data, então precisamos do structure_type aqui
-    # Para simplificar, vamos assumir que se essential_cols contém DDD/FONE, é Lemit-like
-    is_lemit_like = "DDD" in essential_cols or "FONE" in essential_cols
-
-    if is_lemit_like:
-        # Tenta encontrar até 2 números de telefone válidos combinando DDD e FONE/CEL
-        for index, row in df.iterrows():
-            valid_phones = []
-            # Itera sobre as possíveis combinações de DDD e FONE/CEL
-            for i in range(8): # DDD, DDD.1, ..., DDD.7 e FONE, FONE.1, ..., FONE.7
-                ddd_col = f"DDD.{i}" if i > 0 else "DDD"
-                fone_col = f"FONE.{i}" if i > 0 else "FONE"
-                cel_col = f"CEL.{i}" if i > 0 else "CEL"
-
-                ddd_val = str(row.get(ddd_col, '')).strip()
-                fone_val = str(row.get(fone_col, '')).strip()
-                cel_val = str(row.get(cel_col, '')).strip()
-
-                logging.debug(f"[DEBUG] Linha {index}, Tentando cols: DDD={ddd_col} ({ddd_val}), FONE={fone_col} ({fone_val}), CEL={cel_col} ({cel_val})")
-
-                # Tenta combinar DDD com FONE
-                if ddd_val and fone_val:
-                    combined_phone = ddd_val + fone_val
-                    cleaned_phone = _clean_phone_number(combined_phone)
-                    logging.debug(f"[DEBUG] Combinado DDD+FONE: {combined_phone}, Limpo: {cleaned_phone}")
-                    if pd.notna(cleaned_phone):
-                        valid_phones.append(cleaned_phone)
-                
-                # Tenta combinar DDD com CEL
-                if ddd_val and cel_val:
-                    combined_phone = ddd_val + cel_val
-                    cleaned_phone = _clean_phone_number(combined_phone)
-                    logging.debug(f"[DEBUG] Combinado DDD+CEL: {combined_phone}, Limpo: {cleaned_phone}")
-                    if pd.notna(cleaned_phone):
-                        valid_phones.append(cleaned_phone)
-
-                # Se FONE ou CEL vierem sozinhos e forem válidos (já com DDD)
-                if not ddd_val and fone_val:
-                    cleaned_phone = _clean_phone_number(fone_val)
-                    logging.debug(f"[DEBUG] FONE sozinho: {fone_val}, Limpo: {cleaned_phone}")
-                    if pd.notna(cleaned_phone):
-                        valid_phones.append(cleaned_phone)
-                if not ddd_val and cel_val:
-                    cleaned_phone = _clean_phone_number(cel_val)
-                    logging.debug(f"[DEBUG] CEL sozinho: {cel_val}, Limpo: {cleaned_phone}")
-                    if pd.notna(cleaned_phone):
-                        valid_phones.append(cleaned_phone)
-
-                if len(valid_phones) >= 2: # Já encontrou 2, pode parar de procurar para esta linha
-                    break
-            
-            # Atribui os telefones encontrados
-            if len(valid_phones) > 0:
-                if "SOCIO1Celular1" in essential_cols:
-                    df_processed.at[index, "SOCIO1Celular1"] = valid_phones[0]
-                elif "Whats" in essential_cols: # Para Lemit, Whats é o principal
-                    df_processed.at[index, "Whats"] = valid_phones[0]
-
-            if len(valid_phones) > 1:
-                if "SOCIO1Celular2" in essential_cols:
-                    df_processed.at[index, "SOCIO1Celular2"] = valid_phones[1]
-                elif "CEL" in essential_cols: # Para Lemit, CEL é o secundário
-                    df_processed.at[index, "CEL"] = valid_phones[1]
-
-    else: # Estrutura Assertiva ou desconhecida, usa as colunas diretas
-        for index, row in df.iterrows():
-            if "SOCIO1Celular1" in essential_cols:
-                s1_cel1 = row.get("SOCIO1Celular1", np.nan)
-                df_processed.at[index, "SOCIO1Celular1"] = _clean_phone_number(s1_cel1)
-            
-            if "SOCIO1Celular2" in essential_cols:
-                s1_cel2 = row.get("SOCIO1Celular2", np.nan)
-                df_processed.at[index, "SOCIO1Celular2"] = _clean_phone_number(s1_cel2)
-
-    logging.info("DataFrame após tratamento de telefones dedicados:")
-    logging.info(df_processed.head())
+    logging.debug("DataFrame após tratamento de telefones dedicados:")
+    logging.debug(df_processed.head())
 
     # --- Aplica a formatação final dos números de celular ---
-    if "SOCIO1Celular1" in essential_cols:
-        df_processed["SOCIO1Celular1"] = df_processed["SOCIO1Celular1"].apply(lambda x: _format_phone_with_ddd(x, include_country_code=True))
-    if "SOCIO1Celular2" in essential_cols:
-        df_processed["SOCIO1Celular2"] = df_processed["SOCIO1Celular2"].apply(lambda x: _format_phone_with_ddd(x, include_country_code=False))
-    if "Whats" in essential_cols:
-        df_processed["Whats"] = df_processed["Whats"].apply(lambda x: _format_phone_with_ddd(x, include_country_code=True))
-    if "CEL" in essential_cols:
-        df_processed["CEL"] = df_processed["CEL"].apply(lambda x: _format_phone_with_ddd(x, include_country_code=False))
-
-    logging.info("DataFrame após formatação final dos celulares:")
-    logging.info(df_processed.head())
-
-    # --- Lógica de Fallback para Sócios (apenas para Assertiva-like) ---
-    # Se as colunas de sócio estiverem nas essential_cols, aplica a lógica de fallback
-    if "SOCIO1Nome" in essential_cols:
-        SOCIO_FIELDS = [
-            ("Nome", "SOCIO1Nome", "SOCIO2Nome"),
-            ("Celular1", "SOCIO1Celular1", "SOCIO2Celular1"),
-            ("Celular2", "SOCIO1Celular2", "SOCIO2Celular2"),
-            ("CPF", "SOCIO1CPF", "SOCIO2CPF")
-        ]
-
-        def _is_field_valid(field_name, value):
-            if pd.isna(value) or str(value).strip() == "":
-                return False
-            if field_name == "CPF":
-                return _is_valid_cpf(str(value))
-            return True
-
-        rows_to_drop = []
-        for index, row in df_processed.iterrows():
-            socio1_has_any_valid_data = False
-            
-            for field_name, s1_col, s2_col in SOCIO_FIELDS:
-                s1_val = row.get(s1_col, np.nan)
-                s2_val = row.get(s2_col, np.nan)
-
-                s1_valid = _is_field_valid(field_name, s1_val)
-                s2_valid = _is_field_valid(field_name, s2_val)
-
-                if not s1_valid:
-                    if s2_valid:
-                        df_processed.at[index, s1_col] = s2_val
-                        logging.info(f"[FALLBACK] {s1_col} inválido para linha {index}. Usando {s2_col} ({s2_val}).")
-                        socio1_has_any_valid_data = True
-                    else:
-                        df_processed.at[index, s1_col] = np.nan # Marcar como NaN se nenhum for válido
-                        logging.warning(f"[FALLBACK] {s1_col} e {s2_col} inválidos/ausentes para linha {index}. Definido {s1_col} como NaN.")
-                else:
-                    socio1_has_any_valid_data = True
-            
-            # After checking all fields, decide if the row should be dropped
-            if not socio1_has_any_valid_data:
-                logging.error(f"[ERRO] Nenhum sócio com dados válidos encontrado para linha {index} após fallbacks. Marcando para remoção.")
-                rows_to_drop.append(index)
-        
-        if rows_to_drop:
-            df_processed.drop(rows_to_drop, inplace=True)
-            logging.info(f"Removidas {len(rows_to_drop)} linhas sem sócios válidos após fallbacks.")
-
-        # Remover colunas SOCIO2* após o fallback
-        cols_to_drop_socio2 = [col for col in df_processed.columns if col.startswith("SOCIO2")]
-        if cols_to_drop_socio2:
-            df_processed.drop(columns=cols_to_drop_socio2, inplace=True)
-            logging.info(f"Colunas SOCIO2 removidas: {cols_to_drop_socio2}")
-
-        logging.info("DataFrame após tratamento de telefone e fallback de sócios:")
-        logging.info(df_processed.head())
-
+    with timed_stage(stages, "Formatação de telefones", len(df_processed)) as stage:
+        for phone_col, country_code in PHONE_OUTPUT_COLS.items():
+            if phone_col in essential_cols:
+                df_processed[phone_col] = _format_phone_series(df_processed[phone_col], include_country_code=country_code)
+        stage["rows_out"] = len(df_processed)
+
+    logging.debug("DataFrame após formatação final dos celulares:")
+    logging.debug(df_processed.head())
+
+    # --- Lógica de Fallback para Sócios (perfis com sócios, como a Assertiva) ---
+    if profile["socio_fallback"]:
+        with timed_stage(stages, "Fallback de sócios", len(df_processed)) as stage:
+            df_processed = _resolve_socios(df_processed, df)
+            stage["rows_out"] = len(df_processed)
+        logging.debug("DataFrame após tratamento de telefone e fallback de sócios:")
+        logging.debug(df_processed.head())
+
+    return df_processed
+
+def _clean_rows_worker(df, essential_cols, profile, sources, report):
+    """Executa `_clean_rows` em um processo do pool; retorna (parte processada, etapas)."""
+    stages = [] if report else None
+    return _clean_rows(df, essential_cols, profile, stages, sources), stages
+
+def _clean_rows_parallel(df, essential_cols, profile, workers, stages=None):
+    """Etapas linha a linha em `workers` processos, cada um com uma faixa contígua de linhas.
+
+    As colunas de origem são escolhidas antes sobre o DataFrame inteiro (uma faixa pode ter
+    uma coluna vazia que no todo tem dados) e as partes voltam na ordem das faixas, então a
+    concatenação é idêntica ao resultado serial. Os tempos das etapas somam todos os processos.
+    """
+    plan = column_resolution_plan(profile, df.columns, essential_cols)
+    sources = _mapped_sources(df, plan)
+    bounds = np.linspace(0, len(df), workers + 1).astype(int)
+    parts = [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+    with ProcessPoolExecutor(max_workers=len(parts)) as pool:
+        results = list(pool.map(_clean_rows_worker, parts, [essential_cols] * len(parts), [profile] * len(parts),
+                                [sources] * len(parts), [stages is not None] * len(parts)))
+    if stages is not None:
+        for _, part_stages in results:
+            stages.extend(part_stages)
+    logging.info(f"[PARALLEL] {len(df)} linhas limpas em {len(parts)} processos.")
+    return pd.concat([part for part, _ in results])
+
+def _finalize_output(df_processed, essential_cols, profile, stages=None):
+    """Desduplica, limpa os textos, projeta e ordena o DataFrame já processado."""
     # --- Bloco de Limpeza e Seleção (Unificado) ---
     
     # Garante que todas as colunas essenciais existam
@@ -315,33 +678,42 @@ def clean_and_filter_data(df, essential_cols, distancia_padrao="100 km"):
         if col not in df_processed.columns:
             df_processed[col] = ""
 
-    # Remove duplicatas com base na prioridade
-    if "CNPJ" in df_processed.columns and bool(df_processed["CNPJ"].notna().any()):
-        df_processed.drop_duplicates(subset=["CNPJ"], keep='first', inplace=True)
-    elif "SOCIO1Celular1" in df_processed.columns and bool(df_processed["SOCIO1Celular1"].notna().any()):
-        df_processed.drop_duplicates(subset=["SOCIO1Celular1"], keep='first', inplace=True)
-    elif "Whats" in df_processed.columns and bool(df_processed["Whats"].notna().any()):
-        df_processed.drop_duplicates(subset=["Whats"], keep='first', inplace=True)
-    elif "Razao" in df_processed.columns and "Logradouro" in df_processed.columns:
-        df_processed.drop_duplicates(subset=["Razao", "Logradouro"], keep='first', inplace=True)
-
-    # Limpeza final das colunas de texto
-    for col in ["Razao", "Logradouro", "Bairro", "Cidade", "UF", "SOCIO1Nome", "NOME", "Whats", "CEL"]:
-        if col in df_processed.columns:
-            df_processed[col] = df_processed[col].fillna('').astype(str).str.strip()
-
-    # Seleciona e ordena as colunas para a saída final
-    final_cols = [col for col in FIXED_OUTPUT_ORDER if col in df_processed.columns]
-    df_final = df_processed[final_cols].copy()
+    # Remove duplicatas com base na prioridade do perfil (a primeira chave que se aplica)
+    with timed_stage(stages, "Desduplicação", len(df_processed)) as stage:
+        for key in profile["dedup_keys"]:
+            deduplicated = _drop_key_duplicates(df_processed, key)
+            if deduplicated is None:
+                continue
+            df_processed = deduplicated.copy()
+            if list(key) == FUZZY_DEDUP_KEY and profile.get("fuzzy_dedup"):
+                # A chave exata não pega variações de grafia ("R. X, 10" x "Rua X 10")
+                df_processed = apply_fuzzy_dedup(df_processed, profile["fuzzy_dedup"])
+            break
+        stage["rows_out"] = len(df_processed)
+
+    with timed_stage(stages, "Projeção final", len(df_processed)) as stage:
+        # Limpeza final das colunas de texto
+        for col in ["Razao", "Logradouro", "Bairro", "Cidade", "UF", "SOCIO1Nome", "NOME", "Whats", "CEL"]:
+            if col in df_processed.columns:
+                df_processed[col] = df_processed[col].fillna('').astype(str).str.strip()
+
+        # Seleciona e ordena as colunas para a saída final
+        final_cols = [col for col in profile["output_order"] if col in df_processed.columns]
+        if FUZZY_DUPLICATE_COL in df_processed.columns:
+            final_cols.append(FUZZY_DUPLICATE_COL)
+        df_final = df_processed[final_cols].copy()
+        stage["rows_out"] = len(df_final)
 
     # Ordena o resultado final
-    sort_cols = [col for col in ["Bairro", "Razao"] if col in df_final.columns]
-    if sort_cols:
-        df_final.sort_values(by=sort_cols, ascending=True, inplace=True)
+    with timed_stage(stages, "Ordenação", len(df_final)) as stage:
+        sort_cols = [col for col in ["Bairro", "Razao"] if col in df_final.columns]
+        if sort_cols:
+            df_final.sort_values(by=sort_cols, ascending=True, inplace=True)
+        stage["rows_out"] = len(df_final)
 
     missing = [col for col in essential_cols if col not in df_processed.columns]
-    logging.info("DataFrame final antes de retornar:")
-    logging.info(df_final.head())
+    logging.debug("DataFrame final antes de retornar:")
+    logging.debug(df_final.head())
 
     print(f"DEBUG: clean_and_filter_data final return: df_final shape: {df_final.shape if not df_final.empty else 'empty'}, missing: {missing}, structure: {'Structure_Type_Placeholder'}")
     return df_final.reset_index(drop=True), missing, "Structure_Type_Placeholder" # Retorna 3 valores
@@ -1,36 +1,243 @@
+import io
+import os
+import mmap
+import time
+import codecs
+import hashlib
+import logging
+import importlib.util
+from collections import OrderedDict, deque
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-import chardet
-from data_cleaning import normalize_colname
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from chardet.universaldetector import UniversalDetector
+from spill_store import spill_dataframe, load_spilled
+from data_cleaning import (
+    normalize_colname, match_structure_profile, get_structure_profile, profile_source_columns,
+    ASSERTIVA_ESSENTIAL_COLS, LEMIT_ESSENTIAL_COLS,
+)
 
-# Colunas essenciais para cada tipo de estrutura
-ASSERTIVA_ESSENTIAL_COLS = [
-    "Razao", "Logradouro", "Numero", "Bairro", "Cidade", "UF", "CEP",
-    "SOCIO1Nome", "SOCIO1Celular1", "SOCIO1Celular2"
-]
+# Valor de `usecols` que carrega apenas as colunas lidas pelo perfil de estrutura detectado
+PROFILE_USECOLS = "profile"
 
-LEMIT_ESSENTIAL_COLS = [
-    "NOME", "Whats", "CEL", "DDD", "FONE"
-]
+# Tamanho padrão (em linhas) dos blocos no modo de leitura em streaming
+DEFAULT_CHUNK_ROWS = 50000
 
-def read_and_detect_encoding(file_obj):
-    """Lê o conteúdo de um arquivo (ou UploadedFile) e detecta seu encoding."""
-    if hasattr(file_obj, 'read'): # It's an UploadedFile or similar file-like object
-        raw_data = file_obj.read()
-        file_obj.seek(0) # Reset stream position for subsequent reads
-    else: # Assume it's a filepath string
+# Detecção de encoding por amostragem: tamanho de cada amostra (início, meio e fim),
+# pedaço entregue por vez ao detector incremental do chardet e limite total de bytes
+# analisados por ele (o chardet é Python puro e fica lento com muitos dados)
+ENCODING_SAMPLE_BYTES = 64 * 1024
+ENCODING_FEED_BYTES = 4 * 1024
+ENCODING_DETECT_BUDGET = 24 * 1024
+ENCODING_MIN_CONFIDENCE = 0.8
+ENCODING_CACHE_MAX_ENTRIES = 256
+
+# Seleção de engine para XLSX: abaixo deste tamanho o openpyxl é usado primeiro
+XLSX_FAST_ENGINE_MIN_BYTES = 256 * 1024
+# Medições necessárias por engine antes de a ordem passar a seguir os tempos medidos
+XLSX_BENCHMARK_MIN_SAMPLES = 3
+# Histórico recente de tempos de leitura de XLSX por engine
+XLSX_ENGINE_TIMINGS = deque(maxlen=200)
+
+# Dtype de texto usado no caminho de leitura com PyArrow (`arrow=True`)
+ARROW_STRING_DTYPE = pd.StringDtype("pyarrow")
+
+# Coluna adicionada ao juntar vários arquivos, com o nome do arquivo de origem de cada linha
+SOURCE_FILE_COL = "ARQUIVO_ORIGEM"
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx')
+
+# Tratador de erros de decodificação usado na leitura em streaming: os bytes inválidos no
+# encoding detectado são decodificados como latin-1, sem reiniciar a leitura do arquivo
+LATIN1_FALLBACK_ERRORS = "latin1_fallback"
+
+def _latin1_fallback(error):
+    return error.object[error.start:error.end].decode('latin-1'), error.end
+
+codecs.register_error(LATIN1_FALLBACK_ERRORS, _latin1_fallback)
+
+# Cache de encodings já detectados, indexado pelo hash do conteúdo do arquivo.
+# Vive no nível do módulo, portanto sobrevive aos reruns do Streamlit.
+_ENCODING_CACHE = OrderedDict()
+
+def content_hash(raw_data):
+    """Retorna um hash hexadecimal curto do conteúdo (bytes ou memoryview) de um arquivo."""
+    return hashlib.blake2b(raw_data, digest_size=16).hexdigest()
+
+def _encoding_samples(raw_data):
+    """Recorta amostras do início, meio e fim do conteúdo (ou o conteúdo inteiro se for pequeno)."""
+    size = len(raw_data)
+    if size <= 3 * ENCODING_SAMPLE_BYTES:
+        return [raw_data]
+    middle = (size - ENCODING_SAMPLE_BYTES) // 2
+    return [
+        raw_data[:ENCODING_SAMPLE_BYTES],
+        raw_data[middle:middle + ENCODING_SAMPLE_BYTES],
+        raw_data[-ENCODING_SAMPLE_BYTES:],
+    ]
+
+def _samples_decode(samples, encoding):
+    """Verifica se todas as amostras decodificam no encoding, tolerando caracteres cortados nas bordas."""
+    for i, sample in enumerate(samples):
+        if i > 0 and encoding.replace('-', '').lower() == 'utf8':
+            # Amostras do meio/fim podem começar no meio de um caractere multibyte
+            # (no máximo 3 bytes de continuação, 0x80-0xBF)
+            skip = 0
+            while skip < min(3, len(sample)) and 0x80 <= sample[skip] < 0xC0:
+                skip += 1
+            sample = sample[skip:]
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        except (UnicodeDecodeError, LookupError):
+            return False
+    return True
+
+def detect_encoding(raw_data):
+    """Detecta o encoding usando apenas amostras do conteúdo, com cache por hash.
+
+    Tenta utf-8 primeiro; se as amostras não forem utf-8 válido, alimenta o detector
+    incremental do chardet até ele ficar confiante e recai para cp1252 ou latin-1.
+    """
+    key = content_hash(raw_data)
+    cached = _ENCODING_CACHE.get(key)
+    if cached is not None:
+        _ENCODING_CACHE.move_to_end(key)
+        return cached
+
+    samples = _encoding_samples(raw_data)
+    if _samples_decode(samples, 'utf-8'):
+        encoding = 'utf-8'
+    else:
+        detector = UniversalDetector()
+        per_sample_budget = ENCODING_DETECT_BUDGET // len(samples)
+        for sample in samples:
+            for start in range(0, min(len(sample), per_sample_budget), ENCODING_FEED_BYTES):
+                detector.feed(sample[start:start + ENCODING_FEED_BYTES])
+                if detector.done:
+                    break
+            if detector.done:
+                break
+        result = detector.close()
+        detected = (result.get('encoding') or '').lower()
+        confidence = result.get('confidence') or 0.0
+        print(f"DEBUG: detect_encoding: chardet sugeriu {detected or 'nada'} (confiança {confidence:.2f})")
+
+        if (detected and detected not in ('ascii', 'utf-8', 'windows-1252', 'iso-8859-1')
+                and confidence >= ENCODING_MIN_CONFIDENCE and _samples_decode(samples, detected)):
+            encoding = detected
+        elif _samples_decode(samples, 'cp1252'):
+            encoding = 'cp1252'
+        else:
+            encoding = 'latin-1'
+
+    _ENCODING_CACHE[key] = encoding
+    if len(_ENCODING_CACHE) > ENCODING_CACHE_MAX_ENTRIES:
+        _ENCODING_CACHE.popitem(last=False)
+    return encoding
+
+class _BufferReader(io.RawIOBase):
+    """Leitor file-like sobre um memoryview: o parser lê direto do buffer, sem copiá-lo inteiro."""
+
+    def __init__(self, view):
+        super().__init__()
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+def _open_view(view):
+    """Abre um novo leitor (posição 0) sobre o buffer; cada parse usa o seu, sem `seek(0)`."""
+    return io.BufferedReader(_BufferReader(view))
+
+@contextmanager
+def _upload_buffer(file_input):
+    """Expõe o conteúdo de um upload como um único memoryview, lido uma só vez.
+
+    - UploadedFile/BytesIO: o próprio buffer interno (`getbuffer`), sem cópia;
+    - caminho de arquivo: o arquivo é mapeado em memória (mmap), sem leitura antecipada;
+    - memoryview: repassado como está (quem abriu é responsável por liberá-lo);
+    - outros objetos file-like: lidos uma vez (e rebobinados, se possível).
+    Produz None se o caminho não existir ou não puder ser lido.
+    """
+    if isinstance(file_input, memoryview):
+        yield file_input
+        return
+
+    mapped = None
+    if hasattr(file_input, 'getbuffer'):
+        view = file_input.getbuffer()
+    elif hasattr(file_input, 'read'):
+        view = memoryview(file_input.read())
+        if hasattr(file_input, 'seek'):
+            file_input.seek(0)
+    else:
         try:
-            with open(file_obj, 'rb') as f:
-                raw_data = f.read()
-        except FileNotFoundError:
+            with open(file_input, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    view = memoryview(b'')
+                else:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    view = memoryview(mapped)
+        except (OSError, TypeError, ValueError):
+            view = None
+
+    try:
+        yield view
+    finally:
+        # Se algum consumidor ainda referencia o buffer, a liberação fica para o coletor
+        try:
+            if view is not None:
+                view.release()
+            if mapped is not None:
+                mapped.close()
+        except BufferError:
+            pass
+
+def _sniff_csv(view):
+    """Detecta encoding e delimitador de um CSV a partir do buffer já carregado."""
+    encoding = detect_encoding(view)
+    delimiter = infer_delimiter(None, encoding, sample=str(view[:4096], encoding, 'ignore'))
+    print(f"Inferred delimiter: {delimiter}")
+    return encoding, delimiter
+
+def read_and_detect_encoding(file_obj):
+    """Lê o conteúdo de um arquivo (ou UploadedFile) e detecta seu encoding.
+
+    Mantida por compatibilidade: o caminho de ingestão usa `_upload_buffer`, que evita a cópia.
+    """
+    with _upload_buffer(file_obj) as view:
+        if view is None:
             return None, None
+        return bytes(view), detect_encoding(view)
 
-    result = chardet.detect(raw_data)
-    return raw_data, result['encoding'] or 'utf-8'
+def infer_delimiter(file_obj, encoding, sample=None):
+    """Tenta inferir o delimitador de um arquivo CSV (ou UploadedFile).
 
-def infer_delimiter(file_obj, encoding):
-    """Tenta inferir o delimitador de um arquivo CSV (ou UploadedFile)."""
+    Se `sample` (texto já decodificado) for informado, o arquivo não é lido novamente.
+    """
     try:
-        if hasattr(file_obj, 'read'): # It's an UploadedFile
+        if sample is not None:
+            pass
+        elif hasattr(file_obj, 'read'): # It's an UploadedFile
             sample = file_obj.read(4096).decode(encoding, errors='ignore')
             file_obj.seek(0) # Reset stream position
         else: # Assume it's a filepath string
@@ -45,118 +252,568 @@ def infer_delimiter(file_obj, encoding):
     except Exception:
         return ',' # Retorna um padrão em caso de erro
 
-def read_csv_smart(file_obj):
-    """Lê um arquivo CSV (ou UploadedFile) com detecção inteligente de encoding e delimitador."""
-    raw_data, encoding = read_and_detect_encoding(file_obj)
-    if raw_data is None:
-        print("DEBUG: read_csv_smart returning (empty df, file not found error)")
-        return pd.DataFrame(), "Arquivo não encontrado ou ilegível."
+def _to_arrow_strings(df):
+    """Converte colunas object compostas apenas de texto para o dtype string[pyarrow]."""
+    for col in df.columns:
+        if df[col].dtype == object and df[col].dropna().map(type).eq(str).all():
+            df[col] = df[col].astype(ARROW_STRING_DTYPE)
+    return df
 
-    delimiter = infer_delimiter(file_obj, encoding)
-    print(f"Inferred delimiter: {delimiter}")
+def _read_csv_arrow(raw_data, delimiter, encoding, usecols=None):
+    """Parse multi-thread com o leitor CSV do PyArrow; colunas de texto viram string[pyarrow].
+
+    `raw_data` pode ser bytes ou memoryview (o PyArrow lê o buffer sem copiá-lo).
+    Levanta exceção em linhas malformadas (quem chama recai para o engine C com on_bad_lines).
+    """
+    read_options = pa_csv.ReadOptions(encoding=encoding, use_threads=True)
+    convert_options = pa_csv.ConvertOptions(strings_can_be_null=True)
+    if usecols is not None:
+        # Colunas identificadas por posição (f0, f1, ...); os nomes são definidos por quem chama
+        read_options = pa_csv.ReadOptions(encoding=encoding, use_threads=True, skip_rows=1, autogenerate_column_names=True)
+        convert_options = pa_csv.ConvertOptions(strings_can_be_null=True, include_columns=[f"f{i}" for i in usecols])
+    parse_options = pa_csv.ParseOptions(delimiter=delimiter)
+
+    def _parse(convert_options):
+        return pa_csv.read_csv(pa.BufferReader(pa.py_buffer(raw_data)), read_options=read_options,
+                               parse_options=parse_options, convert_options=convert_options)
+
+    table = _parse(convert_options)
+    # O PyArrow converte datas automaticamente; o engine C as mantém como texto
+    temporal = [f.name for f in table.schema if pa.types.is_temporal(f.type)]
+    if temporal:
+        convert_options.column_types = {name: pa.string() for name in temporal}
+        table = _parse(convert_options)
+    df = table.to_pandas(types_mapper={pa.string(): ARROW_STRING_DTYPE, pa.large_string(): ARROW_STRING_DTYPE}.get)
+    return _dedupe_columns(df)
+
+def read_csv_smart(file_obj, usecols=None, arrow=False):
+    """Lê um arquivo CSV (ou UploadedFile) com detecção inteligente de encoding e delimitador.
+
+    O conteúdo é obtido uma única vez (`_upload_buffer`) e detecção, inferência do
+    delimitador e parse trabalham sobre o mesmo buffer.
+    `usecols` (posições das colunas) limita o parse às colunas selecionadas.
+    Com `arrow=True`, usa o leitor multi-thread do PyArrow e o dtype string[pyarrow];
+    se o arquivo tiver linhas malformadas, recai para o engine C tolerante (on_bad_lines).
+    """
+    with _upload_buffer(file_obj) as view:
+        if view is None:
+            print("DEBUG: read_csv_smart returning (empty df, file not found error)")
+            return pd.DataFrame(), "Arquivo não encontrado ou ilegível."
+        return _read_csv_view(view, usecols=usecols, arrow=arrow)
+
+def _read_csv_view(view, usecols=None, arrow=False):
+    encoding, delimiter = _sniff_csv(view)
+
+    if arrow:
+        try:
+            df = _read_csv_arrow(view, delimiter, encoding, usecols=usecols)
+            print("DEBUG: read_csv_smart returning (df, None) - pyarrow success path")
+            return df, None
+        except Exception as e_arrow:
+            logging.info(f"[CSV] Leitura com PyArrow falhou ({e_arrow}); usando o engine C.")
+            df, err = _read_csv_view(view, usecols=usecols)
+            return (_to_arrow_strings(df), None) if err is None else (df, err)
     
     try:
-        df = pd.read_csv(file_obj, delimiter=delimiter, encoding=encoding, on_bad_lines='warn')
+        df = pd.read_csv(_open_view(view), delimiter=delimiter, encoding=encoding, on_bad_lines='warn', usecols=usecols)
         # Ensure column names are unique
-        cols = pd.Series(df.columns)
-        for dup in cols[cols.duplicated()].unique():
-            cols[cols[cols == dup].index.values.tolist()] = [dup + '.' + str(i) if i != 0 else dup for i, iid in enumerate(cols[cols == dup].index.values.tolist())]
-        df.columns = cols
+        df = _dedupe_columns(df)
         print("DEBUG: read_csv_smart returning (df, None) - success path")
         return df, None
     except Exception as e:
         # Tenta com um encoding mais robusto como fallback
         try:
-            if hasattr(file_obj, 'seek'): # For UploadedFile, reset position
-                file_obj.seek(0)
-            df = pd.read_csv(file_obj, delimiter=delimiter, encoding='latin-1', on_bad_lines='warn', mangle_dupe_cols=True)
+            df = pd.read_csv(_open_view(view), delimiter=delimiter, encoding='latin-1', on_bad_lines='warn', usecols=usecols)
+            df = _dedupe_columns(df)
             print("DEBUG: read_csv_smart returning (df, None) - fallback success path")
             return df, None
         except Exception as e_fallback:
             print(f"DEBUG: read_csv_smart returning (empty df, fallback error): {e_fallback}")
             return pd.DataFrame(), f"Erro ao ler CSV com ambos os engines: {e_fallback}"
 
-def read_xlsx_smart(file_obj):
-    """Lê um arquivo XLSX (ou UploadedFile), tentando várias abordagens."""
+def _dedupe_columns(df):
+    """Garante nomes de colunas únicos, sufixando repetições com '.N'."""
+    cols = pd.Series(df.columns)
+    for dup in cols[cols.duplicated()].unique():
+        cols[cols[cols == dup].index.values.tolist()] = [dup + '.' + str(i) if i != 0 else dup for i, iid in enumerate(cols[cols == dup].index.values.tolist())]
+    df.columns = cols
+    return df
+
+def iter_csv_chunks(file_obj, chunksize=DEFAULT_CHUNK_ROWS, usecols=None):
+    """Lê um CSV em blocos de até `chunksize` linhas, sem materializar o arquivo inteiro.
+
+    Retorna (gerador de DataFrames, erro). O arquivo é decodificado numa única passada:
+    trechos inválidos no encoding detectado são lidos como latin-1 (`LATIN1_FALLBACK_ERRORS`).
+    O buffer do upload permanece aberto até o gerador terminar.
+    """
+    stack = ExitStack()
+    view = stack.enter_context(_upload_buffer(file_obj))
+    if view is None:
+        stack.close()
+        return iter(()), "Arquivo não encontrado ou ilegível."
+    encoding, delimiter = _sniff_csv(view)
+
+    def _generate():
+        with stack:
+            rows_done = 0
+            reader = pd.read_csv(_open_view(view), delimiter=delimiter, encoding=encoding,
+                                 encoding_errors=LATIN1_FALLBACK_ERRORS, on_bad_lines='warn',
+                                 chunksize=chunksize, usecols=usecols)
+            for chunk in reader:
+                chunk.index = pd.RangeIndex(rows_done, rows_done + len(chunk))
+                rows_done += len(chunk)
+                yield _dedupe_columns(chunk)
+
+    return _generate(), None
+
+def iter_xlsx_chunks(file_obj, chunksize=DEFAULT_CHUNK_ROWS, usecols=None):
+    """Lê a primeira planilha de um XLSX em blocos usando o modo read-only do openpyxl."""
+    from openpyxl import load_workbook
+
+    stack = ExitStack()
+    view = stack.enter_context(_upload_buffer(file_obj))
+    if view is None:
+        stack.close()
+        return iter(()), "Arquivo não encontrado ou ilegível."
     try:
-        # Tentativa padrão com o engine openpyxl
-        df = pd.read_excel(file_obj, engine='openpyxl')
-        print("DEBUG: read_xlsx_smart returning (df, None) - openpyxl success path")
-        return df, None
-    except Exception as e_openpyxl:
-        # Fallback para o engine calamine se o openpyxl falhar
-        try:
-            if hasattr(file_obj, 'seek'): # For UploadedFile, reset position
-                file_obj.seek(0)
-            df = pd.read_excel(file_obj, engine='calamine')
-            print("DEBUG: read_xlsx_smart returning (df, None) - calamine fallback success path")
+        wb = load_workbook(_open_view(view), read_only=True, data_only=True)
+    except Exception as e:
+        stack.close()
+        return iter(()), f"Erro ao ler XLSX: {e}"
+
+    # Ao fim da leitura fecha o workbook e depois libera o buffer
+    stack.callback(wb.close)
+
+    def _generate():
+        with stack:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+            if usecols is not None:
+                columns = [columns[i] for i in usecols if i < len(columns)]
+            buffer = []
+            start = 0
+            for row in rows:
+                if usecols is not None:
+                    row = [row[i] if i < len(row) else None for i in usecols]
+                buffer.append(row)
+                if len(buffer) >= chunksize:
+                    yield _dedupe_columns(pd.DataFrame(buffer, columns=columns, index=pd.RangeIndex(start, start + len(buffer))))
+                    start += len(buffer)
+                    buffer = []
+            if buffer:
+                yield _dedupe_columns(pd.DataFrame(buffer, columns=columns, index=pd.RangeIndex(start, start + len(buffer))))
+
+    return _generate(), None
+
+def _file_size(file_obj):
+    """Retorna o tamanho em bytes de um UploadedFile, buffer em memória ou caminho (0 se desconhecido)."""
+    if isinstance(file_obj, memoryview):
+        return file_obj.nbytes
+    size = getattr(file_obj, 'size', None)
+    if size:
+        return size
+    if hasattr(file_obj, 'getbuffer'):
+        return file_obj.getbuffer().nbytes
+    try:
+        return os.path.getsize(file_obj)
+    except (OSError, TypeError):
+        return 0
+
+def _xlsx_engines_available():
+    """Lista os engines de XLSX instalados, do mais rápido para o mais lento."""
+    engines = []
+    if importlib.util.find_spec('python_calamine') is not None:
+        engines.append('calamine')
+    engines.append('openpyxl')
+    return engines
+
+def _xlsx_seconds_per_mb(engine):
+    """Mediana do tempo por MB das leituras bem-sucedidas de um engine, ou None se houver poucas medições."""
+    samples = sorted(t["seconds"] / max(t["size"] / 1e6, 0.01)
+                     for t in XLSX_ENGINE_TIMINGS if t["engine"] == engine and t["ok"])
+    if len(samples) < XLSX_BENCHMARK_MIN_SAMPLES:
+        return None
+    return samples[len(samples) // 2]
+
+def select_xlsx_engines(file_size):
+    """Define a ordem de tentativa dos engines de XLSX para um arquivo de `file_size` bytes.
+
+    Arquivos pequenos usam o openpyxl (leitura mais conservadora de tipos); a partir de
+    XLSX_FAST_ENGINE_MIN_BYTES o calamine vem primeiro. Quando já há medições suficientes
+    de todos os engines, a ordem passa a seguir o tempo medido por MB.
+    """
+    engines = _xlsx_engines_available()
+    if file_size < XLSX_FAST_ENGINE_MIN_BYTES:
+        engines.sort(key=lambda e: e != 'openpyxl')
+        return engines
+    measured = {e: _xlsx_seconds_per_mb(e) for e in engines}
+    if all(v is not None for v in measured.values()):
+        engines.sort(key=lambda e: measured[e])
+    return engines
+
+def get_xlsx_engine_timings():
+    """Retorna as medições recentes de leitura de XLSX (engine, tamanho, segundos, linhas, sucesso)."""
+    return list(XLSX_ENGINE_TIMINGS)
+
+def read_xlsx_smart(file_obj, usecols=None):
+    """Lê um arquivo XLSX (ou UploadedFile), escolhendo o engine mais rápido disponível.
+
+    Cada tentativa é cronometrada em XLSX_ENGINE_TIMINGS; se um engine falhar, o próximo é usado,
+    com um leitor novo sobre o mesmo buffer do upload.
+    """
+    with _upload_buffer(file_obj) as view:
+        if view is None:
+            print("DEBUG: read_xlsx_smart returning (empty df, file not found error)")
+            return pd.DataFrame(), "Arquivo não encontrado ou ilegível."
+        file_size = view.nbytes
+        engines = select_xlsx_engines(file_size)
+        errors = []
+        for engine in engines:
+            started = time.perf_counter()
+            try:
+                # O openpyxl já é aberto pelo pandas em modo read-only
+                df = pd.read_excel(_open_view(view), engine=engine, usecols=usecols)
+            except Exception as e:
+                XLSX_ENGINE_TIMINGS.append({"engine": engine, "size": file_size, "seconds": time.perf_counter() - started, "rows": 0, "ok": False})
+                errors.append(f"{engine} ({e})")
+                continue
+            elapsed = time.perf_counter() - started
+            XLSX_ENGINE_TIMINGS.append({"engine": engine, "size": file_size, "seconds": elapsed, "rows": len(df), "ok": True})
+            logging.info(f"[XLSX] Arquivo de {file_size} bytes lido com {engine} em {elapsed:.3f}s ({len(df)} linhas).")
+            print(f"DEBUG: read_xlsx_smart returning (df, None) - {engine} success path ({elapsed:.3f}s)")
             return df, None
-        except Exception as e_calamine:
-            print(f"DEBUG: read_xlsx_smart returning (empty df, calamine fallback error): {e_calamine}")
-            return pd.DataFrame(), f"Erro ao ler XLSX com ambos os engines: openpyxl ({e_openpyxl}), calamine ({e_calamine})"
 
-def load_data(file_input):
+    print(f"DEBUG: read_xlsx_smart returning (empty df, all engines failed): {errors}")
+    return pd.DataFrame(), f"Erro ao ler XLSX com todos os engines: {', '.join(errors)}"
+
+def detect_structure_type(columns):
+    """Detecta o tipo de estrutura (nome do perfil registrado ou Desconhecida) a partir dos nomes das colunas.
+
+    Basta o cabeçalho: os perfis são definidos em `data_cleaning.STRUCTURE_PROFILES`.
+    """
+    profile = match_structure_profile(columns)
+    print(f"DEBUG: detect_structure_type: perfil {profile['name'] if profile else 'nenhum'} para {len(columns)} colunas")
+    return profile["name"] if profile else "Desconhecida"
+
+def _file_extension(file_input):
+    if hasattr(file_input, 'name'): # It's an UploadedFile object
+        return file_input.name.lower()
+    return str(file_input).lower() # Assume it's a string filepath
+
+def peek_header(file_input, nrows=0):
+    """Lê apenas o cabeçalho (e, opcionalmente, as primeiras `nrows` linhas) de um CSV ou XLSX.
+
+    Serve para alimentar o mapeamento de colunas sem parsear o arquivo inteiro.
+    Retorna (DataFrame com as colunas e até `nrows` linhas, erro).
+    Aceita também vários arquivos (lista ou diretório): as colunas são unificadas.
+    """
+    if file_input is None:
+        return pd.DataFrame(), "Nenhum arquivo fornecido."
+    if _is_multi_input(file_input):
+        return _peek_header_many(file_input, nrows)
+    file_extension = _file_extension(file_input)
+    if not file_extension.endswith(SUPPORTED_EXTENSIONS):
+        return pd.DataFrame(), "Formato de arquivo não suportado. Use CSV ou XLSX."
+    with _upload_buffer(file_input) as view:
+        if view is None:
+            return pd.DataFrame(), "Arquivo não encontrado ou ilegível."
+        return _peek_header_view(view, file_extension, nrows)
+
+def _peek_header_view(view, file_extension, nrows=0):
+    """`peek_header` sobre um buffer já aberto (`_upload_buffer`)."""
+    try:
+        if file_extension.endswith('.csv'):
+            encoding, delimiter = _sniff_csv(view)
+            try:
+                df_head = pd.read_csv(_open_view(view), delimiter=delimiter, encoding=encoding, on_bad_lines='warn', nrows=nrows)
+            except UnicodeDecodeError:
+                df_head = pd.read_csv(_open_view(view), delimiter=delimiter, encoding='latin-1', on_bad_lines='warn', nrows=nrows)
+        else:
+            # Em modo read-only o openpyxl para de ler assim que obtém as linhas pedidas
+            df_head = pd.read_excel(_open_view(view), engine='openpyxl', nrows=nrows)
+    except Exception as e:
+        return pd.DataFrame(), f"Erro ao ler o cabeçalho do arquivo: {e}"
+    return _dedupe_columns(df_head), None
+
+def resolve_usecols(header_columns, usecols):
+    """Converte nomes de colunas selecionadas em posições no arquivo.
+
+    Retorna (posições, nomes) na ordem do arquivo; nomes inexistentes no cabeçalho são ignorados.
+    """
+    wanted = set(usecols)
+    positions = [i for i, col in enumerate(header_columns) if col in wanted]
+    return positions, [header_columns[i] for i in positions]
+
+def _inspect_header(view, file_extension, usecols=None):
+    """Lê só o cabeçalho do buffer: detecta a estrutura e resolve `usecols` (nomes ou PROFILE_USECOLS).
+
+    Retorna (estrutura, posições, nomes, erro); posições e nomes são None quando o arquivo
+    deve ser carregado por inteiro.
+    """
+    df_header, err = _peek_header_view(view, file_extension)
+    if err:
+        return None, None, None, err
+    header_columns = df_header.columns.tolist()
+    structure_type = detect_structure_type(header_columns)
+    if isinstance(usecols, str) and usecols == PROFILE_USECOLS:
+        profile = get_structure_profile(structure_type)
+        usecols = profile_source_columns(profile, header_columns) if profile else None
+    if usecols is None:
+        return structure_type, None, None, None
+    positions, names = resolve_usecols(header_columns, usecols)
+    return structure_type, positions, names, None
+
+def profile_usecols(file_input):
+    """Colunas do(s) arquivo(s) lidas pelo perfil detectado no cabeçalho: retorna (colunas ou None, erro).
+
+    None indica que nenhum perfil foi reconhecido (o arquivo deve ser carregado por inteiro).
+    """
+    df_header, err = peek_header(file_input)
+    if err:
+        return None, err
+    profile = match_structure_profile(df_header.columns)
+    if profile is None:
+        return None, None
+    columns = profile_source_columns(profile, df_header.columns.tolist())
+    if SOURCE_FILE_COL in df_header.columns:
+        columns.append(SOURCE_FILE_COL)
+    return columns, None
+
+def _load_data_chunked(file_input, file_extension, chunksize, usecols=None):
+    """Modo streaming de `load_data`: retorna (gerador de blocos, erro)."""
+    if file_extension.endswith('.csv'):
+        chunks, err = iter_csv_chunks(file_input, chunksize=chunksize, usecols=usecols)
+    else:
+        chunks, err = iter_xlsx_chunks(file_input, chunksize=chunksize, usecols=usecols)
+    if err:
+        return iter(()), err
+
+    # O primeiro bloco é lido antecipadamente para que erros de leitura apareçam já aqui
+    try:
+        first_chunk = next(chunks, None)
+    except Exception as e:
+        return iter(()), f"Erro ao ler o arquivo em blocos: {e}"
+    if first_chunk is None:
+        return iter(()), None
+
+    def _chain():
+        yield first_chunk
+        yield from chunks
+
+    print(f"DEBUG: load_data (chunked) return: chunksize: {chunksize}")
+    return _chain(), None
+
+def _is_multi_input(file_input):
+    return isinstance(file_input, (list, tuple)) or (isinstance(file_input, str) and os.path.isdir(file_input))
+
+class _NamedBytesIO(io.BytesIO):
+    """BytesIO com atributo `name`, para reproduzir um UploadedFile dentro dos processos de trabalho."""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+def _expand_inputs(file_input):
+    """Converte uma lista de uploads/caminhos ou um diretório em pares (nome, conteúdo ou caminho)."""
+    if isinstance(file_input, str):
+        paths = sorted(os.path.join(file_input, f) for f in os.listdir(file_input) if f.lower().endswith(SUPPORTED_EXTENSIONS))
+        return [(os.path.basename(p), p) for p in paths]
+    items = []
+    for f in file_input:
+        if hasattr(f, 'getvalue'):
+            items.append((f.name, f.getvalue()))
+        elif hasattr(f, 'read'):
+            data = f.read()
+            f.seek(0)
+            items.append((f.name, data))
+        else:
+            items.append((os.path.basename(str(f)), str(f)))
+    return items
+
+def _as_file_input(name, payload):
+    return _NamedBytesIO(payload, name) if isinstance(payload, bytes) else payload
+
+def _canonical_names(headers):
+    """Mapeia cada nome normalizado (`normalize_colname`) para a primeira grafia encontrada entre os arquivos."""
+    canonical = {}
+    for columns in headers:
+        for col in columns:
+            canonical.setdefault(normalize_colname(col), col)
+    return canonical
+
+def _rename_to_canonical(columns, canonical):
+    """Renomeia as colunas de um arquivo para a grafia canônica, sem criar nomes repetidos."""
+    mapping = {}
+    used = set()
+    for col in columns:
+        target = canonical.get(normalize_colname(col), col)
+        if target in used:
+            target = col
+        mapping[col] = target
+        used.add(target)
+    return mapping
+
+def _source_col_last(df):
+    """Move a coluna de origem para o fim (o concat a posiciona antes de colunas exclusivas de outros arquivos)."""
+    return df[[c for c in df.columns if c != SOURCE_FILE_COL] + [SOURCE_FILE_COL]]
+
+def _load_one(name, payload, usecols, arrow=False):
+    """Carrega um único arquivo (executado nos processos de trabalho de `load_many`)."""
+    df, structure_type, err = load_data(_as_file_input(name, payload), usecols=usecols, arrow=arrow)
+    return df, structure_type, err
+
+def _peek_header_many(file_input, nrows):
+    items = _expand_inputs(file_input)
+    if not items:
+        return pd.DataFrame(), "Nenhum arquivo CSV ou XLSX encontrado."
+    frames = []
+    for name, payload in items:
+        df_head, err = peek_header(_as_file_input(name, payload), nrows=nrows)
+        if err:
+            return pd.DataFrame(), f"{name}: {err}"
+        frames.append((name, df_head))
+    canonical = _canonical_names(df.columns for _, df in frames)
+    merged = pd.concat([df.rename(columns=_rename_to_canonical(df.columns, canonical)).assign(**{SOURCE_FILE_COL: name})
+                        for name, df in frames], ignore_index=True)
+    return _source_col_last(merged), None
+
+def load_many(file_input, usecols=None, max_workers=None, arrow=False):
+    """Carrega vários CSV/XLSX (lista de uploads/caminhos ou um diretório) em paralelo e junta tudo.
+
+    Cada arquivo é parseado em um processo separado; as colunas são unificadas via
+    `normalize_colname` (ex: 'Nome' e 'NOME' viram a mesma coluna) e a coluna
+    SOURCE_FILE_COL guarda o arquivo de origem de cada linha.
+    Retorna (df, structure_type, err), como `load_data`.
+    """
+    items = _expand_inputs(file_input)
+    if not items:
+        return pd.DataFrame(), None, "Nenhum arquivo CSV ou XLSX encontrado."
+
+    # Os cabeçalhos (baratos) definem a grafia canônica antes do parse completo
+    headers = []
+    for name, payload in items:
+        df_head, err = peek_header(_as_file_input(name, payload))
+        if err:
+            return pd.DataFrame(), None, f"{name}: {err}"
+        headers.append(df_head.columns.tolist())
+    canonical = _canonical_names(headers)
+
+    per_file_usecols = [None] * len(items)
+    if isinstance(usecols, str) and usecols == PROFILE_USECOLS:
+        # Cada arquivo é projetado pelo perfil detectado no próprio cabeçalho
+        per_file_usecols = [PROFILE_USECOLS] * len(items)
+    elif usecols is not None:
+        wanted = {normalize_colname(c) for c in usecols if c != SOURCE_FILE_COL}
+        per_file_usecols = [[c for c in cols if normalize_colname(c) in wanted] for cols in headers]
+
+    if max_workers is None:
+        max_workers = min(len(items), os.cpu_count() or 1)
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_load_one, [n for n, _ in items], [p for _, p in items], per_file_usecols, [arrow] * len(items)))
+    else:
+        results = [_load_one(n, p, u, arrow) for (n, p), u in zip(items, per_file_usecols)]
+
+    frames = []
+    structure_types = set()
+    for (name, _), (df, structure_type, err) in zip(items, results):
+        if err:
+            return pd.DataFrame(), None, f"{name}: {err}"
+        df = df.rename(columns=_rename_to_canonical(df.columns, canonical))
+        df[SOURCE_FILE_COL] = name
+        frames.append(df)
+        structure_types.add(structure_type)
+
+    merged = _source_col_last(pd.concat(frames, ignore_index=True))
+    if len(structure_types) == 1:
+        structure_type = structure_types.pop()
+    else:
+        structure_type = detect_structure_type(merged.columns)
+    print(f"DEBUG: load_many: {len(items)} arquivos, {max_workers} processos, df shape: {merged.shape}, structure_type: {structure_type}")
+    return merged, structure_type, None
+
+def load_data(file_input, chunksize=None, usecols=None, arrow=False):
     """Carrega dados de um arquivo, seja CSV ou XLSX, e retorna um DataFrame, o tipo de estrutura e um erro (se houver).
     Aceita tanto filepath (string) quanto UploadedFile object.
+
+    Com `chunksize` informado, opera em modo streaming: o primeiro valor retornado passa a
+    ser um gerador de DataFrames com até `chunksize` linhas cada, mantendo a memória
+    limitada independentemente do tamanho do arquivo.
+
+    O tipo de estrutura é detectado apenas pelo cabeçalho, antes de o corpo ser parseado.
+    Com `usecols` (lista de nomes de colunas, ex: as escolhidas no mapeamento), apenas essas
+    colunas são parseadas; com `usecols=PROFILE_USECOLS`, apenas as que o plano de limpeza
+    do perfil detectado lê.
+
+    Uma lista de arquivos ou um diretório é delegado a `load_many` (parse em paralelo).
+
+    Com `arrow=True`, CSVs são lidos pelo PyArrow (multi-thread) com colunas de texto em
+    string[pyarrow], que ocupam bem menos memória que strings Python (ver `read_csv_smart`).
     """
     print(f"DEBUG: load_data called with file_input type: {type(file_input)}")
     if file_input is None:
         print("DEBUG: load_data returning 3 values (None file_input)")
         return pd.DataFrame(), None, "Nenhum arquivo fornecido."
 
-    # Determine the file extension
-    if hasattr(file_input, 'name'): # It's an UploadedFile object
-        file_extension = file_input.name.lower()
-    else: # Assume it's a string filepath
-        file_extension = str(file_input).lower()
+    if _is_multi_input(file_input):
+        if chunksize:
+            return iter(()), None, "Leitura em blocos não é suportada para vários arquivos."
+        return load_many(file_input, usecols=usecols, arrow=arrow)
 
-    df = pd.DataFrame()
-    err = None
-
-    if file_extension.endswith('.csv'):
-        df, err = read_csv_smart(file_input)
-        print(f"DEBUG: read_csv_smart returned df shape: {df.shape if not df.empty else 'empty'}, err: {err}")
-    elif file_extension.endswith('.xlsx'):
-        df, err = read_xlsx_smart(file_input)
-        print(f"DEBUG: read_xlsx_smart returned df shape: {df.shape if not df.empty else 'empty'}, err: {err}")
-    else:
+    # Determine the file extension
+    file_extension = _file_extension(file_input)
+    if not file_extension.endswith(SUPPORTED_EXTENSIONS):
         print("DEBUG: load_data returning 3 values (unsupported file format)")
         return pd.DataFrame(), None, "Formato de arquivo não suportado. Use CSV ou XLSX."
 
+    if chunksize:
+        # A estrutura vem do cabeçalho, antes de qualquer bloco ser parseado
+        with _upload_buffer(file_input) as view:
+            if view is None:
+                return iter(()), None, "Arquivo não encontrado ou ilegível."
+            header_structure_type, positions, names, err = _inspect_header(view, file_extension, usecols)
+        if err:
+            return iter(()), None, err
+        chunks, err = _load_data_chunked(file_input, file_extension, chunksize, usecols=positions)
+        if names is not None and err is None:
+            chunks = (chunk.set_axis(names, axis=1) for chunk in chunks)
+        return chunks, header_structure_type if err is None else None, err
+
+    # O upload é lido (ou mapeado) uma única vez; cabeçalho e parse usam o mesmo buffer
+    with _upload_buffer(file_input) as view:
+        if view is None:
+            print("DEBUG: load_data returning 3 values (file not found)")
+            return pd.DataFrame(), None, "Arquivo não encontrado ou ilegível."
+
+        # Estrutura detectada só pelo cabeçalho; o perfil pode limitar as colunas parseadas
+        header_structure_type, positions, names, err = _inspect_header(view, file_extension, usecols)
+        if err:
+            return pd.DataFrame(), None, err
+
+        if file_extension.endswith('.csv'):
+            df, err = read_csv_smart(view, usecols=positions, arrow=arrow)
+            print(f"DEBUG: read_csv_smart returned df shape: {df.shape if not df.empty else 'empty'}, err: {err}")
+        else:
+            df, err = read_xlsx_smart(view, usecols=positions)
+            print(f"DEBUG: read_xlsx_smart returned df shape: {df.shape if not df.empty else 'empty'}, err: {err}")
+
     structure_type = None
     if err is None:
-        # Tenta detectar o tipo de estrutura
-        # Normaliza os nomes das colunas do DataFrame para comparação
-        df_cols_normalized = {normalize_colname(col) for col in df.columns}
-        print(f"DEBUG: Colunas do DataFrame normalizadas para detecção: {df_cols_normalized}")
-
-        # Verifica se é Assertiva
-        is_assertiva = all(normalize_colname(col) in df_cols_normalized for col in ASSERTIVA_ESSENTIAL_COLS)
-        if is_assertiva:
-            structure_type = "Assertiva"
-        else:
-            # Verifica se é Lemit
-            is_lemit = all(normalize_colname(col) in df_cols_normalized for col in LEMIT_ESSENTIAL_COLS)
-            if is_lemit:
-                structure_type = "Lemit"
-            else:
-                structure_type = "Desconhecida" # Ou outro valor padrão
+        if names is not None:
+            # Carga projetada: mantém os nomes do cabeçalho
+            df.columns = names
+        structure_type = header_structure_type
 
     print(f"DEBUG: load_data final return: df shape: {df.shape if not df.empty else 'empty'}, structure_type: {structure_type}, err: {err}")
     return df, structure_type, err
 
-def save_temp_data(df):
-    """Salva um DataFrame em um arquivo temporário."""
-    temp_file = "temp_uploaded.csv"
-    df.to_csv(temp_file, index=False)
-    return temp_file
-
-def read_temp_data():
-    """Lê dados de um arquivo temporário."""
-    temp_file = "temp_uploaded.csv"
-    try:
-        df = pd.read_csv(temp_file)
-        return df, None
-    except FileNotFoundError:
-        return pd.DataFrame(), "Arquivo temporário não encontrado."
+def save_temp_data(df, name="temp_uploaded"):
+    """Salva um DataFrame na área temporária da sessão atual (Parquet) e retorna o caminho."""
+    return spill_dataframe(df, name)
 
+def read_temp_data(name="temp_uploaded"):
+    """Lê um DataFrame salvo com `save_temp_data` na sessão atual."""
+    return load_spilled(name)
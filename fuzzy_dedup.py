@@ -0,0 +1,187 @@
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Detecção de quase-duplicatas por Razão + endereço ("AUTO PECAS SILVA LTDA" em "R. X, 10" e
+# "Auto Peças Silva Ltda." em "Rua X 10"). Cada texto vira uma chave de tokens normalizados
+# (sem acentos, abreviações expandidas, palavras irrelevantes removidas, tokens ordenados) e
+# só linhas do mesmo bloco (mesmo CEP, ou mesmo Bairro + Cidade) são comparadas. Como a
+# comparação é por igualdade de chaves dentro do bloco, o custo é linear no número de linhas.
+
+# Partes da chave do registro: cada parte junta os tokens das colunas listadas
+FUZZY_KEY_PARTS = [["Razao"], ["Logradouro", "Numero"]]
+# Passadas de blocagem; duas linhas são duplicatas se casarem em qualquer uma delas
+FUZZY_BLOCK_PASSES = [["CEP"], ["Bairro", "Cidade"]]
+# Coluna com o número do grupo de quase-duplicatas (modo "flag")
+FUZZY_DUPLICATE_COL = "Possivel_Duplicata"
+# "collapse" mantém só a primeira linha de cada grupo; "flag" mantém todas e marca o grupo
+FUZZY_DEDUP_MODES = ("collapse", "flag")
+
+_TOKENS = re.compile(r'[A-Z0-9]+')
+_TOKEN_SEPARATORS = r'[^A-Z0-9]+'
+_REPEATED = re.compile(r'(.)\1+')
+# Siglas escritas com separador ("S.A.", "S/A", "S/N") viram um token só antes da quebra em tokens
+_SPLIT_INITIALS = r'\bS\s*[./]\s*([AN])\b'
+_NON_DIGITS = re.compile(r'\D')
+
+# Abreviações comuns em razões sociais e logradouros (vazio = descartar o token)
+_ABBREVIATIONS = {
+    "R": "RUA", "AV": "AVENIDA", "AVE": "AVENIDA", "AL": "ALAMEDA", "TV": "TRAVESSA", "TRAV": "TRAVESSA",
+    "ROD": "RODOVIA", "EST": "ESTRADA", "PC": "PRACA", "PCA": "PRACA", "PRC": "PRACA",
+    "JD": "JARDIM", "JARD": "JARDIM", "VL": "VILA", "PQ": "PARQUE", "CJ": "CONJUNTO", "CONJ": "CONJUNTO",
+    "STA": "SANTA", "STO": "SANTO", "DR": "DOUTOR", "CEL": "CORONEL", "GAL": "GENERAL", "PRES": "PRESIDENTE",
+    "N": "", "NO": "", "NR": "", "NUM": "", "SN": "",
+}
+# Palavras que não distinguem empresas nem endereços
+_STOPWORDS = {"DE", "DA", "DO", "DAS", "DOS", "E", "EM", "LTDA", "ME", "EPP", "EIRELI", "SA", "CIA", "MEI"}
+
+
+def _fold_token(token):
+    """Forma canônica de um token: abreviação expandida, sem letras repetidas nem plural simples.
+
+    Letras isoladas são mantidas: "Rua A" e "Rua B" são logradouros diferentes.
+    """
+    token = _ABBREVIATIONS.get(token, token)
+    if not token or token in _STOPWORDS:
+        return ""
+    if token.isdigit():
+        return token.lstrip("0") or "0"
+    token = _REPEATED.sub(r'\1', token)
+    if len(token) > 3 and token.endswith("S"):
+        token = token[:-1]
+    return token
+
+
+def token_key(text):
+    """Chave de tokens normalizados de um texto ('' se não sobrar nenhum token)."""
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii').upper()
+    text = re.sub(_SPLIT_INITIALS, r'S\1', text)
+    tokens = {_fold_token(t) for t in _TOKENS.findall(text)}
+    tokens.discard("")
+    return " ".join(sorted(tokens))
+
+
+def _token_set_codes(texts):
+    """Versão vetorizada de `token_key` para um array de textos: códigos inteiros das chaves (-1 se vazia).
+
+    Os textos são quebrados em tokens pelo PyArrow; cada token distinto é normalizado uma
+    única vez, e o conjunto de tokens de cada texto vira a soma de pesos aleatórios de 64 bits
+    dos seus tokens (independente da ordem; colisões são desprezíveis).
+    """
+    text = pa.array(texts, type=pa.string())
+    text = pc.utf8_upper(pc.replace_substring_regex(pc.utf8_normalize(text, form='NFKD'), r'[^\x00-\x7F]', ''))
+    text = pc.replace_substring_regex(text, _SPLIT_INITIALS, r'S\1')
+    tokens = pc.split_pattern_regex(text, _TOKEN_SEPARATORS)
+    parents = pc.list_parent_indices(tokens).to_numpy()
+    token_codes, token_uniques = pd.factorize(pc.list_flatten(tokens).to_numpy(zero_copy_only=False))
+    folded = pd.Series([_fold_token(t) for t in token_uniques], dtype=object)
+    folded_codes, folded_uniques = pd.factorize(folded)
+    keep = (folded != "").to_numpy()[token_codes]
+    codes = folded_codes[token_codes][keep].astype(np.int64)
+    rows = parents[keep].astype(np.int64)
+
+    result = np.full(len(texts), -1, dtype=np.int64)
+    if not len(codes):
+        return result
+    # Pares (texto, token) distintos, ordenados por texto
+    pairs = np.sort(rows * len(folded_uniques) + codes)
+    pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]]
+    rows, codes = pairs // len(folded_uniques), pairs % len(folded_uniques)
+    weights = np.random.default_rng(0).integers(0, np.iinfo(np.uint64).max, size=len(folded_uniques), dtype=np.uint64, endpoint=True)
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    sums = np.add.reduceat(weights[codes], starts)
+    result[rows[starts]] = pd.factorize(sums)[0]
+    return result
+
+
+def _cep_key(text):
+    digits = _NON_DIGITS.sub('', str(text))
+    return digits if len(digits) == 8 and digits != "00000000" else ""
+
+
+def _key_codes(df, cols, normalize=None):
+    """Códigos inteiros da chave normalizada das colunas juntas (-1 onde a chave fica vazia).
+
+    A normalização roda uma vez por valor distinto, não por linha; sem `normalize`,
+    a chave é o conjunto de tokens (`token_key`).
+    """
+    present = [col for col in cols if col in df.columns]
+    if not present:
+        return np.full(len(df), -1, dtype=np.int64)
+    text = df[present[0]].astype(object).where(df[present[0]].notna(), '').astype(str)
+    for col in present[1:]:
+        text = text + " " + df[col].astype(object).where(df[col].notna(), '').astype(str)
+    codes, uniques = pd.factorize(text, sort=False)
+    if normalize is None:
+        return _token_set_codes(uniques)[codes]
+    keys = pd.Series([normalize(u) for u in uniques], dtype=object)
+    key_codes, _ = pd.factorize(keys, sort=False)
+    key_codes[(keys == "").to_numpy()] = -1
+    return key_codes[codes].astype(np.int64)
+
+
+def _group_ids(code_columns):
+    """Id de grupo por linha para a combinação das colunas de códigos (-1 se alguma for -1)."""
+    valid = np.logical_and.reduce([codes >= 0 for codes in code_columns])
+    ids = np.full(len(valid), -1, dtype=np.int64)
+    if valid.any():
+        frame = pd.DataFrame({i: codes[valid] for i, codes in enumerate(code_columns)})
+        ids[valid] = frame.groupby(list(frame.columns), sort=False).ngroup().to_numpy()
+    return ids
+
+
+def fuzzy_duplicate_groups(df, key_parts=FUZZY_KEY_PARTS, block_passes=FUZZY_BLOCK_PASSES):
+    """Para cada linha, a posição da primeira linha do seu grupo de quase-duplicatas.
+
+    Linhas sem duplicatas (ou sem chave) apontam para si mesmas. Os grupos de cada passada
+    de blocagem são unidos por propagação do menor rótulo, então duplicatas encontradas
+    por CEP e por Bairro + Cidade formam um único grupo.
+    """
+    n = len(df)
+    labels = np.arange(n, dtype=np.int64)
+    if n < 2:
+        return labels
+    record = [_key_codes(df, cols) for cols in key_parts]
+    groupings = []
+    for block_cols in block_passes:
+        block = [_key_codes(df, [col], _cep_key if col == "CEP" else None) for col in block_cols]
+        ids = _group_ids(block + record)
+        rows = np.flatnonzero(ids >= 0)
+        if len(rows):
+            groupings.append((rows, ids[rows]))
+
+    changed = True
+    while changed:
+        changed = False
+        for rows, ids in groupings:
+            group_min = pd.Series(labels[rows]).groupby(ids).transform('min').to_numpy()
+            # Rótulo do rótulo: encurta as cadeias entre passadas
+            group_min = labels[group_min]
+            if (group_min < labels[rows]).any():
+                labels[rows] = np.minimum(labels[rows], group_min)
+                changed = True
+    return labels
+
+
+def apply_fuzzy_dedup(df, mode="collapse", key_parts=FUZZY_KEY_PARTS, block_passes=FUZZY_BLOCK_PASSES):
+    """Colapsa (mantém a primeira linha) ou marca os grupos de quase-duplicatas do DataFrame.
+
+    No modo "flag", a coluna FUZZY_DUPLICATE_COL recebe o número do grupo (1, 2, ...)
+    nas linhas que têm quase-duplicatas e fica vazia nas demais.
+    """
+    if mode not in FUZZY_DEDUP_MODES:
+        raise ValueError(f"Modo de desduplicação aproximada inválido: {mode}")
+    labels = fuzzy_duplicate_groups(df, key_parts, block_passes)
+    representative = labels == np.arange(len(df))
+    if mode == "collapse":
+        return df[representative].copy()
+    sizes = np.bincount(labels, minlength=len(df))
+    duplicated = sizes[labels] > 1
+    group_numbers = np.cumsum(representative & (sizes > 1))
+    flagged = np.where(duplicated, group_numbers[labels].astype(str), "")
+    df = df.copy()
+    df[FUZZY_DUPLICATE_COL] = flagged
+    return df
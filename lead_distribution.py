@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+# Distribuição de leads em rodízio, usada por todas as abas (Divisor, Pessoas e Negócios).
+# Os leads vão em lotes de N, um lote para cada consultor na ordem; quando todos recebem
+# um lote, o ciclo termina e a data avança um dia útil. O plano inteiro é calculado de uma
+# vez com NumPy, sem depender do Streamlit.
+
+LOTES_COLS = ["lote", "consultor", "ciclo", "data", "inicio", "fim"]
+
+
+def datas_uteis(data_inicio, ciclos):
+    """Data de cada ciclo: o ciclo 0 é a própria data de início e cada ciclo seguinte é o
+    próximo dia útil (pula sábados e domingos, como `proximo_dia_util`)."""
+    inicio = np.datetime64(data_inicio, 'D')
+    ciclos = np.asarray(ciclos, dtype=np.int64)
+    # Recuar para o dia útil anterior antes de somar: um início no sábado vai para segunda no ciclo 1
+    datas = np.busday_offset(inicio, ciclos, roll='backward')
+    return np.where(ciclos == 0, inicio, datas)
+
+
+def plano_distribuicao(total_leads, num_consultores, leads_por_consultor, data_inicio=None):
+    """Plano da distribuição de `total_leads` leads, na ordem em que aparecem.
+
+    Retorna um dict de arrays com uma posição por lead: "consultor" (índice na lista de
+    consultores), "lote", "ciclo" e, se `data_inicio` for informada, "data" (datetime64[D]).
+    Cada lead cai em exatamente um lote, e cada lote é de um único consultor e dia.
+    """
+    if num_consultores < 1:
+        raise ValueError("A distribuição precisa de pelo menos um consultor.")
+    lote = np.arange(total_leads, dtype=np.int64) // max(int(leads_por_consultor), 1)
+    plano = {"consultor": lote % num_consultores, "lote": lote, "ciclo": lote // num_consultores}
+    if data_inicio is not None:
+        plano["data"] = datas_uteis(data_inicio, plano["ciclo"])
+    return plano
+
+
+def lotes_do_plano(plano):
+    """Resumo do plano com uma linha por lote: consultor, ciclo, data e o intervalo
+    [inicio, fim) de posições dos leads do lote (a data vem como `datetime.date`, ou None)."""
+    lote = plano["lote"]
+    inicio = np.flatnonzero(np.diff(lote, prepend=-1))
+    fim = np.append(inicio[1:], len(lote))[:len(inicio)]
+    if "data" in plano:
+        datas = plano["data"][inicio].astype('datetime64[D]').astype(object)
+    else:
+        datas = np.full(len(inicio), None, dtype=object)
+    return pd.DataFrame({
+        "lote": lote[inicio],
+        "consultor": plano["consultor"][inicio],
+        "ciclo": plano["ciclo"][inicio],
+        "data": datas,
+        "inicio": inicio.astype(np.int64),
+        "fim": fim.astype(np.int64),
+    }, columns=LOTES_COLS)
@@ -55,12 +55,20 @@ def salvar_equipes(equipes):
     with open(EQUIPES_FILE, "w", encoding="utf-8") as f:
         json.dump({"equipes": equipes}, f, ensure_ascii=False, indent=2)
 
-from data_ingestion import load_data, ASSERTIVA_ESSENTIAL_COLS, LEMIT_ESSENTIAL_COLS
-from data_cleaning import clean_and_filter_data
+from data_ingestion import load_data, peek_header, detect_structure_type, save_temp_data, read_temp_data, DEFAULT_CHUNK_ROWS, SOURCE_FILE_COL, PROFILE_USECOLS
+from data_cleaning import clean_and_filter_data, clean_and_filter_data_chunked, get_structure_profile, PARALLEL_WORKERS
+from upload_cache import load_data_cached, upload_cache_key
+from clean_cache import clean_result_key, get_clean_result, put_clean_result
+from stage_timing import stage_report_frame
+from suppression_index import filter_suppressed, record_distributed
+from lead_distribution import plano_distribuicao, lotes_do_plano
 from create_pdf import create_pdf_robust
 
 # --- Configurações e Lógica para o Divisor de Listas ---
 
+# Uploads acima deste tamanho são higienizados em modo streaming (blocos de DEFAULT_CHUNK_ROWS linhas)
+STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024
+
 # Cores para o Excel (RGB para OpenPyXL)
 COLOR_LIGHT_BLUE = "E0EBFB"
 COLOR_WHITE = "FFFFFF"
@@ -208,8 +216,83 @@ def gerar_excel_em_memoria(df_lote, consultor, data):
         return io.BytesIO()
 
 
+def _nome_arquivo_unico(base, extensao, usados):
+    """Nome `base + extensao`, ou `base_2 + extensao`, `base_3`... se o nome já estiver em `usados`."""
+    nome = f"{base}{extensao}"
+    n = 2
+    while nome in usados:
+        nome = f"{base}_{n}{extensao}"
+        n += 1
+    return nome
+
+
+def _arquivos_enviados(uploaded_files):
+    """Normaliza o retorno do file_uploader com múltiplos arquivos.
+
+    Retorna None (nada enviado), o próprio arquivo (apenas um) ou a lista completa,
+    que `load_data`/`peek_header` unificam em um único DataFrame.
+    """
+    if not uploaded_files:
+        return None
+    if len(uploaded_files) == 1:
+        return uploaded_files[0]
+    return list(uploaded_files)
+
+
+def _upload_id(uploaded_file):
+    """Identificador do upload atual (muda a cada novo envio, mesmo com o mesmo nome)."""
+    files = uploaded_file if isinstance(uploaded_file, list) else [uploaded_file]
+    return tuple(getattr(f, 'file_id', None) or getattr(f, 'name', str(f)) for f in files)
+
  
 
+def _higienizar_upload(uploaded_file):
+    """Carrega e limpa o upload da aba de higienização, guardando o resultado na sessão.
+
+    Retorna o relatório de tempos por etapa, ou None se o upload não puder ser higienizado
+    (o erro já foi exibido).
+    """
+    # Arquivos grandes são lidos em blocos para manter o uso de memória estável
+    use_streaming = getattr(uploaded_file, 'size', 0) >= STREAMING_THRESHOLD_BYTES
+    # A estrutura é reconhecida pelo cabeçalho e só as colunas usadas pelo seu perfil são carregadas
+    if use_streaming:
+        df_raw, structure_type, err = load_data_cached(uploaded_file, chunksize=DEFAULT_CHUNK_ROWS, usecols=PROFILE_USECOLS)
+    else:
+        # Leitura multi-thread com PyArrow e colunas de texto em string[pyarrow]
+        df_raw, structure_type, err = load_data_cached(uploaded_file, arrow=True, usecols=PROFILE_USECOLS)
+    if err:
+        st.error(err)
+        return
+
+    # DEBUG: Imprime as colunas do DataFrame carregado
+    if not use_streaming:
+        print(f"DEBUG: Colunas do DataFrame carregado: {df_raw.columns.tolist()}")
+
+    st.session_state.structure_type = structure_type # Atualiza o valor após a detecção
+
+    # O perfil da estrutura detectada define as colunas essenciais e o plano de limpeza
+    profile = get_structure_profile(st.session_state.structure_type)
+    if profile is None:
+        st.error("Estrutura de planilha desconhecida. Não é possível prosseguir com a higienização.")
+        st.session_state.df_clean = pd.DataFrame() # Garante que df_clean seja um DataFrame vazio
+        st.session_state.missing_cols = [] # Garante que missing_cols seja uma lista vazia
+        return # Sai da função para evitar o erro de desempacotamento
+
+    # Chama clean_and_filter_data com as colunas essenciais (e o relatório de tempos por etapa)
+    if use_streaming:
+        st.session_state.df_clean, st.session_state.missing_cols, _, stage_report = clean_and_filter_data_chunked(df_raw, essential_cols=profile["essential_cols"], profile=profile, report=True)
+    else:
+        # Listas grandes têm as etapas linha a linha divididas entre os núcleos do servidor
+        st.session_state.df_clean, st.session_state.missing_cols, _, stage_report = clean_and_filter_data(df_raw, essential_cols=profile["essential_cols"], profile=profile, report=True, workers=PARALLEL_WORKERS)
+    return stage_report
+
+
+def _export_indisponivel(err):
+    """A lista salva em disco expirou ou foi removida: avisa e força a remontagem no próximo rerun."""
+    st.session_state.pop("higienizacao_export", None)
+    st.error(f"A lista higienizada não está mais disponível ({err}). Envie o arquivo novamente ou recarregue a página.")
+
+
 def aba_higienizacao():
     # Garante que as variáveis de sessão estejam inicializadas
     if "structure_type" not in st.session_state:
@@ -221,50 +304,81 @@ def aba_higienizacao():
 
     st.header("Higienização e Geração de Listas - Assertiva e Lemit")
     st.info("Faça o upload de um arquivo enriquecido do Lemit ou Assertiva, o retorno será uma lista formatada pdf e o arquivo xlsx.")
-    uploaded_file = st.file_uploader("Faça upload do arquivo CSV Assertiva ou Lemit", type=["csv"], key="higienizacao_uploader")
+    uploaded_file = _arquivos_enviados(st.file_uploader("Faça upload do arquivo CSV Assertiva ou Lemit (um ou vários)", type=["csv"], key="higienizacao_uploader", accept_multiple_files=True))
     
     if uploaded_file:
-            df_raw, structure_type, err = load_data(uploaded_file)
+            # Reruns com o mesmo upload (ex: ao editar o nome do arquivo ou o título do PDF)
+            # reaproveitam o resultado da limpeza; o hash do conteúdo é calculado uma vez por upload
+            upload_keys = st.session_state.setdefault("upload_keys", {})
+            upload_id = _upload_id(uploaded_file)
+            if upload_id not in upload_keys:
+                upload_keys[upload_id] = upload_cache_key(uploaded_file)
+            df_header, err = peek_header(uploaded_file)
             if err:
                 st.error(err)
                 return
-            
-            # DEBUG: Imprime as colunas do DataFrame carregado
-            print(f"DEBUG: Colunas do DataFrame carregado: {df_raw.columns.tolist()}")
-
-            st.session_state.structure_type = structure_type # Atualiza o valor após a detecção
+            header_profile = get_structure_profile(detect_structure_type(df_header.columns))
+            result_key = None
+            if header_profile is not None:
+                result_key = clean_result_key(upload_keys[upload_id], header_profile["essential_cols"], "100 km", header_profile["name"])
+            suprimir = st.checkbox("Remover contatos já distribuídos anteriormente", value=True, key="higienizacao_suppression")
+
+            # A lista de exportação é montada e descarregada em disco uma vez por resultado de
+            # limpeza; nos reruns (ex: ao editar o nome do arquivo) a sessão guarda só um resumo.
+            export_token = (upload_id, result_key, suprimir)
+            export = st.session_state.get("higienizacao_export")
+            if export is None or export["token"] != export_token:
+                cached_result = get_clean_result(result_key)
+                if cached_result is not None:
+                    st.session_state.structure_type = header_profile["name"]
+                    df_clean, missing_cols, _, stage_report = cached_result
+                else:
+                    stage_report = _higienizar_upload(uploaded_file)
+                    if stage_report is None:
+                        return
+                    df_clean, missing_cols = st.session_state.df_clean, st.session_state.missing_cols
+                    put_clean_result(result_key, (df_clean, missing_cols, None, stage_report))
+                # O resultado fica no cache de limpeza e no spill; a sessão não guarda outra cópia
+                st.session_state.df_clean = pd.DataFrame()
+                st.session_state.missing_cols = missing_cols
+
+                removidos = 0
+                if suprimir and not df_clean.empty:
+                    # A Higienização só consulta o índice; quem registra são as abas que
+                    # entregam leads aos consultores
+                    df_clean, removidos = filter_suppressed(df_clean)
+
+                df_export = df_clean.drop(columns=['Distancia'], errors='ignore')
+                if not df_export.empty:
+                    save_temp_data(df_export, "df_export")
+                export = {
+                    "token": export_token,
+                    "rows": len(df_export),
+                    "preview": df_clean.head(50),
+                    "removidos": removidos,
+                    "stage_report": stage_report,
+                }
+                st.session_state.higienizacao_export = export
+                del df_clean, df_export
 
             st.success(f"Planilha {st.session_state.structure_type} Detectada")
 
-            # Determina as colunas essenciais com base na estrutura detectada
-            essential_cols_to_pass = [] # Inicializa com uma lista vazia
-            if st.session_state.structure_type == "Assertiva":
-                essential_cols_to_pass = ASSERTIVA_ESSENTIAL_COLS
-            elif st.session_state.structure_type == "Lemit":
-                essential_cols_to_pass = LEMIT_ESSENTIAL_COLS
-            else:
-                st.error("Estrutura de planilha desconhecida. Não é possível prosseguir com a higienização.")
-                st.session_state.df_clean = pd.DataFrame() # Garante que df_clean seja um DataFrame vazio
-                st.session_state.missing_cols = [] # Garante que missing_cols seja uma lista vazia
-                return # Sai da função para evitar o erro de desempacotamento
-
-            # Chama clean_and_filter_data com as colunas essenciais
-            st.session_state.df_clean, st.session_state.missing_cols, _ = clean_and_filter_data(df_raw, essential_cols=essential_cols_to_pass)
-
-            if st.session_state.df_clean.empty:
+            if export["stage_report"]:
+                with st.expander("Tempos de processamento por etapa", expanded=False):
+                    st.dataframe(stage_report_frame(export["stage_report"]))
+
+            if export["removidos"]:
+                st.info(f"{export['removidos']} contatos já distribuídos anteriormente foram removidos.")
+
+            if not export["rows"]:
                 st.warning("Atenção: Após a limpeza e filtragem, nenhum dado restou. Verifique os filtros aplicados e o mapeamento das colunas.")
                 return
 
-            st.dataframe(st.session_state.df_clean.head(50))
-            st.info(f"Linhas finais: {len(st.session_state.df_clean)}")
+            st.dataframe(export["preview"])
+            st.info(f"Linhas finais: {export['rows']}")
             if st.session_state.missing_cols:
                 st.warning(f"Colunas essenciais ausentes: {', '.join(st.session_state.missing_cols)}")
 
-            df_export = st.session_state.df_clean.drop(columns=['Distancia'], errors='ignore')
-            # Store export dataframe in session_state so download buttons and generators
-            # can consistently access the same buffer/DF instance.
-            st.session_state.df_export = df_export
-
             st.subheader("Opções de Exportação")
             if "filename" not in st.session_state:
                 st.session_state.filename = f"relatorio_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -282,7 +396,11 @@ def aba_higienizacao():
             with col1:
                 if st.button("Gerar e Baixar PDF"):
                     with st.spinner("Gerando PDF..."):
-                        pdf_buffer = create_pdf_robust(st.session_state.df_export, title=st.session_state.pdf_title)
+                        df_export, err = read_temp_data("df_export")
+                        if err:
+                            _export_indisponivel(err)
+                            return
+                        pdf_buffer = create_pdf_robust(df_export, title=st.session_state.pdf_title)
                         if pdf_buffer:
                             st.session_state.pdf_buffer = pdf_buffer
                             st.session_state.pdf_filename = final_output_filename + ".pdf"
@@ -292,8 +410,12 @@ def aba_higienizacao():
             with col2:
                 if st.button("Gerar e Baixar Excel (XLSX)"):
                     with st.spinner("Gerando Excel..."):
+                        df_export, err = read_temp_data("df_export")
+                        if err:
+                            _export_indisponivel(err)
+                            return
                         output = io.BytesIO()
-                        st.session_state.df_export.to_excel(output, index=False)
+                        df_export.to_excel(output, index=False)
                         output.seek(0)
                         st.session_state.excel_buffer = output
                         st.session_state.excel_filename = final_output_filename + ".xlsx"
@@ -323,11 +445,11 @@ def aba_higienizacao():
 def aba_divisor_listas():
     st.header("Divisor de Listas de Leads - Automoveis")
     st.info("Faça o upload de um arquivo com campos de 'Nome' e 'Celular'. Não é obrigatório ser exatamente os nomes.")
-    uploaded_file = st.file_uploader("Faça upload do arquivo XLSX com os leads", type=["xlsx"], key="divisor_uploader")
+    uploaded_file = _arquivos_enviados(st.file_uploader("Faça upload do arquivo XLSX com os leads (um ou vários)", type=["xlsx"], key="divisor_uploader", accept_multiple_files=True))
     
     if uploaded_file:
-        # Load raw data immediately after upload to get columns for mapping
-        df_raw_leads, _, err = load_data(uploaded_file)
+        # Lê apenas o cabeçalho para o mapeamento; o arquivo completo só é parseado ao processar
+        df_header, err = peek_header(uploaded_file)
         if err:
             st.error(err)
             return
@@ -373,11 +495,12 @@ def aba_divisor_listas():
         )
 
         leads_per_consultant = st.number_input("Quantidade de leads por consultor", min_value=1, value=50, help="Defina quantos leads cada consultor receberá por vez.")
+        ignorar_distribuidos = st.checkbox("Remover leads já distribuídos anteriormente", value=True, key="divisor_suppression")
 
         st.subheader("Mapeamento de Colunas de Entrada")
         st.info("O sistema tentará mapear as colunas 'NOME' e 'Whats' automaticamente. Verifique e ajuste se necessário.")
 
-        df_leads_cols = df_raw_leads.columns.tolist()
+        df_leads_cols = df_header.columns.tolist()
         expected_cols_divisor = ["NOME", "Whats", "CEL"]
         
         # Sugestões de nomes de colunas para pré-seleção automática
@@ -425,6 +548,12 @@ def aba_divisor_listas():
                         st.warning("A coluna 'NOME' é obrigatória para a distribuição de leads.")
                         return
 
+                    # As listas geradas levam todas as colunas do arquivo, então aqui a carga é completa
+                    df_raw_leads, _, err = load_data_cached(uploaded_file)
+                    if err:
+                        st.error(err)
+                        return
+
                     # Apply mapping and rename DataFrame
                     df_leads_mapped = df_raw_leads.copy()
                     for expected, actual in user_col_mapping.items():
@@ -452,6 +581,11 @@ def aba_divisor_listas():
                     else:
                         st.warning("A coluna 'Whats' não foi mapeada. Nenhuma filtragem por WhatsApp foi aplicada.")
 
+                    if ignorar_distribuidos:
+                        df_leads_mapped, removidos = filter_suppressed(df_leads_mapped)
+                        if removidos:
+                            st.info(f"{removidos} leads já distribuídos anteriormente foram removidos.")
+
                     if df_leads_mapped.empty:
                         st.warning("Após a filtragem, não restaram leads para distribuir.")
                         return
@@ -482,70 +616,65 @@ def aba_divisor_listas():
                     
                     zip_buffer = io.BytesIO()
                     with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-                        leads_processados = 0
-                        data_atual = start_date
-                        total_leads = len(df_leads_mapped)
                         arquivos_gerados = 0
 
-                        while leads_processados < total_leads:
-                            for consultor in effective_consultores:
-                                if leads_processados >= total_leads: 
-                                    break
-
-                                inicio_lote = leads_processados
-                                fim_lote = leads_processados + leads_per_consultant
-                                st.info(f"Processando leads de {inicio_lote} a {fim_lote} para o consultor {consultor}")
-                                df_lote = df_leads_mapped.iloc[inicio_lote:fim_lote].copy()
-
-                                # Convert numeric columns to string
-                                for col in df_lote.columns:
-                                    if pd.api.types.is_numeric_dtype(df_lote[col]):
-                                        df_lote[col] = df_lote[col].astype('Int64').astype(str).replace('<NA>', '')
-
-                                # Define and ensure checkbox columns
-                                cols_to_center = ["1º Contato", "2º Contato", "3º Contato", "Atend. Lig.(S/N)", "Visita Marc.(S/N)"]
-                                cols_single_checkbox = ["1º Contato", "2º Contato", "3º Contato"]
-                                cols_double_checkbox = ["Atend. Lig.(S/N)", "Visita Marc.(S/N)"]
-
-                                for col in cols_single_checkbox:
-                                    if col not in df_lote.columns:
-                                        df_lote[col] = "☐"
-                                    else:
-                                        df_lote[col] = "☐"
+                        # Plano do rodízio: um lote por consultor e por dia útil
+                        plano = plano_distribuicao(len(df_leads_mapped), len(effective_consultores), leads_per_consultant, start_date)
+                        for lote in lotes_do_plano(plano).itertuples(index=False):
+                            consultor = effective_consultores[lote.consultor]
+                            data_atual = lote.data
+                            st.info(f"Processando leads de {lote.inicio} a {lote.fim} para o consultor {consultor}")
+                            df_lote = df_leads_mapped.iloc[lote.inicio:lote.fim].copy()
+                            # A coluna de origem (upload de vários arquivos) não vai para as listas
+                            df_lote.drop(columns=[SOURCE_FILE_COL], errors='ignore', inplace=True)
+
+                            # Convert numeric columns to string
+                            for col in df_lote.columns:
+                                if pd.api.types.is_numeric_dtype(df_lote[col]):
+                                    df_lote[col] = df_lote[col].astype('Int64').astype(str).replace('<NA>', '')
+
+                            # Define and ensure checkbox columns
+                            cols_to_center = ["1º Contato", "2º Contato", "3º Contato", "Atend. Lig.(S/N)", "Visita Marc.(S/N)"]
+                            cols_single_checkbox = ["1º Contato", "2º Contato", "3º Contato"]
+                            cols_double_checkbox = ["Atend. Lig.(S/N)", "Visita Marc.(S/N)"]
+
+                            for col in cols_single_checkbox:
+                                if col not in df_lote.columns:
+                                    df_lote[col] = "☐"
+                                else:
+                                    df_lote[col] = "☐"
+                            
+                            for col in cols_double_checkbox:
+                                if col not in df_lote.columns:
+                                    df_lote[col] = "☐   ☐"
+                                else:
+                                    df_lote[col] = "☐   ☐"
+                            
+                            if not df_lote.empty:
+                                excel_buffer = gerar_excel_em_memoria(df_lote, consultor, data_atual)
                                 
-                                for col in cols_double_checkbox:
-                                    if col not in df_lote.columns:
-                                        df_lote[col] = "☐   ☐"
-                                    else:
-                                        df_lote[col] = "☐   ☐"
+                                primeiro_nome = consultor.split(' ')[0]
+                                data_formatada_nome = data_atual.strftime('%d_%m_%Y')
+                                nome_arquivo_base = f"LEADS_AUTOMOVEIS_{primeiro_nome.upper()}_{data_formatada_nome}"
                                 
-                                if not df_lote.empty:
-                                    excel_buffer = gerar_excel_em_memoria(df_lote, consultor, data_atual)
-                                    
-                                    primeiro_nome = consultor.split(' ')[0]
-                                    data_formatada_nome = data_atual.strftime('%d_%m_%Y')
-                                    nome_arquivo_base = f"LEADS_AUTOMOVEIS_{primeiro_nome.upper()}_{data_formatada_nome}"
-                                    
-                                    # Buscar equipe do consultor via JSON
-                                    nome_equipe = "Outros"
-                                    for equipe in equipes_json:
-                                        if consultor in equipe["consultores"]:
-                                            nome_equipe = equipe["nome"]
-                                            break
-                                    zip_file.writestr(f"{nome_equipe}/{nome_arquivo_base}.xlsx", excel_buffer.getvalue())
-
-                                    pdf_title = f"Leads Automoveis - {primeiro_nome} {data_atual.strftime('%d/%m')}"
-                                    pdf_buffer = create_pdf_robust(df_lote, title=pdf_title, cols_to_center=cols_to_center, cols_single_checkbox=cols_single_checkbox, cols_double_checkbox=cols_double_checkbox)
-                                    
-                                    if pdf_buffer:
-                                        zip_file.writestr(f"{nome_equipe}/{nome_arquivo_base}.pdf", pdf_buffer.getvalue())
-                                    
-                                    leads_processados += len(df_lote)
-                                    arquivos_gerados += 1
-
-                            data_atual = proximo_dia_util(data_atual)
+                                # Buscar equipe do consultor via JSON
+                                nome_equipe = "Outros"
+                                for equipe in equipes_json:
+                                    if consultor in equipe["consultores"]:
+                                        nome_equipe = equipe["nome"]
+                                        break
+                                zip_file.writestr(f"{nome_equipe}/{nome_arquivo_base}.xlsx", excel_buffer.getvalue())
+
+                                pdf_title = f"Leads Automoveis - {primeiro_nome} {data_atual.strftime('%d/%m')}"
+                                pdf_buffer = create_pdf_robust(df_lote, title=pdf_title, cols_to_center=cols_to_center, cols_single_checkbox=cols_single_checkbox, cols_double_checkbox=cols_double_checkbox)
+                                
+                                if pdf_buffer:
+                                    zip_file.writestr(f"{nome_equipe}/{nome_arquivo_base}.pdf", pdf_buffer.getvalue())
+                                
+                                arquivos_gerados += 1
                     
                     st.success(f"Processo concluído! {arquivos_gerados} pares de listas (Excel e PDF) foram gerados.")
+                    record_distributed(df_leads_mapped)
 
                     
 
@@ -579,13 +708,13 @@ def aba_gerador_negocios_robos():
     if source_mode == 'handoff':
         st.info("Gerando negócios a partir dos leads recém-criados na aba anterior.")
         
-        generated_files = st.session_state.get('generated_pessoas_files', {})
-        if not generated_files:
+        handoff = st.session_state.get('pessoas_handoff')
+        if not handoff or handoff["manifesto"].empty:
             st.error("Não foram encontrados dados de leads para processar. Por favor, gere os arquivos na aba 'Automação Pessoas Agendor' primeiro.")
             st.session_state.handoff_active = False # Limpa a flag
             return
 
-        st.subheader(f"{len(generated_files)} arquivo(s) de 'Pessoas' pronto(s) para processar.")
+        st.subheader(f"{len(handoff['manifesto'])} arquivo(s) de 'Pessoas' pronto(s) para processar.")
 
         # --- Configurações de Negócio (Interface Simplificada) ---
         st.subheader("Configurações para Geração de Negócios")
@@ -602,8 +731,8 @@ def aba_gerador_negocios_robos():
             sufixo_localidade = st.text_input("Sufixo de Localidade (opcional, ex: CG, MS)", value="", key="sufixo_handoff")
         
         if st.button("Gerar Arquivos de Negócios", key="btn_gerar_handoff"):
-            # A lógica de geração usará `generated_files` do session_state
-            processar_e_gerar_negocios(negocios_por_consultor, start_date_negocios, nicho_principal, sufixo_localidade, source_data=generated_files)
+            # A geração lê a planilha de Pessoas e o manifesto guardados no session_state
+            processar_e_gerar_negocios(negocios_por_consultor, start_date_negocios, nicho_principal, sufixo_localidade, handoff=handoff)
             # Limpa a flag após o processo
             st.session_state.handoff_active = False
             st.session_state.source_for_negocios = 'upload' # Reseta para o padrão
@@ -611,7 +740,7 @@ def aba_gerador_negocios_robos():
     # MODO 2: Upload de arquivo cru
     else:
         st.info("Faça o upload de um arquivo de leads (XLSX ou CSV) para iniciar a geração de negócios.")
-        uploaded_file = st.file_uploader("Selecione um arquivo de leads", type=["xlsx", "csv"], key="negocios_uploader")
+        uploaded_file = _arquivos_enviados(st.file_uploader("Selecione um ou mais arquivos de leads", type=["xlsx", "csv"], key="negocios_uploader", accept_multiple_files=True))
 
         if uploaded_file:
             # Reset handoff state if a new file is uploaded in raw mode
@@ -619,16 +748,17 @@ def aba_gerador_negocios_robos():
                 st.session_state.handoff_active = False
                 st.session_state.source_for_negocios = 'upload'
 
-            df_raw_leads, _, err = load_data(uploaded_file)
+            # Apenas o cabeçalho e algumas linhas para pré-visualização; a carga projetada vem depois
+            df_header, err = peek_header(uploaded_file, nrows=5)
             if err:
                 st.error(err)
                 return
 
-            st.dataframe(df_raw_leads.head())
+            st.dataframe(df_header)
 
             # --- Mapeamento de Colunas ---
             st.subheader("1. Mapeamento de Colunas")
-            df_cols = df_raw_leads.columns.tolist()
+            df_cols = df_header.columns.tolist()
 
             # Heurística de pré-seleção: tenta detectar automaticamente as colunas de Nome e WhatsApp
             df_cols_lower_map = {c.lower(): c for c in df_cols}
@@ -712,6 +842,12 @@ def aba_gerador_negocios_robos():
                 if not effective_consultores:
                     st.error("Nenhum consultor foi selecionado para a distribuição. Verifique os filtros.")
                     return
+
+                # Carga projetada: apenas as colunas de Nome e WhatsApp são parseadas
+                df_raw_leads, _, err = load_data_cached(uploaded_file, usecols=[nome_col, whats_col])
+                if err:
+                    st.error(err)
+                    return
                 
                 # Preparar o DataFrame
                 df_renamed = df_raw_leads.rename(columns={nome_col: "Nome", whats_col: "WhatsApp"})
@@ -733,114 +869,92 @@ def aba_gerador_negocios_robos():
                 )
 
 
-def processar_e_gerar_negocios(negocios_por_consultor, start_date_negocios, nicho_principal, sufixo_localidade, source_data=None, df_raw=None, col_mapping=None, effective_consultores=None):
+COLUNAS_NEGOCIOS = [
+    "Título do negócio", "Empresa relacionada", "Pessoa relacionada",
+    "Usuário responsável", "Data de início", "Data de conclusão",
+    "Valor Total", "Funil", "Etapa", "Status", "Motivo de perda",
+    "Descrição do motivo de perda", "Ranking", "Descrição", "Produtos e Serviços"
+]
+
+
+def montar_linhas_negocios(nomes, usuario_responsavel, whatsapp, data_arquivo, nicho_principal, sufixo_localidade):
+    """Monta a planilha de Negócios de um arquivo (um dia), coluna a coluna.
+
+    As strings de data e o prefixo do título são calculados uma vez para o arquivo;
+    `whatsapp` já vem limpo (dígitos ou NaN) e vira "+55..." na Data de conclusão.
+    `usuario_responsavel` é um único usuário ou um array com o usuário de cada lead.
+    """
+    nomes = pd.Series(np.asarray(nomes, dtype=object), dtype=object)
+    n = len(nomes)
+
+    nicho_formatado_titulo = nicho_principal.upper()
+    if sufixo_localidade:
+        nicho_formatado_titulo += f" {sufixo_localidade.upper()}"
+    prefixo_titulo = f"{data_arquivo.strftime('%m/%y')} - RB - {nicho_formatado_titulo} - "
+
+    whatsapp = pd.Series(np.asarray(whatsapp, dtype=object), dtype=object)
+    whatsapp = whatsapp.where(whatsapp.notna(), "").astype(str).to_numpy(dtype=object)
+
+    def constante(valor):
+        return np.full(n, valor, dtype=object)
+
+    dados = {col: constante("") for col in COLUNAS_NEGOCIOS}
+    dados.update({
+        "Título do negócio": (prefixo_titulo + nomes.astype(str) + "/ESPs").to_numpy(dtype=object),
+        "Pessoa relacionada": nomes.to_numpy(dtype=object),
+        "Usuário responsável": np.asarray(usuario_responsavel, dtype=object) if np.ndim(usuario_responsavel) else constante(usuario_responsavel),
+        "Data de início": constante(data_arquivo.strftime('%d/%m/%Y')),
+        # WhatsApp com DDI +55
+        "Data de conclusão": np.where(whatsapp != "", "+55" + whatsapp, ""),
+        "Funil": constante("Funil de Vendas"),
+        "Etapa": constante("Prospecção"),
+        "Status": constante("Em andamento"),
+    })
+    return pd.DataFrame(dados, columns=COLUNAS_NEGOCIOS).infer_objects()
+
+
+def processar_e_gerar_negocios(negocios_por_consultor, start_date_negocios, nicho_principal, sufixo_localidade, handoff=None, df_raw=None, col_mapping=None, effective_consultores=None):
     """Função unificada para gerar arquivos de negócios."""
     with st.spinner("Gerando arquivos de Negócios... Por favor, aguarde."):
         all_generated_files = {}
 
-        if source_data is not None: # Modo Handoff ou Upload pré-processado
-            for file_name, file_data in source_data.items():
+        if handoff is not None: # Modo Handoff: planilhas de Pessoas já montadas, sem reler xlsx
+            consultores_gerados = []
+            for consultor, leads_do_consultor in consultores_do_handoff(handoff):
                 try:
-                    df_pessoas = pd.read_excel(io.BytesIO(file_data))
-                    # Extrair o nome do consultor do nome do arquivo de pessoas
-                    file_name_only = os.path.basename(file_name)
-                    file_name_parts = file_name_only.replace(".xlsx", "").split('_')
-                    consultor_nome_arquivo = ""
-                    if len(file_name_parts) >= 4:
-                        consultor_nome_arquivo = file_name_parts[3] # Pega o nome do consultor
-                    
-                    if not consultor_nome_arquivo:
-                        st.warning(f"Não foi possível extrair o nome do consultor do arquivo: {file_name_only}. Pulando este arquivo.")
-                        continue
-
-                    # Colunas da planilha de Negócios
-                    colunas_negocios = [
-                        "Título do negócio", "Empresa relacionada", "Pessoa relacionada",
-                        "Usuário responsável", "Data de início", "Data de conclusão",
-                        "Valor Total", "Funil", "Etapa", "Status", "Motivo de perda",
-                        "Descrição do motivo de perda", "Ranking", "Descrição", "Produtos e Serviços"
-                    ]
-
-                    leads_do_consultor = df_pessoas.copy()
-                    
-                    # Garantir que as colunas essenciais existam
-                    required_cols_pessoas = ["Nome", "Usuário responsável", "WhatsApp"]
-                    if not all(col in leads_do_consultor.columns for col in required_cols_pessoas):
-                        st.warning(f"Arquivo {file_name_only} não contém todas as colunas essenciais (Nome, Usuário responsável, WhatsApp). Pulando este arquivo.")
-                        continue
-
-                    # Limpar e formatar WhatsApp para uso em Data de Conclusão
-                    leads_do_consultor["WhatsApp_Clean"] = leads_do_consultor["WhatsApp"].apply(clean_phone_number)
-                    leads_do_consultor["WhatsApp_Clean"] = leads_do_consultor["WhatsApp_Clean"].apply(lambda x: str(x) if pd.notna(x) else "")
-
-                    num_leads_consultor = len(leads_do_consultor)
-                    leads_processados_consultor = 0
-                    current_date = start_date_negocios
-                    file_counter = 1
-
-                    while leads_processados_consultor < num_leads_consultor:
-                        inicio_lote = leads_processados_consultor
-                        fim_lote = min(leads_processados_consultor + negocios_por_consultor, num_leads_consultor)
-                        df_lote_negocios = leads_do_consultor.iloc[inicio_lote:fim_lote].copy()
-
-                        if not df_lote_negocios.empty:
-                            dados_negocios = []
-                            for _, row_lead in df_lote_negocios.iterrows():
-                                nome_pessoa = row_lead.get("Nome", "")
-                                usuario_responsavel = row_lead.get("Usuário responsável", "")
-                                whatsapp_lead = row_lead.get("WhatsApp_Clean", "")
-                                # Garantir DDI +55 no campo usado para Data de conclusão
-                                whatsapp_lead_full = f"+55{whatsapp_lead}" if whatsapp_lead else ""
-
-                                # Formatar Título do negócio usando a data do arquivo (current_date)
-                                mes_ano = current_date.strftime('%m/%y')
-                                nicho_formatado_titulo = nicho_principal.upper()
-                                if sufixo_localidade:
-                                    nicho_formatado_titulo += f" {sufixo_localidade.upper()}"
-                                
-                                titulo_negocio = f"{mes_ano} - RB - {nicho_formatado_titulo} - {nome_pessoa}/ESPs"
-
-                                linha_negocio = {
-                                    "Título do negócio": titulo_negocio,
-                                    "Empresa relacionada": "", # Deixar em branco
-                                    "Pessoa relacionada": nome_pessoa,
-                                    "Usuário responsável": usuario_responsavel,
-                                    "Data de início": current_date.strftime('%d/%m/%Y'),
-                                    "Data de conclusão": whatsapp_lead_full, # WhatsApp com DDI +55
-                                    "Valor Total": "", # Deixar em branco
-                                    "Funil": "Funil de Vendas",
-                                    "Etapa": "Prospecção",
-                                    "Status": "Em andamento",
-                                    "Motivo de perda": "", # Deixar em branco
-                                    "Descrição do motivo de perda": "", # Deixar em branco
-                                    "Ranking": "", # Deixar em branco
-                                    "Descrição": "", # Deixar em branco
-                                    "Produtos e Serviços": "" # Deixar em branco
-                                }
-                                dados_negocios.append(linha_negocio)
-                            
-                            df_final_negocios = pd.DataFrame(dados_negocios, columns=colunas_negocios)
-
-                            output_excel_negocios = io.BytesIO()
-                            with pd.ExcelWriter(output_excel_negocios, engine='openpyxl') as writer:
-                                df_final_negocios.to_excel(writer, index=False)
-                            output_excel_negocios.seek(0)
-
-                            # Nome do arquivo de negócios
-                            nome_arquivo_negocios = f"NEGOCIOS_{consultor_nome_arquivo.upper()}_{nicho_principal.upper()}"
-                            if sufixo_localidade:
-                                nome_arquivo_negocios += f"_{sufixo_localidade.upper()}"
-                            nome_arquivo_negocios += f"_{current_date.strftime('%d-%m-%Y')}.xlsx"
-                            
-                            all_generated_files[nome_arquivo_negocios] = output_excel_negocios.getvalue()
+                    consultores_gerados.append(consultor)
+
+                    # Limpar WhatsApp ("+55...") para uso em Data de Conclusão
+                    whatsapp_clean = leads_do_consultor["WhatsApp"].apply(clean_phone_number)
+
+                    # Todos os leads do consultor num único plano, em arquivos de `negocios_por_consultor`, um por dia útil
+                    plano = plano_distribuicao(len(leads_do_consultor), 1, negocios_por_consultor, start_date_negocios)
+                    for lote in lotes_do_plano(plano).itertuples(index=False):
+                        df_lote_negocios = leads_do_consultor.iloc[lote.inicio:lote.fim]
+                        current_date = lote.data
+
+                        df_final_negocios = montar_linhas_negocios(
+                            df_lote_negocios["Nome"], df_lote_negocios["Usuário responsável"],
+                            whatsapp_clean.iloc[lote.inicio:lote.fim], current_date, nicho_principal, sufixo_localidade
+                        )
+
+                        output_excel_negocios = io.BytesIO()
+                        with pd.ExcelWriter(output_excel_negocios, engine='openpyxl') as writer:
+                            df_final_negocios.to_excel(writer, index=False)
+                        output_excel_negocios.seek(0)
 
-                            leads_processados_consultor += len(df_lote_negocios)
-                            current_date = proximo_dia_util(current_date) # Avança a data para o próximo arquivo
-                            file_counter += 1
+                        # Nome do arquivo de negócios
+                        nome_arquivo_negocios = f"NEGOCIOS_{consultor.split(' ')[0].upper()}_{nicho_principal.upper()}"
+                        if sufixo_localidade:
+                            nome_arquivo_negocios += f"_{sufixo_localidade.upper()}"
+                        nome_arquivo_negocios += f"_{current_date.strftime('%d-%m-%Y')}"
+                        nome_arquivo_negocios = _nome_arquivo_unico(nome_arquivo_negocios, ".xlsx", all_generated_files)
+
+                        all_generated_files[nome_arquivo_negocios] = output_excel_negocios.getvalue()
 
                 except Exception as e:
-                    logging.exception(f"Erro ao processar o arquivo {file_name}")
-                    st.error(f"Erro ao processar o arquivo {file_name}: {e}")
+                    logging.exception(f"Erro ao processar os leads de {consultor}")
+                    st.error(f"Erro ao processar os leads de {consultor}: {e}")
                     continue
         
         else: # Modo de upload de arquivo cru (df_raw, col_mapping, effective_consultores)
@@ -857,139 +971,214 @@ def processar_e_gerar_negocios(negocios_por_consultor, start_date_negocios, nich
                 st.warning("Após a filtragem, não restaram leads para distribuir.")
                 return
 
-            # Distribuir leads entre consultores
-            leads_por_consultor_dist = np.array_split(df_renamed, len(effective_consultores))
-            
-            # Colunas da planilha de Negócios
-            colunas_negocios = [
-                "Título do negócio", "Empresa relacionada", "Pessoa relacionada",
-                "Usuário responsável", "Data de início", "Data de conclusão",
-                "Valor Total", "Funil", "Etapa", "Status", "Motivo de perda",
-                "Descrição do motivo de perda", "Ranking", "Descrição", "Produtos e Serviços"
-            ]
-
-            leads_processados = 0
-            current_date = start_date_negocios
-            file_counter = 1
-
-            for i, consultor in enumerate(effective_consultores):
-                # Colunas da planilha de Negócios
-                colunas_negocios = [
-                    "Título do negócio", "Empresa relacionada", "Pessoa relacionada",
-                    "Usuário responsável", "Data de início", "Data de conclusão",
-                    "Valor Total", "Funil", "Etapa", "Status", "Motivo de perda",
-                    "Descrição do motivo de perda", "Ranking", "Descrição", "Produtos e Serviços"
-                ]
-
-                current_date = start_date_negocios
-                file_counter = 1
-
-                for consultor in effective_consultores:
-                    df_consultor = df_renamed.copy()
-                    total_leads = len(df_consultor)
-                    leads_processados = 0
-                    while leads_processados < total_leads:
-                        inicio_lote = leads_processados
-                        fim_lote = min(leads_processados + negocios_por_consultor, total_leads)
-                        df_lote_negocios = df_consultor.iloc[inicio_lote:fim_lote].copy()
-                        if not df_lote_negocios.empty:
-                            dados_negocios = []
-                            for _, row_lead in df_lote_negocios.iterrows():
-                                nome_pessoa = row_lead.get("Nome", "")
-                                usuario_responsavel = consultor.lower().replace(' ', '.')
-                                whatsapp_lead = row_lead.get("WhatsApp", "")
-                                cleaned = clean_phone_number(whatsapp_lead)
-                                whatsapp_lead_clean = str(cleaned) if pd.notna(cleaned) else ""
-                                # Garantir DDI +55 no campo usado para Data de conclusão
-                                whatsapp_lead_full = f"+55{whatsapp_lead_clean}" if whatsapp_lead_clean else ""
-
-                                # Use the file's current_date for month/year in title
-                                mes_ano = current_date.strftime('%m/%y')
-                                nicho_formatado_titulo = nicho_principal.upper()
-                                if sufixo_localidade:
-                                    nicho_formatado_titulo += f" {sufixo_localidade.upper()}"
-                                titulo_negocio = f"{mes_ano} - RB - {nicho_formatado_titulo} - {nome_pessoa}/ESPs"
-
-                                linha_negocio = {
-                                    "Título do negócio": titulo_negocio,
-                                    "Empresa relacionada": "",
-                                    "Pessoa relacionada": nome_pessoa,
-                                    "Usuário responsável": usuario_responsavel,
-                                    "Data de início": current_date.strftime('%d/%m/%Y'),
-                                    "Data de conclusão": whatsapp_lead_full,
-                                    "Valor Total": "",
-                                    "Funil": "Funil de Vendas",
-                                    "Etapa": "Prospecção",
-                                    "Status": "Em andamento",
-                                    "Motivo de perda": "",
-                                    "Descrição do motivo de perda": "",
-                                    "Ranking": "",
-                                    "Descrição": "",
-                                    "Produtos e Serviços": ""
-                                }
-                                dados_negocios.append(linha_negocio)
-                            df_final_negocios = pd.DataFrame(dados_negocios, columns=colunas_negocios)
-
-                            output_excel_negocios = io.BytesIO()
-                            with pd.ExcelWriter(output_excel_negocios, engine='openpyxl') as writer:
-                                df_final_negocios.to_excel(writer, index=False)
-                            output_excel_negocios.seek(0)
-
-                            primeiro_nome_consultor = consultor.split(' ')[0].upper()
-                            nome_arquivo_negocios = f"NEGOCIOS_{primeiro_nome_consultor}_{nicho_principal.upper()}"
-                            if sufixo_localidade:
-                                nome_arquivo_negocios += f"_{sufixo_localidade.upper()}"
-                            nome_arquivo_negocios += f"_{current_date.strftime('%d-%m-%Y')}.xlsx"
-
-                            all_generated_files[nome_arquivo_negocios] = output_excel_negocios.getvalue()
-
-                            leads_processados += len(df_lote_negocios)
-                            current_date = proximo_dia_util(current_date)
-                            file_counter += 1
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-                for file_name_in_zip, file_data in all_generated_files.items():
-                    zip_file.writestr(file_name_in_zip, file_data)
-            # Nome do zip: se só um consultor, usa o nome dele, senão usa "varios"
-            if len(effective_consultores) == 1:
-                # Buscar usuário do consultor
-                usuario = None
-                try:
-                    with open(CONSULTORES_FILE, "r", encoding="utf-8") as f:
-                        consultores_data = json.load(f)
-                        for c in consultores_data:
-                            if c["consultor"].strip().lower() == effective_consultores[0].strip().lower():
-                                usuario = c["usuario"].replace(" ", "_").lower()
-                                break
-                except Exception:
-                    usuario = effective_consultores[0].replace(" ", "_").lower()
-                zip_filename = f"Negocios_Robos_{usuario}.zip"
-            else:
-                zip_filename = f"Negocios_Robos_varios.zip"
-            st.download_button(
-                label="Baixar Todos os Arquivos de Negócios (ZIP)",
-                data=zip_buffer.getvalue(),
-                file_name=zip_filename,
-                mime="application/zip",
-                key="download_negocios_zip"
-            )
-            st.success(f"Processo concluído! {len(all_generated_files)} arquivos de Negócios gerados.")
-            # Reset session state flags after successful generation
-            st.session_state.handoff_active = False
-            st.session_state.source_for_negocios = 'upload'
+            # Cada lead vai para um único consultor; cada (consultor, dia) vira um único arquivo
+            plano = plano_distribuicao(len(df_renamed), len(effective_consultores), negocios_por_consultor, start_date_negocios)
+            for lote in lotes_do_plano(plano).itertuples(index=False):
+                df_lote_negocios = df_renamed.iloc[lote.inicio:lote.fim]
+                consultor = effective_consultores[lote.consultor]
+                current_date = lote.data
+                usuario_responsavel = consultor.lower().replace(' ', '.')
+                # O WhatsApp já foi limpo na preparação do DataFrame
+                df_final_negocios = montar_linhas_negocios(
+                    df_lote_negocios["Nome"], usuario_responsavel, df_lote_negocios["WhatsApp"],
+                    current_date, nicho_principal, sufixo_localidade
+                )
+
+                output_excel_negocios = io.BytesIO()
+                with pd.ExcelWriter(output_excel_negocios, engine='openpyxl') as writer:
+                    df_final_negocios.to_excel(writer, index=False)
+                output_excel_negocios.seek(0)
+
+                primeiro_nome_consultor = consultor.split(' ')[0].upper()
+                nome_arquivo_negocios = f"NEGOCIOS_{primeiro_nome_consultor}_{nicho_principal.upper()}"
+                if sufixo_localidade:
+                    nome_arquivo_negocios += f"_{sufixo_localidade.upper()}"
+                nome_arquivo_negocios += f"_{current_date.strftime('%d-%m-%Y')}"
+                nome_arquivo_negocios = _nome_arquivo_unico(nome_arquivo_negocios, ".xlsx", all_generated_files)
+
+                all_generated_files[nome_arquivo_negocios] = output_excel_negocios.getvalue()
+
+            consultores_gerados = effective_consultores
+
         if not all_generated_files:
             st.warning("Nenhum arquivo de Negócios foi gerado. Verifique os arquivos de entrada e as configurações.")
+            return
+
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
+            for file_name_in_zip, file_data in all_generated_files.items():
+                zip_file.writestr(file_name_in_zip, file_data)
+        # Nome do zip: se só um consultor, usa o nome dele, senão usa "varios"
+        if len(consultores_gerados) == 1:
+            # Buscar usuário do consultor
+            usuario = None
+            try:
+                with open(CONSULTORES_FILE, "r", encoding="utf-8") as f:
+                    consultores_data = json.load(f)
+                    for c in consultores_data:
+                        if c["consultor"].strip().lower() == consultores_gerados[0].strip().lower():
+                            usuario = c["usuario"].replace(" ", "_").lower()
+                            break
+            except Exception:
+                usuario = consultores_gerados[0].replace(" ", "_").lower()
+            zip_filename = f"Negocios_Robos_{usuario}.zip"
+        else:
+            zip_filename = f"Negocios_Robos_varios.zip"
+        st.download_button(
+            label="Baixar Todos os Arquivos de Negócios (ZIP)",
+            data=zip_buffer.getvalue(),
+            file_name=zip_filename,
+            mime="application/zip",
+            key="download_negocios_zip"
+        )
+        st.success(f"Processo concluído! {len(all_generated_files)} arquivos de Negócios gerados.")
+        # Reset session state flags after successful generation
+        st.session_state.handoff_active = False
+        st.session_state.source_for_negocios = 'upload'
+
 
 
 
+COLUNAS_PESSOAS_AGENDOR = [
+    "Nome", "CPF", "Empresa", "Cargo", "Aniversário", "Ano de nascimento",
+    "Usuário responsável", "Categoria", "Origem", "Descrição", "E-mail",
+    "WhatsApp", "Telefone", "Celular", "Fax", "Ramal", "CEP", "País",
+    "Estado", "Cidade", "Bairro", "Rua", "Número", "Complemento",
+    "Produto", "Facebook", "Twitter", "LinkedIn", "Skype", "Instagram", "Ranking"
+]
+
+
+def _coluna_ou_vazio(df, col):
+    """Valores da coluna como array object, ou None se a coluna não existe."""
+    return df[col].to_numpy(dtype=object) if col in df.columns else None
+
+
+def montar_linhas_pessoas(df_leads, usuario_responsavel, cargo, descricao, uf):
+    """Monta a planilha de Pessoas do Agendor para os leads, coluna a coluna.
+
+    `usuario_responsavel` é um único usuário ou um array com o usuário de cada lead, o que
+    permite montar todos os lotes de uma vez. O resultado é o mesmo do antigo laço por
+    linha: WhatsApp com +55, descrição caindo para Razão Social/Fantasia/Empresa e CEP
+    normalizado (uma vez por valor distinto).
+    """
+    n = len(df_leads)
+    vazio = np.full(n, "", dtype=object)
+    dados = {col: vazio for col in COLUNAS_PESSOAS_AGENDOR}
+
+    def constante(valor):
+        return np.full(n, valor, dtype=object)
+
+    whats = _coluna_ou_vazio(df_leads, "Whats")
+    if whats is not None:
+        texto = pd.Series(whats, dtype=object).astype(str).str.strip().to_numpy(dtype=object)
+        preenchido = whats.astype(bool) & pd.notna(whats) & (texto != "")
+        dados["WhatsApp"] = np.where(preenchido, "+55" + texto, "")
+
+    cel = _coluna_ou_vazio(df_leads, "CEL")
+    if cel is not None:
+        preenchido = cel.astype(bool) & pd.notna(cel)
+        dados["Celular"] = np.where(preenchido, pd.Series(cel, dtype=object).astype(str).to_numpy(dtype=object), "")
+
+    descricao_padrao = descricao.strip() if descricao and str(descricao).strip() else None
+    if descricao_padrao:
+        dados["Descrição"] = constante(descricao_padrao)
+    else:
+        # Mesmo encadeamento de `or` do laço por linha: o primeiro valor verdadeiro vence
+        descricoes = vazio.copy()
+        definido = np.zeros(n, dtype=bool)
+        for col in ("Razao Social", "Fantasia", "Empresa"):
+            valores = _coluna_ou_vazio(df_leads, col)
+            if valores is None:
+                continue
+            usar = valores.astype(bool) & ~definido
+            descricoes[usar] = valores[usar]
+            definido |= usar
+        dados["Descrição"] = descricoes
+
+    cep = _coluna_ou_vazio(df_leads, "CEP")
+    if cep is not None:
+        ceps = vazio.copy()
+        presente = pd.notna(cep)
+        codigos, unicos = pd.factorize(cep[presente])
+        ceps[presente] = np.array([normalize_cep(c) for c in unicos] + [""], dtype=object)[codigos]
+        dados["CEP"] = ceps
+
+    for destino, origem in [("Nome", "NOME"), ("Cidade", "Cidade"), ("Bairro", "Bairro"), ("Rua", "Rua"), ("Número", "Número"), ("Complemento", "Complemento")]:
+        valores = _coluna_ou_vazio(df_leads, origem)
+        if valores is not None:
+            dados[destino] = valores
+
+    dados["Cargo"] = constante(cargo)
+    dados["Usuário responsável"] = np.asarray(usuario_responsavel, dtype=object) if np.ndim(usuario_responsavel) else constante(usuario_responsavel)
+    dados["Categoria"] = constante("Lead")
+    dados["Origem"] = constante("Reobote")
+    dados["Estado"] = constante(uf)
+    return pd.DataFrame(dados, columns=COLUNAS_PESSOAS_AGENDOR).infer_objects()
+
+
+HANDOFF_MANIFESTO_COLS = ["arquivo", "consultor", "equipe", "data", "lote", "inicio", "fim"]
+
+
+def _equipe_do_consultor(consultor, equipes):
+    for equipe in equipes:
+        if consultor in equipe["consultores"]:
+            return equipe["nome"]
+    return "Outros"
+
+
+def criar_handoff_pessoas(df_pessoas, lotes):
+    """Handoff em memória da aba Pessoas para a aba Negócios.
+
+    Guarda a planilha de Pessoas já montada (todos os leads, em colunas) e um manifesto
+    com uma linha por arquivo gerado: consultor, equipe, data, índice do lote e o
+    intervalo [inicio, fim) de linhas do lote na planilha. Assim o gerador de Negócios
+    não precisa reler os xlsx nem deduzir o consultor pelo nome do arquivo.
+    """
+    manifesto = pd.DataFrame(lotes, columns=HANDOFF_MANIFESTO_COLS)
+    manifesto = manifesto.astype({"arquivo": object, "consultor": object, "equipe": object, "lote": "int64", "inicio": "int64", "fim": "int64"})
+    return {"pessoas": df_pessoas, "manifesto": manifesto}
+
+
+def _linhas_dos_lotes(manifesto):
+    if manifesto.empty:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate([np.arange(inicio, fim) for inicio, fim in zip(manifesto["inicio"], manifesto["fim"])])
+
+
+def linhas_do_handoff(handoff):
+    """Posições (na planilha de Pessoas) de todos os leads que estão nos lotes do handoff."""
+    return _linhas_dos_lotes(handoff["manifesto"])
+
+
+def lotes_do_handoff(handoff):
+    """Itera pelos lotes do handoff: (linha do manifesto, planilha de Pessoas do lote)."""
+    pessoas = handoff["pessoas"]
+    for entrada in handoff["manifesto"].itertuples(index=False):
+        yield entrada, pessoas.iloc[entrada.inicio:entrada.fim]
+
+
+def consultores_do_handoff(handoff):
+    """Itera pelos consultores do handoff, na ordem do manifesto: (consultor, planilha de Pessoas
+    com os leads de todos os lotes do consultor, na ordem dos lotes).
+
+    Um consultor pode ter vários arquivos de Pessoas (um por lote); a aba Negócios distribui
+    os leads dele num único plano, para que as datas e os nomes dos arquivos não se repitam.
+    """
+    pessoas = handoff["pessoas"]
+    manifesto = handoff["manifesto"].sort_values("lote", kind="stable")
+    for consultor, lotes in manifesto.groupby("consultor", sort=False):
+        yield consultor, pessoas.iloc[_linhas_dos_lotes(lotes)]
+
+
 def aba_automacao_pessoas_agendor():
     st.header("Automação Pessoas Agendor")
     st.info("Faça o upload de um arquivo de lista para iniciar a geração de pessoas. Obrigatório que o arquivo contenha as colunas 'NOME' e 'Whats'.")
 
-    uploaded_file = st.file_uploader("Faça upload do arquivo XLSX com os leads", type=["xlsx"], key="geracao_pessoas_uploader")
+    uploaded_file = _arquivos_enviados(st.file_uploader("Faça upload do arquivo XLSX com os leads (um ou vários)", type=["xlsx"], key="geracao_pessoas_uploader", accept_multiple_files=True))
 
     if uploaded_file:
-        df_raw_leads, _, err = load_data(uploaded_file)
+        # Lê apenas o cabeçalho para o mapeamento; a carga projetada acontece ao gerar
+        df_header, err = peek_header(uploaded_file)
         if err:
             st.error(err)
             return
@@ -1026,7 +1215,7 @@ def aba_automacao_pessoas_agendor():
         st.subheader("Mapeamento de Colunas")
         st.info("Selecione as colunas do seu arquivo que correspondem aos campos esperados.")
 
-        df_leads_cols = df_raw_leads.columns.tolist()
+        df_leads_cols = df_header.columns.tolist()
         
         # Suggested column names for pre-selection
         SUGGESTED_COLUMN_NAMES_AGENDOR = {
@@ -1094,6 +1283,7 @@ def aba_automacao_pessoas_agendor():
                 st.info("Apenas 1 consultor selecionado — por padrão ele receberá todos os leads. Marque a opção para dividir em lotes.")
         else:
             leads_por_consultor = st.number_input("Número de leads por consultor", min_value=1, value=50)
+        ignorar_distribuidos = st.checkbox("Remover leads já distribuídos anteriormente", value=True, key="pessoas_suppression")
 
         if st.button("Gerar Arquivo 'Pessoas'"):
             with st.spinner("Processando... Por favor, aguarde."):
@@ -1103,6 +1293,15 @@ def aba_automacao_pessoas_agendor():
                         st.warning("A coluna 'NOME' é obrigatória para a distribuição de leads.")
                         return
 
+                    # Carga projetada: colunas mapeadas + colunas lidas diretamente pelo nome na saída
+                    campos_lidos = set(expected_cols_agendor) | {"Empresa"}
+                    usecols = [c for c in user_col_mapping.values() if c]
+                    usecols += [c for c in df_leads_cols if c in campos_lidos and c not in usecols]
+                    df_raw_leads, _, err = load_data_cached(uploaded_file, usecols=usecols)
+                    if err:
+                        st.error(err)
+                        return
+
                     # Apply mapping and rename DataFrame
                     df_leads_mapped = df_raw_leads.copy()
                     for expected, actual in user_col_mapping.items():
@@ -1150,63 +1349,40 @@ def aba_automacao_pessoas_agendor():
                         df_leads_mapped.drop_duplicates(subset=["Whats"], keep='first', inplace=True)
                         st.info(f"Leads após desduplicação por WhatsApp: {len(df_leads_mapped)}")
 
-                    # Prepare for Agendor output
-                    colunas_output = [
-                        "Nome", "CPF", "Empresa", "Cargo", "Aniversário", "Ano de nascimento", 
-                        "Usuário responsável", "Categoria", "Origem", "Descrição", "E-mail", 
-                        "WhatsApp", "Telefone", "Celular", "Fax", "Ramal", "CEP", "País", 
-                        "Estado", "Cidade", "Bairro", "Rua", "Número", "Complemento", 
-                        "Produto", "Facebook", "Twitter", "LinkedIn", "Skype", "Instagram", "Ranking"
-                    ]
-                    
+                    if ignorar_distribuidos:
+                        df_leads_mapped, removidos = filter_suppressed(df_leads_mapped)
+                        if removidos:
+                            st.info(f"{removidos} leads já distribuídos anteriormente foram removidos.")
+                        if df_leads_mapped.empty:
+                            st.warning("Todos os leads do arquivo já foram distribuídos anteriormente.")
+                            return
+
                     # --- Lógica de Geração e Download ---
                     # Armazena os arquivos gerados em memória
                     generated_files = {}
+                    # Manifesto do handoff para Negócios: um lote por arquivo gerado
+                    lotes_gerados = {}
+                    equipes_json = carregar_equipes()
+                    data_geracao = date.today()
 
-                    leads_processados = 0
                     total_leads = len(df_leads_mapped)
 
-                    # Debug lines removed from UI for cleaner UX
-
-                    # If exactly one consultant is selected and the user did not request forced splitting,
-                    # create a single file containing all leads for that consultant.
+                    # Com exatamente um consultor e sem divisão forçada, ele recebe todos os leads
+                    # em um único arquivo (um único lote); senão, lotes de `leads_por_consultor`
+                    leads_por_lote = leads_por_consultor
                     if len(effective_consultores) == 1 and not st.session_state.get('force_split_single', False):
-                        consultor = effective_consultores[0]
-                        dados_finais = []
-                        consultor_formatado = consultor.lower().replace(' ', '.')
-                        df_lote = df_leads_mapped.copy()
-                        for _, row in df_lote.iterrows():
-                            whatsapp_val = row.get("Whats")
-                            whatsapp_str = f"+55{str(whatsapp_val).strip()}" if whatsapp_val and pd.notna(whatsapp_val) and str(whatsapp_val).strip() else ""
-                            celular_val = row.get("CEL")
-                            celular_str = str(celular_val) if celular_val and pd.notna(celular_val) else ""
-                            descricao_val = default_descricao.strip() if default_descricao and str(default_descricao).strip() else None
-                            if not descricao_val:
-                                descricao_val = row.get("Razao Social") or row.get("Fantasia") or row.get("Empresa") or ""
-                            cep_val = ""
-                            if "CEP" in row and pd.notna(row.get("CEP")):
-                                cep_val = normalize_cep(row.get("CEP"))
-                            linha = {col: "" for col in colunas_output}
-                            linha.update({
-                                "Nome": row.get("NOME", ""),
-                                "Cargo": default_cargo,
-                                "Usuário responsável": consultor_formatado,
-                                "Categoria": "Lead",
-                                "Origem": "Reobote",
-                                "Descrição": descricao_val,
-                                "WhatsApp": whatsapp_str,
-                                "Celular": celular_str,
-                                "Estado": default_uf,
-                                "Cidade": row.get("Cidade", ""),
-                                "Bairro": row.get("Bairro", ""),
-                                "Rua": row.get("Rua", ""),
-                                "Número": row.get("Número", ""),
-                                "Complemento": row.get("Complemento", ""),
-                                "CEP": cep_val
-                            })
-                            dados_finais.append(linha)
-
-                        df_final_consultor = pd.DataFrame(dados_finais, columns=colunas_output)
+                        leads_por_lote = total_leads
+
+                    # A planilha de todos os leads é montada de uma vez e cada lote é um recorte dela
+                    plano = plano_distribuicao(total_leads, len(effective_consultores), leads_por_lote)
+                    usuarios = np.array([c.lower().replace(' ', '.') for c in effective_consultores], dtype=object)
+                    df_final_todos = montar_linhas_pessoas(df_leads_mapped, usuarios[plano["consultor"]], default_cargo, default_descricao, default_uf)
+
+                    for lote in lotes_do_plano(plano).itertuples(index=False):
+                        consultor = effective_consultores[lote.consultor]
+                        df_lote = df_leads_mapped.iloc[lote.inicio:lote.fim]
+                        df_final_consultor = df_final_todos.iloc[lote.inicio:lote.fim].reset_index(drop=True)
+
                         output_excel_consultor = io.BytesIO()
                         with pd.ExcelWriter(output_excel_consultor, engine='openpyxl') as writer:
                             df_final_consultor.to_excel(writer, index=False, sheet_name='Pessoas')
@@ -1219,79 +1395,24 @@ def aba_automacao_pessoas_agendor():
                         primeiro_nome = consultor.split(' ')[0].upper()
                         data_formatada = datetime.now().strftime('%d-%m-%Y')
                         # Nome do arquivo: usar apenas o nicho e o primeiro nome do consultor
-                        nome_arquivo_agendor = f"PESSOAS_{nicho_formatado}_{primeiro_nome}_{data_formatada}.xlsx"
+                        # (com sufixo do lote quando o nome já foi usado, para nenhum lote sobrescrever outro)
+                        nome_arquivo_agendor = _nome_arquivo_unico(f"PESSOAS_{nicho_formatado}_{primeiro_nome}_{data_formatada}", ".xlsx", generated_files)
                         generated_files[nome_arquivo_agendor] = output_excel_consultor.getvalue()
-                        leads_processados = total_leads
-                    else:
-                        # Existing batching logic: distribute in chunks across consultants
-                        while leads_processados < total_leads:
-                            for consultor in effective_consultores:
-                                if leads_processados >= total_leads:
-                                    break
-
-                                inicio_lote = leads_processados
-                                fim_lote = leads_processados + leads_por_consultor
-                                df_lote = df_leads_mapped.iloc[inicio_lote:fim_lote].copy()
-
-                                if not df_lote.empty:
-                                    dados_finais = []
-                                    consultor_formatado = consultor.lower().replace(' ', '.')
-                                    for _, row in df_lote.iterrows():
-                                        whatsapp_val = row.get("Whats")
-                                        whatsapp_str = f"+55{str(whatsapp_val).strip()}" if whatsapp_val and pd.notna(whatsapp_val) and str(whatsapp_val).strip() else ""
-                                        celular_val = row.get("CEL")
-                                        celular_str = str(celular_val) if celular_val and pd.notna(celular_val) else ""
-                                        descricao_val = default_descricao.strip() if default_descricao and str(default_descricao).strip() else None
-                                        if not descricao_val:
-                                            descricao_val = row.get("Razao Social") or row.get("Fantasia") or row.get("Empresa") or ""
-                                        cep_val = ""
-                                        if "CEP" in row and pd.notna(row.get("CEP")):
-                                            cep_val = normalize_cep(row.get("CEP"))
-                                        linha = {col: "" for col in colunas_output}
-                                        linha.update({
-                                            "Nome": row.get("NOME", ""),
-                                            "Cargo": default_cargo,
-                                            "Usuário responsável": consultor_formatado,
-                                            "Categoria": "Lead",
-                                            "Origem": "Reobote",
-                                            "Descrição": descricao_val,
-                                            "WhatsApp": whatsapp_str,
-                                            "Celular": celular_str,
-                                            "Estado": default_uf,
-                                            "Cidade": row.get("Cidade", ""),
-                                            "Bairro": row.get("Bairro", ""),
-                                            "Rua": row.get("Rua", ""),
-                                            "Número": row.get("Número", ""),
-                                            "Complemento": row.get("Complemento", ""),
-                                            "CEP": cep_val
-                                        })
-                                        dados_finais.append(linha)
-
-                                    df_final_consultor = pd.DataFrame(dados_finais, columns=colunas_output)
-
-                                    output_excel_consultor = io.BytesIO()
-                                    with pd.ExcelWriter(output_excel_consultor, engine='openpyxl') as writer:
-                                        df_final_consultor.to_excel(writer, index=False, sheet_name='Pessoas')
-                                    output_excel_consultor.seek(0)
-
-                                    # Determine localidade for filename (safer logic)
-                                    localidade = determine_localidade(user_col_mapping, df_lote, default="CG")
-
-                                    nicho_formatado = nicho_valor.upper().replace(' ', '_')
-                                    primeiro_nome = consultor.split(' ')[0].upper()
-                                    data_formatada = datetime.now().strftime('%d-%m-%Y')
-                                    # Nome do arquivo: usar apenas o nicho e o primeiro nome do consultor
-                                    nome_arquivo_agendor = f"PESSOAS_{nicho_formatado}_{primeiro_nome}_{data_formatada}.xlsx"
-                                    generated_files[nome_arquivo_agendor] = output_excel_consultor.getvalue()
-                                    leads_processados += len(df_lote)
+                        lotes_gerados[nome_arquivo_agendor] = {
+                            "arquivo": nome_arquivo_agendor, "consultor": consultor, "equipe": _equipe_do_consultor(consultor, equipes_json),
+                            "data": data_geracao, "lote": lote.lote, "inicio": lote.inicio, "fim": lote.fim,
+                        }
 
                     # --- Lógica de Download e Handoff ---
                     if not generated_files:
                         st.warning("Nenhum arquivo foi gerado. Verifique os filtros e os dados de entrada.")
                         return
 
-                    # Salva os arquivos gerados no estado da sessão para o handoff
-                    st.session_state.generated_pessoas_files = generated_files
+                    # Guarda a planilha montada e o manifesto no estado da sessão para o handoff
+                    handoff = criar_handoff_pessoas(df_final_todos, list(lotes_gerados.values()))
+                    st.session_state.pessoas_handoff = handoff
+                    # Só os leads que foram para os arquivos gerados contam como distribuídos
+                    record_distributed(df_leads_mapped.iloc[linhas_do_handoff(handoff)])
 
                     st.success(f"Processo concluído! {len(generated_files)} arquivo(s) de pessoas para Agendor foram gerados.")
 
@@ -1313,19 +1434,7 @@ def aba_automacao_pessoas_agendor():
                             zip_buffer = io.BytesIO()
                             with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
                                 for file_name, file_data in generated_files.items():
-                                    # Extrai o nome do consultor do nome do arquivo para encontrar a equipe
-                                    parts = file_name.split('_')
-                                    consultor_nome_no_arquivo = ""
-                                    if len(parts) > 3:
-                                        consultor_nome_no_arquivo = parts[-2].upper()
-
-                                    nome_equipe = "Outros" # Padrão
-                                    # Buscar equipe do consultor via JSON
-                                    for equipe in carregar_equipes():
-                                        for consultor in equipe["consultores"]:
-                                            if consultor.split(' ')[0].upper() == consultor_nome_no_arquivo:
-                                                nome_equipe = equipe["nome"]
-                                                break
+                                    nome_equipe = lotes_gerados[file_name]["equipe"]
                                     zip_file.writestr(f"{nome_equipe}/{file_name}", file_data)
                             
                             zip_filename = f"Pessoas_Agendor_Distribuicao_{datetime.now().strftime('%d-%m-%Y')}.zip"
@@ -1339,7 +1448,7 @@ def aba_automacao_pessoas_agendor():
                     
                     # Botão para Handoff
                     with col2:
-                        if st.session_state.get('generated_pessoas_files') and st.button("Continuar e Gerar Negócios ➡️"):
+                        if st.session_state.get('pessoas_handoff') and st.button("Continuar e Gerar Negócios ➡️"):
                             st.session_state.handoff_active = True
                             st.session_state.source_for_negocios = 'handoff'
                             # Mensagens para guiar o usuário em vez de rerun
@@ -0,0 +1,111 @@
+import os
+import re
+import time
+import shutil
+import logging
+import uuid
+import pandas as pd
+
+# Área de descarte (spill) de DataFrames intermediários, isolada por sessão do Streamlit.
+# Cada sessão tem um diretório próprio (<SPILL_DIR>/<sessão>/<nome>.parquet), então
+# consultores usando o serviço ao mesmo tempo não sobrescrevem os dados uns dos outros.
+SPILL_DIR = os.path.join('.cache', 'sessions')
+# Sessões sem uso há mais que isso são apagadas
+SPILL_TTL_SECONDS = 2 * 60 * 60
+# Limite total em disco; acima dele os arquivos menos usados recentemente são removidos
+SPILL_MAX_BYTES = 1024 * 1024 * 1024
+
+# Identificador usado fora do Streamlit (scripts, testes): um por processo
+_PROCESS_SESSION_ID = f"local-{uuid.uuid4().hex[:12]}"
+
+
+def current_session_id():
+    """Identificador da sessão atual do Streamlit (ou do processo, fora dele)."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except Exception:
+        ctx = None
+    return ctx.session_id if ctx is not None else _PROCESS_SESSION_ID
+
+
+def _safe_name(name):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(name))
+
+
+def _spill_path(name, session_id, spill_dir):
+    return os.path.join(spill_dir, _safe_name(session_id), f"{_safe_name(name)}.parquet")
+
+
+def evict_spill_store(spill_dir=SPILL_DIR, ttl_seconds=SPILL_TTL_SECONDS, max_bytes=SPILL_MAX_BYTES, keep_session=None):
+    """Remove sessões expiradas (TTL) e, se preciso, os arquivos menos usados até caber em `max_bytes`.
+
+    A sessão `keep_session` nunca é apagada por TTL (ela acabou de ser usada).
+    """
+    try:
+        sessions = [e for e in os.scandir(spill_dir) if e.is_dir()]
+    except FileNotFoundError:
+        return
+    now = time.time()
+    files = []
+    for session in sessions:
+        entries = [e for e in os.scandir(session.path) if e.is_file() and e.name.endswith('.parquet')]
+        last_used = max((e.stat().st_mtime for e in entries), default=session.stat().st_mtime)
+        if session.name != keep_session and now - last_used > ttl_seconds:
+            shutil.rmtree(session.path, ignore_errors=True)
+            logging.info(f"[SPILL] Sessão {session.name} expirada e removida.")
+            continue
+        files.extend(entries)
+
+    files.sort(key=lambda e: e.stat().st_mtime)
+    total = sum(e.stat().st_size for e in files)
+    for entry in files:
+        if total <= max_bytes:
+            break
+        size = entry.stat().st_size
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        logging.info(f"[SPILL] {entry.path} removido por limite de espaço ({size} bytes).")
+
+
+def spill_dataframe(df, name, session_id=None, spill_dir=SPILL_DIR, ttl_seconds=SPILL_TTL_SECONDS, max_bytes=SPILL_MAX_BYTES):
+    """Grava o DataFrame em Parquet no diretório da sessão e retorna o caminho do arquivo."""
+    session_id = session_id or current_session_id()
+    path = _spill_path(name, session_id, spill_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    evict_spill_store(spill_dir, ttl_seconds, max_bytes, keep_session=_safe_name(session_id))
+    return path
+
+
+def load_spilled(name, session_id=None, spill_dir=SPILL_DIR, columns=None):
+    """Lê um DataFrame gravado por `spill_dataframe`. Retorna (df, erro)."""
+    path = _spill_path(name, session_id or current_session_id(), spill_dir)
+    try:
+        df = pd.read_parquet(path, columns=columns)
+    except FileNotFoundError:
+        return pd.DataFrame(), "Arquivo temporário não encontrado."
+    now = time.time()
+    os.utime(path, (now, now)) # Marca como usado recentemente (TTL e LRU)
+    return df, None
+
+
+def drop_spilled(name=None, session_id=None, spill_dir=SPILL_DIR):
+    """Apaga um DataFrame da sessão, ou todos eles se `name` for None."""
+    session_dir = os.path.join(spill_dir, _safe_name(session_id or current_session_id()))
+    if name is None:
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return
+    try:
+        os.remove(_spill_path(name, session_id or current_session_id(), spill_dir))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,68 @@
+import os
+import time
+from contextlib import contextmanager
+import pandas as pd
+
+# Instrumentação por etapa do processamento: cada etapa vira um registro
+# {"stage", "seconds", "rows_in", "rows_out", "memory_delta_bytes"} em uma lista (o relatório).
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def current_rss():
+    """Memória residente atual do processo, em bytes (0 se não for possível medir)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # Fora do Linux só há o pico (ru_maxrss, em bytes no macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return 0
+
+
+@contextmanager
+def timed_stage(report, stage, rows_in=None):
+    """Cronometra o bloco e, se `report` não for None, acrescenta o registro da etapa a ele.
+
+    O registro é entregue ao bloco para que ele informe `rows_out` ao final.
+    """
+    record = {"stage": stage, "seconds": 0.0, "rows_in": rows_in, "rows_out": None, "memory_delta_bytes": 0}
+    if report is None:
+        yield record
+        return
+    rss_before = current_rss()
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - started
+        record["memory_delta_bytes"] = current_rss() - rss_before
+        report.append(record)
+
+
+def summarize_stages(report):
+    """Agrupa registros repetidos de uma etapa (ex: um por bloco no modo streaming), na ordem de aparição."""
+    summary = {}
+    for record in report:
+        entry = summary.setdefault(record["stage"], {"stage": record["stage"], "seconds": 0.0, "rows_in": 0, "rows_out": 0, "memory_delta_bytes": 0})
+        entry["seconds"] += record["seconds"]
+        entry["rows_in"] += record["rows_in"] or 0
+        entry["rows_out"] += record["rows_out"] or 0
+        entry["memory_delta_bytes"] += record["memory_delta_bytes"]
+    return list(summary.values())
+
+
+def stage_report_frame(report):
+    """Relatório como DataFrame para exibição (tempo em segundos e memória em MB)."""
+    df = pd.DataFrame(summarize_stages(report), columns=["stage", "seconds", "rows_in", "rows_out", "memory_delta_bytes"])
+    df["memory_delta_mb"] = (df.pop("memory_delta_bytes") / (1024 * 1024)).round(2)
+    df["seconds"] = df["seconds"].round(4)
+    return df.rename(columns={"stage": "Etapa", "seconds": "Tempo (s)", "rows_in": "Linhas entrada",
+                              "rows_out": "Linhas saída", "memory_delta_mb": "Memória (MB)"})
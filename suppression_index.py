@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import logging
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+try:
+    import fcntl
+except ImportError: # Windows: sem trava entre processos
+    fcntl = None
+
+# Índice persistente de contatos já distribuídos (telefones e CNPJs normalizados).
+# Cada chave vira um inteiro de 64 bits; o índice é um array ordenado dessas chaves
+# (<dir>/keys-<geração>.npy, lido via mmap) com um filtro de Bloom na frente
+# (<dir>/bloom-<geração>.npy), de modo que a maioria das chaves novas é descartada
+# sem tocar no array. O <dir>/index.json aponta para a geração atual.
+SUPPRESSION_DIR = 'suppression_index'
+# Incrementar se a normalização das chaves mudar
+SUPPRESSION_INDEX_VERSION = 1
+# ~1% de falsos positivos no Bloom (confirmados depois na busca binária)
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 7
+# Gerações mantidas em disco: a atual e a anterior, que ainda pode estar sendo aberta por
+# um leitor em outro processo que leu o index.json antes da troca
+SUPPRESSION_KEEP_GENERATIONS = 2
+
+# Colunas verificadas por padrão (as que existirem no DataFrame)
+SUPPRESSION_PHONE_COLS = ["SOCIO1Celular1", "SOCIO1Celular2", "Whats", "CEL", "WhatsApp"]
+SUPPRESSION_CNPJ_COLS = ["CNPJ"]
+
+# Potências de 10 para contar dígitos sem passar por strings
+_POW10 = 10 ** np.arange(19, dtype=np.int64)
+# Prefixos (bits altos) que separam os tipos de chave no índice
+_PHONE_TAG = np.uint64(1 << 56)
+_CNPJ_TAG = np.uint64(2 << 56)
+
+# Índice carregado por diretório: {dir: (geração, índice)}
+_LOADED = {}
+
+
+def _digit_values(values):
+    """Dígitos de cada valor como (número int64, quantidade de dígitos); nulos/inválidos têm 0 dígitos."""
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        # Números lidos como float (ex: 67999999999.0) não podem ganhar dígitos extras
+        floats = values.to_numpy(dtype=float, na_value=np.nan)
+        ok = np.isfinite(floats) & (floats >= 1) & (floats < 1e18)
+        numbers = np.where(ok, np.round(floats), 0).astype(np.int64)
+        lengths = np.where(ok, np.searchsorted(_POW10, numbers, side='right'), 0)
+        return numbers, lengths
+    text = pa.array(values.astype('string'), type=pa.string(), from_pandas=True)
+    text = pc.replace_substring_regex(pc.utf8_trim_whitespace(text), r'\.0+$', '')
+    text = pc.replace_substring_regex(text, r'\D', '')
+    lengths = pc.utf8_length(text).fill_null(0).to_numpy(zero_copy_only=False)
+    ok = (lengths > 0) & (lengths <= 18)
+    numbers = pc.cast(pc.if_else(pa.array(ok), text, pa.scalar(None, pa.string())), pa.int64())
+    return numbers.fill_null(0).to_numpy(zero_copy_only=False), np.where(ok, lengths, 0)
+
+
+def _phone_keys(values):
+    """Telefones como DDD + número (10 ou 11 dígitos). Retorna (chaves, máscara de válidos).
+
+    Aceita os formatos de saída da higienização ('+55 (67) 99999-9999', '(67) 9999-9999')
+    e os números crus das planilhas.
+    """
+    numbers, lengths = _digit_values(values)
+    national = _POW10[np.clip(lengths - 2, 0, 18)]
+    with_country = np.isin(lengths, (12, 13)) & (numbers // national == 55)
+    numbers = np.where(with_country, numbers % national, np.where(lengths > 11, numbers % _POW10[11], numbers))
+    lengths = np.where(with_country, lengths - 2, np.minimum(lengths, 11))
+    return numbers.astype(np.uint64) | _PHONE_TAG, np.isin(lengths, (10, 11))
+
+
+def _cnpj_keys(values):
+    """CNPJs (zeros à esquerda não importam). Retorna (chaves, máscara de válidos)."""
+    numbers, lengths = _digit_values(values)
+    return numbers.astype(np.uint64) | _CNPJ_TAG, (lengths >= 8) & (lengths <= 14) & (numbers > 0)
+
+
+def _row_keys(df, phone_cols=None, cnpj_cols=None):
+    """Retorna (posições das linhas, chaves) de todos os telefones e CNPJs válidos do DataFrame."""
+    if phone_cols is None:
+        phone_cols = [c for c in SUPPRESSION_PHONE_COLS if c in df.columns]
+    if cnpj_cols is None:
+        cnpj_cols = [c for c in SUPPRESSION_CNPJ_COLS if c in df.columns]
+    positions, keys = [], []
+    for cols, to_keys in ((phone_cols, _phone_keys), (cnpj_cols, _cnpj_keys)):
+        for col in cols:
+            col_keys, valid = to_keys(df[col])
+            positions.append(np.flatnonzero(valid))
+            keys.append(col_keys[valid])
+    if not keys:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.uint64)
+    return np.concatenate(positions), np.concatenate(keys)
+
+
+def _mix(keys):
+    """Finalizador do splitmix64: espalha os bits das chaves para o filtro de Bloom."""
+    z = keys ^ (keys >> np.uint64(30))
+    z = z * np.uint64(0xbf58476d1ce4e5b9)
+    z = z ^ (z >> np.uint64(27))
+    z = z * np.uint64(0x94d049bb133111eb)
+    return z ^ (z >> np.uint64(31))
+
+
+def _bloom_positions(keys, num_bits, num_hashes):
+    """Posições dos bits de cada chave (double hashing), um array por função."""
+    hashes = _mix(keys)
+    h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+    mask = np.uint64(num_bits - 1)
+    for i in range(num_hashes):
+        yield (hashes + np.uint64(i) * h2) & mask
+
+
+def _build_bloom(keys, num_hashes=BLOOM_HASHES):
+    """Filtro de Bloom (bits empacotados em uint8) para as chaves; tamanho em potência de 2."""
+    num_bits = 1024
+    while num_bits < len(keys) * BLOOM_BITS_PER_KEY:
+        num_bits <<= 1
+    flags = np.zeros(num_bits, dtype=bool)
+    for pos in _bloom_positions(keys, num_bits, num_hashes):
+        flags[pos] = True
+    return np.packbits(flags, bitorder='little'), num_bits
+
+
+def _bloom_contains(bloom, num_bits, num_hashes, keys):
+    present = np.ones(len(keys), dtype=bool)
+    for pos in _bloom_positions(keys, num_bits, num_hashes):
+        present &= ((bloom[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1).astype(bool)
+    return present
+
+
+def _meta_path(index_dir):
+    return os.path.join(index_dir, 'index.json')
+
+
+def _read_meta(index_dir):
+    try:
+        with open(_meta_path(index_dir), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if meta.get("version") != SUPPRESSION_INDEX_VERSION:
+        logging.warning(f"[SUPPRESSION] Índice em {index_dir} tem versão {meta.get('version')}; ignorado.")
+        return None
+    return meta
+
+
+def load_suppression_index(index_dir=SUPPRESSION_DIR):
+    """Índice atual como dict {"keys", "bloom", "bloom_bits", "bloom_hashes", "generation"}, ou None se vazio.
+
+    Os arrays são mapeados em memória e o índice fica em cache até a próxima geração.
+    """
+    for attempt in range(2):
+        meta = _read_meta(index_dir)
+        if meta is None:
+            return None
+        generation = meta["generation"]
+        cached = _LOADED.get(os.path.abspath(index_dir))
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        try:
+            index = {
+                "keys": np.load(os.path.join(index_dir, f"keys-{generation}.npy"), mmap_mode='r'),
+                "bloom": np.load(os.path.join(index_dir, f"bloom-{generation}.npy"), mmap_mode='r'),
+                "bloom_bits": meta["bloom_bits"],
+                "bloom_hashes": meta["bloom_hashes"],
+                "generation": generation,
+            }
+        except (OSError, ValueError) as e:
+            if attempt == 0:
+                # A geração lida pode ter sido removida por outra atualização; relê o index.json
+                continue
+            logging.warning(f"[SUPPRESSION] Falha ao abrir o índice em {index_dir}: {e}")
+            return None
+        _LOADED[os.path.abspath(index_dir)] = (generation, index)
+        return index
+
+
+def _index_contains(index, keys):
+    """Máscara das chaves presentes no índice: Bloom primeiro, busca binária só nos candidatos."""
+    found = np.zeros(len(keys), dtype=bool)
+    if index is None or not len(keys) or not len(index["keys"]):
+        return found
+    candidates = np.flatnonzero(_bloom_contains(index["bloom"], index["bloom_bits"], index["bloom_hashes"], keys))
+    if len(candidates):
+        sorted_keys = index["keys"]
+        wanted = keys[candidates]
+        slots = np.searchsorted(sorted_keys, wanted)
+        in_range = slots < len(sorted_keys)
+        hits = np.zeros(len(wanted), dtype=bool)
+        hits[in_range] = sorted_keys[slots[in_range]] == wanted[in_range]
+        found[candidates[hits]] = True
+    return found
+
+
+def suppressed_mask(df, phone_cols=None, cnpj_cols=None, index_dir=SUPPRESSION_DIR):
+    """Máscara booleana (array) das linhas com algum telefone ou CNPJ já distribuído."""
+    mask = np.zeros(len(df), dtype=bool)
+    index = load_suppression_index(index_dir)
+    if index is None or df.empty:
+        return mask
+    positions, keys = _row_keys(df, phone_cols, cnpj_cols)
+    mask[positions[_index_contains(index, keys)]] = True
+    return mask
+
+
+def filter_suppressed(df, phone_cols=None, cnpj_cols=None, index_dir=SUPPRESSION_DIR):
+    """Remove as linhas já distribuídas. Retorna (df_filtrado, quantidade_removida)."""
+    mask = suppressed_mask(df, phone_cols, cnpj_cols, index_dir)
+    removed = int(mask.sum())
+    if not removed:
+        return df, 0
+    return df[~mask], removed
+
+
+@contextmanager
+def _index_lock(index_dir):
+    """Trava exclusiva entre processos durante a atualização (no-op sem fcntl)."""
+    os.makedirs(index_dir, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(index_dir, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _remove_old_generations(index_dir, generation):
+    """Apaga os arquivos das gerações anteriores às `SUPPRESSION_KEEP_GENERATIONS` mais recentes."""
+    oldest_kept = generation - SUPPRESSION_KEEP_GENERATIONS + 1
+    for entry in os.scandir(index_dir):
+        name, ext = os.path.splitext(entry.name)
+        if ext != '.npy':
+            continue
+        entry_generation = name.rpartition('-')[2]
+        if entry_generation.isdigit() and int(entry_generation) >= oldest_kept:
+            continue
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass # Ainda mapeado por outro processo (Windows); sai na próxima atualização
+
+
+def record_distributed(df, phone_cols=None, cnpj_cols=None, index_dir=SUPPRESSION_DIR):
+    """Acrescenta ao índice os telefones e CNPJs do DataFrame. Retorna quantas chaves novas entraram.
+
+    Cada atualização grava uma nova geração de arquivos e só então troca o index.json,
+    então leitores concorrentes sempre enxergam um índice completo.
+    """
+    _, keys = _row_keys(df, phone_cols, cnpj_cols)
+    if not len(keys):
+        return 0
+    with _index_lock(index_dir):
+        meta = _read_meta(index_dir)
+        current = load_suppression_index(index_dir) if meta is not None else None
+        existing = np.asarray(current["keys"]) if current is not None else np.empty(0, dtype=np.uint64)
+        merged = np.union1d(existing, keys)
+        added = len(merged) - len(existing)
+        if not added:
+            return 0
+        generation = (meta["generation"] + 1) if meta is not None else 1
+        bloom, bloom_bits = _build_bloom(merged)
+        np.save(os.path.join(index_dir, f"keys-{generation}.npy"), merged)
+        np.save(os.path.join(index_dir, f"bloom-{generation}.npy"), bloom)
+        tmp_meta = _meta_path(index_dir) + ".tmp"
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump({"version": SUPPRESSION_INDEX_VERSION, "generation": generation, "entries": int(len(merged)),
+                       "bloom_bits": bloom_bits, "bloom_hashes": BLOOM_HASHES, "updated": time.time()}, f)
+        os.replace(tmp_meta, _meta_path(index_dir))
+        _LOADED.pop(os.path.abspath(index_dir), None)
+        _remove_old_generations(index_dir, generation)
+    logging.info(f"[SUPPRESSION] {added} chaves adicionadas ao índice ({len(merged)} no total).")
+    return added
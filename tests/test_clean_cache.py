@@ -0,0 +1,40 @@
+import sys
+import os
+import pandas as pd
+
+# Ensure project root is on sys.path so tests can import modules from repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import clean_cache
+from clean_cache import clean_result_key, get_clean_result, put_clean_result, clear_clean_results
+
+
+def _result(rows):
+    return pd.DataFrame({"Razao": [f"EMPRESA {i}" for i in range(rows)]}), [], None, []
+
+
+def test_clean_result_key_depends_on_parameters():
+    base = clean_result_key("v1-abc", ["Razao"], "100 km", "Assertiva")
+    assert base == clean_result_key("v1-abc", ["Razao"], "100 km", "Assertiva")
+    assert base != clean_result_key("v1-abd", ["Razao"], "100 km", "Assertiva")
+    assert base != clean_result_key("v1-abc", ["Razao", "CEP"], "100 km", "Assertiva")
+    assert base != clean_result_key("v1-abc", ["Razao"], "50 km", "Assertiva")
+    assert clean_result_key(None, ["Razao"], "100 km") is None
+
+
+def test_clean_result_cache_returns_copies_and_evicts_lru():
+    clear_clean_results()
+    size = clean_cache._result_size(_result(100))
+    put_clean_result("a", _result(100), max_bytes=2 * size)
+    put_clean_result("b", _result(100), max_bytes=2 * size)
+
+    cached = get_clean_result("a")
+    cached[0].loc[0, "Razao"] = "ALTERADA"
+    assert get_clean_result("a")[0].loc[0, "Razao"] == "EMPRESA 0"
+
+    # "a" foi usada por último, então "b" sai quando "c" entra
+    put_clean_result("c", _result(100), max_bytes=2 * size)
+    assert get_clean_result("b") is None
+    assert get_clean_result("a") is not None and get_clean_result("c") is not None
+    assert not put_clean_result("d", _result(1000), max_bytes=2 * size)
+    clear_clean_results()
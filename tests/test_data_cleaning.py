@@ -0,0 +1,282 @@
+import sys
+import os
+import pandas as pd
+
+# Ensure project root is on sys.path so tests can import modules from repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from data_ingestion import ASSERTIVA_ESSENTIAL_COLS
+from data_cleaning import clean_and_filter_data, clean_and_filter_data_chunked
+
+
+def _assertiva_df():
+    return pd.DataFrame({
+        "Razao": ["EMPRESA B", "EMPRESA A", "EMPRESA C", "EMPRESA A", "EMPRESA D"],
+        "Logradouro": ["RUA 1", "RUA 2", "RUA 3", "RUA 2", "RUA 4"],
+        "NUMERO": ["10", "20", "30", "20", "40"],
+        "BAIRRO": ["CENTRO", "CENTRO", "JARDIM", "CENTRO", "AEROPORTO"],
+        "CIDADE": ["CAMPO GRANDE"] * 5,
+        "UF": ["MS"] * 5,
+        "CEP": ["79000000"] * 5,
+        "SOCIO1Nome": ["JOAO", "MARIA", "", "MARIA", "ANA"],
+        "SOCIO1Celular1": ["67991234567", "(67) 99876-5432", "", "67 99876 5432", "6733214567"],
+        "SOCIO1Celular2": ["", "6733334444", "", "", ""],
+        "SOCIO2Nome": ["", "", "PEDRO", "", ""],
+        "SOCIO2Celular1": ["", "", "67988887777", "", ""],
+    })
+
+
+def test_clean_and_filter_data_assertiva():
+    df_final, missing, _ = clean_and_filter_data(_assertiva_df(), ASSERTIVA_ESSENTIAL_COLS)
+    assert missing == []
+    # Linha duplicada (mesmo celular do sócio 1) é removida; a EMPRESA C usa os dados do sócio 2
+    assert df_final["Razao"].tolist() == ["EMPRESA D", "EMPRESA A", "EMPRESA B", "EMPRESA C"]
+    assert df_final["Bairro"].tolist() == ["AEROPORTO", "CENTRO", "CENTRO", "JARDIM"]
+    row_a = df_final[df_final["Razao"] == "EMPRESA A"].iloc[0]
+    assert row_a["SOCIO1Celular1"] == "+55 67 99876-5432"
+    assert row_a["SOCIO1Celular2"] == "67 3333-4444"
+    row_c = df_final[df_final["Razao"] == "EMPRESA C"].iloc[0]
+    assert row_c["SOCIO1Nome"] == "PEDRO"
+    assert row_c["SOCIO1Celular1"] == "+55 67 98888-7777"
+
+
+def test_socio_fallback_uses_first_valid_of_n_socios():
+    df = pd.DataFrame({
+        "Razao": ["E1", "E2", "E3"],
+        "SOCIO1Nome": ["", "ANA", ""],
+        "SOCIO1Celular1": ["", "", ""],
+        "SOCIO2Nome": ["", "BETO", ""],
+        "SOCIO2Celular1": ["123", "67 99111-2222", ""],
+        "SOCIO3Nome": ["CAIO", "", ""],
+        "SOCIO3Celular1": ["67991234567", "", ""],
+        "SOCIO3CPF": ["", "", "123.456.789-0"],
+    })
+    df_final, _, _ = clean_and_filter_data(df, ASSERTIVA_ESSENTIAL_COLS)
+    # E3 não tem nenhum sócio válido (CPF com 10 dígitos) e é removida
+    assert df_final["Razao"].tolist() == ["E1", "E2"]
+    assert df_final["SOCIO1Nome"].tolist() == ["CAIO", "ANA"]
+    assert df_final["SOCIO1Celular1"].tolist() == ["+55 67 99123-4567", "+55 67 99111-2222"]
+
+
+def test_clean_and_filter_data_chunked_matches_serial():
+    df = _assertiva_df()
+    expected, _, _ = clean_and_filter_data(df, ASSERTIVA_ESSENTIAL_COLS)
+    chunks = (df.iloc[i:i + 2] for i in range(0, len(df), 2))
+    result, missing, _ = clean_and_filter_data_chunked(chunks, ASSERTIVA_ESSENTIAL_COLS)
+    assert missing == []
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_clean_and_filter_data_parallel_matches_serial(monkeypatch):
+    import data_cleaning
+    monkeypatch.setattr(data_cleaning, "PARALLEL_MIN_ROWS", 1)
+    df = pd.concat([_assertiva_df()] * 4, ignore_index=True)
+    # A primeira faixa não tem SOCIO1Celular2: a escolha de colunas precisa olhar o arquivo todo
+    df.loc[:9, "SOCIO1Celular2"] = ""
+    expected, _, _ = clean_and_filter_data(df, ASSERTIVA_ESSENTIAL_COLS)
+    result, missing, _, stages = clean_and_filter_data(df, ASSERTIVA_ESSENTIAL_COLS, report=True, workers=2)
+    assert missing == []
+    pd.testing.assert_frame_equal(result, expected)
+    assert stages[0]["stage"] == "Mapeamento de colunas" and stages[0]["rows_in"] == len(df)
+
+
+def test_clean_and_filter_data_same_result_on_arrow_frames(tmp_path):
+    from data_ingestion import load_data
+
+    path = tmp_path / "assertiva.csv"
+    _assertiva_df().to_csv(path, sep=";", index=False)
+    df_default, _, _ = load_data(str(path))
+    df_arrow, _, _ = load_data(str(path), arrow=True)
+
+    expected, _, _ = clean_and_filter_data(df_default, ASSERTIVA_ESSENTIAL_COLS)
+    result, _, _ = clean_and_filter_data(df_arrow, ASSERTIVA_ESSENTIAL_COLS)
+    pd.testing.assert_frame_equal(result.astype(object), expected.astype(object))
+
+
+def test_profile_projection_matches_full_load(tmp_path):
+    from data_ingestion import load_data, PROFILE_USECOLS
+
+    path = tmp_path / "assertiva.csv"
+    _assertiva_df().assign(OBS=["x"] * 5).to_csv(path, sep=";", index=False)
+    df_full, _, _ = load_data(str(path))
+    df_projected, structure_type, err = load_data(str(path), usecols=PROFILE_USECOLS)
+    assert err is None
+    assert structure_type == "Assertiva"
+    assert "OBS" not in df_projected.columns and "SOCIO2Nome" in df_projected.columns
+
+    expected, _, _ = clean_and_filter_data(df_full, ASSERTIVA_ESSENTIAL_COLS)
+    result, _, _ = clean_and_filter_data(df_projected, ASSERTIVA_ESSENTIAL_COLS)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_lemit_profile_outputs_phone_columns():
+    from data_ingestion import LEMIT_ESSENTIAL_COLS
+
+    df = pd.DataFrame({
+        "NOME": ["ANA", "BIA", "ANA"],
+        "DDD": ["67", "67", "67"],
+        "FONE": ["991234567", "33214567", "991234567"],
+        "DDD.1": ["67", "", "67"],
+        "CEL.1": ["998887777", "", "998887777"],
+    })
+    df_final, _, _ = clean_and_filter_data(df, LEMIT_ESSENTIAL_COLS)
+    assert df_final.columns.tolist() == ["NOME", "Whats", "CEL"]
+    assert df_final["Whats"].tolist() == ["+55 67 99123-4567", "+55 67 3321-4567"]
+    assert df_final["CEL"].tolist() == ["67 99888-7777", ""]
+
+
+def test_registered_profile_is_matched_by_header():
+    from data_cleaning import register_structure_profile, match_structure_profile, STRUCTURE_PROFILES
+    from data_ingestion import detect_structure_type
+
+    profile = register_structure_profile(
+        "Teste", ["SOCIO1Nome", "SOCIO1Celular1"],
+        detect_cols=["CLIENTE", "CELULAR_PRINCIPAL"],
+        aliases={"SOCIO1Nome": ["CLIENTE"]},
+        phone_layout={"kind": "direct", "sources": {"SOCIO1Celular1": "CELULAR_PRINCIPAL"}},
+        output_order=["SOCIO1Nome", "SOCIO1Celular1"],
+    )
+    try:
+        assert detect_structure_type(["Cliente", "Celular_Principal"]) == "Teste"
+        df = pd.DataFrame({"CLIENTE": ["JOAO"], "CELULAR_PRINCIPAL": ["67991234567"]})
+        df_final, _, _ = clean_and_filter_data(df, profile["essential_cols"], profile=profile)
+        assert df_final.iloc[0].tolist() == ["JOAO", "+55 67 99123-4567"]
+    finally:
+        STRUCTURE_PROFILES.pop("Teste")
+    assert match_structure_profile(["CLIENTE", "CELULAR_PRINCIPAL"]) is None
+
+
+def test_resolve_ddd_phones_picks_first_two_candidates_in_group_order():
+    import numpy as np
+    from data_cleaning import _resolve_ddd_phones, get_structure_profile
+
+    df = pd.DataFrame({
+        "DDD": ["67", "", "67"],
+        "FONE": ["9912-3456", "67991112222", np.nan],
+        "CEL": ["", "", "998887777"],
+        "DDD.1": ["11", "", ""],
+        "FONE.1": ["33334444", "", ""],
+    })
+    first, second = _resolve_ddd_phones(df, get_structure_profile("Lemit")["phone_layout"])
+    assert first.tolist() == ["6799123456", "67991112222", "67"]  # FONE nulo vira 'nan' e ocupa a vez, como no laço original
+    assert second.tolist()[0] == "1133334444"
+    assert pd.isna(second.iloc[1])
+    assert second.iloc[2] == "67998887777"
+
+
+def test_format_phone_series_matches_per_value_formatter():
+    import numpy as np
+    from data_cleaning import _format_phone_series, _format_phone_with_ddd
+
+    values = pd.Series(["67991234567", "(67) 3321-4567", "123", np.nan, 67991234567, " 67 99123 4567 "], dtype=object)
+    for country_code in (True, False):
+        expected = values.apply(lambda x: _format_phone_with_ddd(x, include_country_code=country_code))
+        pd.testing.assert_series_equal(_format_phone_series(values, include_country_code=country_code), expected)
+    assert _format_phone_series(values, include_country_code=True).iloc[0] == "+55 67 99123-4567"
+
+
+def test_clean_and_filter_data_stage_report():
+    from stage_timing import stage_report_frame
+
+    df_final, _, _, stages = clean_and_filter_data(_assertiva_df(), ASSERTIVA_ESSENTIAL_COLS, report=True)
+    assert [s["stage"] for s in stages] == [
+        "Mapeamento de colunas", "Resolução de telefones", "Formatação de telefones",
+        "Fallback de sócios", "Desduplicação", "Projeção final", "Ordenação",
+    ]
+    assert stages[0]["rows_in"] == 5
+    assert stages[-1]["rows_out"] == len(df_final)
+    assert all(s["seconds"] >= 0 for s in stages)
+
+    df = _assertiva_df()
+    chunks = (df.iloc[i:i + 2] for i in range(0, len(df), 2))
+    _, _, _, chunk_stages = clean_and_filter_data_chunked(chunks, ASSERTIVA_ESSENTIAL_COLS, report=True)
+    # No modo em blocos os registros de cada etapa são somados
+    assert [s["stage"] for s in chunk_stages] == [s["stage"] for s in stages]
+    assert chunk_stages[0]["rows_in"] == 5
+    assert len(stage_report_frame(chunk_stages)) == len(stages)
+
+
+def test_column_resolution_plan_is_cached_per_header():
+    from data_cleaning import column_resolution_plan, get_structure_profile, _column_has_data
+
+    profile = get_structure_profile("Assertiva")
+    df = _assertiva_df()
+    plan = column_resolution_plan(profile, df.columns)
+    assert dict(plan["candidates"])["Bairro"] == ["BAIRRO"]
+    assert column_resolution_plan(profile, list(df.columns)) is plan
+    assert column_resolution_plan(profile, df.columns[::-1]) is not plan
+
+    # Mesma regra de antes: só textos vazios/em branco contam como coluna vazia
+    assert not _column_has_data(pd.Series(["", "  "] * 300))
+    assert _column_has_data(pd.Series([""] * 300 + ["x"]))
+    assert _column_has_data(pd.Series([None, ""], dtype=object))
+
+
+def test_fuzzy_dedup_collapses_or_flags_razao_logradouro_variants():
+    from data_cleaning import build_structure_profile
+    from fuzzy_dedup import FUZZY_DUPLICATE_COL
+
+    df = pd.DataFrame({
+        "Razao": ["AUTO PECAS SILVA LTDA", "Auto Peças Silva Ltda.", "AUTO PECAS SOUZA", "AUTO PECAS SILVA LTDA"],
+        "Logradouro": ["R. X, 10", "Rua X 10", "Rua X 10", "Rua X 10"],
+        "BAIRRO": ["CENTRO", "Centro", "CENTRO", "JARDIM"],
+        "CIDADE": ["CAMPO GRANDE"] * 4,
+        "CEP": ["79000-000", "", "79000000", "79100000"],
+    })
+    essential = ["Razao", "Logradouro", "Bairro", "Cidade", "CEP"]
+
+    collapsed, _, _ = clean_and_filter_data(df, essential, profile=build_structure_profile("Teste", essential))
+    # A segunda linha só difere na grafia; a última está em outro bloco (CEP e bairro diferentes)
+    assert sorted(collapsed["Razao"]) == ["AUTO PECAS SILVA LTDA", "AUTO PECAS SILVA LTDA", "AUTO PECAS SOUZA"]
+
+    flagged, _, _ = clean_and_filter_data(df, essential, profile=build_structure_profile("Teste", essential, fuzzy_dedup="flag"))
+    assert len(flagged) == 4
+    grupos = dict(zip(flagged["Razao"] + "|" + flagged["Bairro"], flagged[FUZZY_DUPLICATE_COL]))
+    assert grupos["AUTO PECAS SILVA LTDA|CENTRO"] == grupos["Auto Peças Silva Ltda.|Centro"] == "1"
+    assert grupos["AUTO PECAS SOUZA|CENTRO"] == ""
+
+    exact, _, _ = clean_and_filter_data(df, essential, profile=build_structure_profile("Teste", essential, fuzzy_dedup=None))
+    assert len(exact) == 4
+
+
+def test_fuzzy_dedup_keeps_single_letter_street_names():
+    from data_cleaning import build_structure_profile
+    from fuzzy_dedup import token_key
+
+    df = pd.DataFrame({
+        "Razao": ["MERCADO BOM PRECO"] * 4,
+        "Logradouro": ["Rua A 10", "Rua B 10", "R. A, nº 10", "Rua C S/N"],
+        "BAIRRO": ["CENTRO"] * 4,
+        "CIDADE": ["CAMPO GRANDE"] * 4,
+        "CEP": ["79000000"] * 4,
+    })
+    essential = ["Razao", "Logradouro", "Bairro", "Cidade", "CEP"]
+
+    collapsed, _, _ = clean_and_filter_data(df, essential, profile=build_structure_profile("Teste", essential))
+    # Só "R. A, nº 10" é a mesma loja da "Rua A 10"; a "Rua B 10" fica no mesmo CEP, mas é outra
+    assert collapsed["Logradouro"].tolist() == ["Rua A 10", "Rua B 10", "Rua C S/N"]
+    assert token_key("Rua C S/N") == token_key("Rua C SN") == "C RUA"
+    assert token_key("AUTO PECAS SILVA S.A.") == token_key("Auto Pecas Silva SA")
+
+def test_cpf_and_cnpj_check_digit_masks():
+    from data_cleaning import valid_cpf_mask, valid_cnpj_mask
+
+    cpfs = pd.Series(["529.982.247-25", "52998224726", "111.111.111-11", "5299822472", None, ""])
+    assert valid_cpf_mask(cpfs).tolist() == [True, False, False, False, False, False]
+    cnpjs = pd.Series(["11.222.333/0001-81", "11222333000182", "00000000000000", None])
+    assert valid_cnpj_mask(cnpjs).tolist() == [True, False, False, False]
+    # Colunas numéricas perdem os zeros à esquerda
+    assert valid_cnpj_mask(pd.Series([11222333000181.0, 191.0])).tolist() == [True, True]
+    # Dígitos não ASCII (fullwidth, arábico-índicos) não quebram a validação: a linha é inválida
+    outros_digitos = pd.Series(["５２９９８２２４７２５", "529.982.247-2５", "٥٢٩٩٨٢٢٤٧٢٥", "529.982.247-25"])
+    assert valid_cpf_mask(outros_digitos).tolist() == [False, False, False, True]
+
+
+def test_cnpj_dedup_key_only_merges_valid_cnpjs():
+    df = pd.DataFrame({
+        "Razao": ["A", "A FILIAL", "B", "C"],
+        "CNPJ": ["11.222.333/0001-81", "11222333000181", "00000000000000", "00000000000000"],
+    })
+    df_final, _, _ = clean_and_filter_data(df, ["Razao", "CNPJ"])
+    # O CNPJ válido repetido é removido; os inválidos não identificam a empresa e ficam
+    assert df_final["Razao"].tolist() == ["A", "B", "C"]
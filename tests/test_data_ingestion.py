@@ -0,0 +1,168 @@
+import sys
+import os
+import io
+import pandas as pd
+
+# Ensure project root is on sys.path so tests can import modules from repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from data_ingestion import load_data
+
+
+class _Upload(io.BytesIO):
+    """Imita o UploadedFile do Streamlit (BytesIO com atributo `name`)."""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+def _lemit_csv(rows=10):
+    lines = ["NOME;Whats;CEL;DDD;FONE"]
+    for i in range(rows):
+        lines.append(f"CLIENTE {i};;;67;99{i:07d}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def test_load_data_csv_detects_lemit():
+    df, structure_type, err = load_data(_Upload(_lemit_csv(), "lista.csv"))
+    assert err is None
+    assert structure_type == "Lemit"
+    assert len(df) == 10
+
+
+def test_load_data_chunked_yields_bounded_chunks():
+    chunks, structure_type, err = load_data(_Upload(_lemit_csv(25), "lista.csv"), chunksize=10)
+    assert err is None
+    assert structure_type == "Lemit"
+    sizes = [len(c) for c in chunks]
+    assert sizes == [10, 10, 5]
+
+
+def test_detect_encoding_samples_and_caches():
+    from data_ingestion import detect_encoding, content_hash, _ENCODING_CACHE
+
+    utf8_data = ("NOME;CIDADE\nJOÃO;SÃO PAULO\n" * 20000).encode("utf-8")
+    assert detect_encoding(utf8_data) == "utf-8"
+
+    cp1252_data = ("NOME;CIDADE\nJOÃO;SÃO PAULO\n" * 20000).encode("cp1252")
+    assert detect_encoding(cp1252_data) in ("cp1252", "latin-1")
+    assert content_hash(cp1252_data) in _ENCODING_CACHE
+
+
+def test_read_xlsx_smart_records_engine_timings():
+    from data_ingestion import read_xlsx_smart, get_xlsx_engine_timings, select_xlsx_engines
+
+    buffer = io.BytesIO()
+    pd.DataFrame({"NOME": ["A", "B"], "Whats": ["67991234567", "67998765432"]}).to_excel(buffer, index=False)
+    upload = _Upload(buffer.getvalue(), "lista.xlsx")
+
+    df, err = read_xlsx_smart(upload)
+    assert err is None
+    assert df["NOME"].tolist() == ["A", "B"]
+    last = get_xlsx_engine_timings()[-1]
+    assert last["ok"] and last["rows"] == 2
+    # Arquivos pequenos sempre tentam o openpyxl primeiro
+    assert last["engine"] == select_xlsx_engines(upload.size)[0] == "openpyxl"
+
+
+def test_peek_header_and_projected_load():
+    from data_ingestion import peek_header
+
+    data = _lemit_csv(30)
+    df_header, err = peek_header(_Upload(data, "lista.csv"))
+    assert err is None
+    assert df_header.columns.tolist() == ["NOME", "Whats", "CEL", "DDD", "FONE"]
+    assert df_header.empty
+
+    df, structure_type, err = load_data(_Upload(data, "lista.csv"), usecols=["FONE", "NOME"])
+    assert err is None
+    # A estrutura é detectada pelo cabeçalho completo, mesmo com a carga projetada
+    assert structure_type == "Lemit"
+    assert df.columns.tolist() == ["NOME", "FONE"]
+    assert len(df) == 30
+
+    buffer = io.BytesIO()
+    pd.DataFrame({"NOME": ["A", "B"], "Whats": ["1", "2"], "Extra": [1, 2]}).to_excel(buffer, index=False)
+    df, _, err = load_data(_Upload(buffer.getvalue(), "lista.xlsx"), usecols=["Whats"])
+    assert err is None
+    assert df.columns.tolist() == ["Whats"]
+
+
+def test_load_many_merges_files_with_provenance(tmp_path):
+    from data_ingestion import SOURCE_FILE_COL
+
+    (tmp_path / "bairro_a.csv").write_bytes(b"NOME;Whats\nANA;67991234567\nBIA;67991234568\n")
+    (tmp_path / "bairro_b.csv").write_bytes(b"Nome;WHATS;Extra\nCAIO;67991234569;x\n")
+    (tmp_path / "notas.txt").write_bytes(b"ignorado")
+
+    df, _, err = load_data(str(tmp_path))
+    assert err is None
+    assert df.columns.tolist() == ["NOME", "Whats", "Extra", SOURCE_FILE_COL]
+    assert df["NOME"].tolist() == ["ANA", "BIA", "CAIO"]
+    assert df[SOURCE_FILE_COL].tolist() == ["bairro_a.csv", "bairro_a.csv", "bairro_b.csv"]
+
+    uploads = [_Upload((tmp_path / f).read_bytes(), f) for f in ("bairro_a.csv", "bairro_b.csv")]
+    df_proj, _, err = load_data(uploads, usecols=["NOME"])
+    assert err is None
+    assert df_proj.columns.tolist() == ["NOME", SOURCE_FILE_COL]
+
+
+def test_load_data_arrow_path_and_bad_lines_fallback():
+    from data_ingestion import ARROW_STRING_DTYPE
+
+    data = b"NOME;DATA;CEP\nANA;2024-01-31;79800000\nBIA;;79800001\n"
+    df, _, err = load_data(_Upload(data, "lista.csv"), arrow=True)
+    assert err is None
+    assert df["NOME"].dtype == ARROW_STRING_DTYPE
+    # Datas continuam como texto, como no engine C
+    assert df["DATA"].iloc[0] == "2024-01-31"
+    assert df["CEP"].tolist() == [79800000, 79800001]
+
+    bad = b"NOME;CEP\nANA;79800000\nBIA;79800001;EXTRA\nCAIO;79800002\n"
+    df_bad, _, err = load_data(_Upload(bad, "lista.csv"), arrow=True)
+    assert err is None
+    assert df_bad["NOME"].dtype == ARROW_STRING_DTYPE
+    assert df_bad["NOME"].tolist() == ["ANA", "CAIO"]
+
+
+def test_load_data_reads_single_buffer_without_rewinding(tmp_path):
+    # Upload com a posição no fim (já consumido): o conteúdo vem do buffer, não de read()/seek(0)
+    upload = _Upload(_lemit_csv(30), "lista.csv")
+    upload.seek(0, io.SEEK_END)
+    df, structure_type, err = load_data(upload, usecols=["NOME", "FONE"], arrow=True)
+    assert err is None
+    assert structure_type == "Lemit"
+    assert len(df) == 30
+    upload.close()  # falharia (BufferError) se o buffer não tivesse sido liberado
+
+    # Caminho em disco: o arquivo é mapeado em memória
+    path = tmp_path / "lista.csv"
+    path.write_bytes("NOME;Whats;CEL;DDD;FONE\nJOSÉ;;;67;991234567\n".encode("cp1252"))
+    chunks, structure_type, err = load_data(str(path), chunksize=1)
+    assert err is None
+    assert [c["NOME"].iloc[0] for c in chunks] == ["JOSÉ"]
+
+
+def test_iter_csv_chunks_falls_back_to_latin1_without_losing_rows():
+    from data_ingestion import iter_csv_chunks
+    # Arquivo grande o bastante para o encoding ser detectado por amostras (utf-8), com um
+    # byte latin-1 fora delas, campos entre aspas com quebra de linha e uma linha inválida
+    lines = ["NOME;OBS"]
+    for i in range(80000):
+        lines.append(f'CLIENTE {i};"linha 1\nlinha 2"' if i % 7 == 0 else f"CLIENTE {i};ok")
+    lines.insert(10, "LINHA;COM;CAMPOS;DEMAIS")
+    data = ("\n".join(lines[:30000]) + "\n").encode("utf-8")
+    data += "CAFÉ;ção\n".encode("latin-1")
+    data += ("\n".join(lines[30000:]) + "\n").encode("utf-8")
+    assert 64 * 1024 < data.index("CAF".encode()) < (len(data) - 64 * 1024) // 2
+
+    chunks, err = iter_csv_chunks(_Upload(data, "lista.csv"), chunksize=5000)
+    assert err is None
+    df = pd.concat(list(chunks))
+    assert len(df) == 80001
+    assert df.index.equals(pd.RangeIndex(80001))
+    assert df["NOME"].tolist().count("CAFÉ") == 1
+    assert df.iloc[-1]["NOME"] == "CLIENTE 79999"
+    assert df["OBS"].str.contains("\n").sum() == len(range(0, 80000, 7))
@@ -0,0 +1,31 @@
+import sys
+import os
+from datetime import date
+
+# Ensure project root is on sys.path so tests can import modules from repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lead_distribution import datas_uteis, plano_distribuicao, lotes_do_plano
+from utils import proximo_dia_util
+
+
+def test_plano_distribuicao_rodizio():
+    plano = plano_distribuicao(11, 3, 2, date(2026, 10, 16))
+    # Lotes de 2 em rodízio entre 3 consultores; o ciclo avança após cada rodada
+    assert plano["consultor"].tolist() == [0, 0, 1, 1, 2, 2, 0, 0, 1, 1, 2]
+    assert plano["ciclo"].tolist() == [0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1]
+
+    lotes = lotes_do_plano(plano)
+    assert lotes["inicio"].tolist() == [0, 2, 4, 6, 8, 10]
+    assert lotes["fim"].tolist() == [2, 4, 6, 8, 10, 11]
+    # Sexta-feira, depois segunda-feira
+    assert lotes["data"].tolist() == [date(2026, 10, 16)] * 3 + [date(2026, 10, 19)] * 3
+
+
+def test_datas_uteis_como_proximo_dia_util():
+    for dia in range(10, 17):
+        inicio = date(2026, 10, dia)
+        esperado = [inicio]
+        for _ in range(9):
+            esperado.append(proximo_dia_util(esperado[-1]))
+        assert datas_uteis(inicio, range(10)).astype('datetime64[D]').astype(object).tolist() == esperado
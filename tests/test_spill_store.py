@@ -0,0 +1,40 @@
+import sys
+import os
+import time
+import pandas as pd
+
+# Ensure project root is on sys.path so tests can import modules from repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from spill_store import spill_dataframe, load_spilled, drop_spilled, evict_spill_store
+
+
+def test_spill_is_isolated_per_session(tmp_path):
+    spill_dataframe(pd.DataFrame({"a": [1, 2]}), "lote", session_id="s1", spill_dir=str(tmp_path))
+    spill_dataframe(pd.DataFrame({"a": [3]}), "lote", session_id="s2", spill_dir=str(tmp_path))
+
+    df1, err = load_spilled("lote", session_id="s1", spill_dir=str(tmp_path))
+    df2, _ = load_spilled("lote", session_id="s2", spill_dir=str(tmp_path))
+    assert err is None
+    assert df1["a"].tolist() == [1, 2]
+    assert df2["a"].tolist() == [3]
+
+    drop_spilled(session_id="s1", spill_dir=str(tmp_path))
+    _, err = load_spilled("lote", session_id="s1", spill_dir=str(tmp_path))
+    assert err is not None
+
+
+def test_evict_spill_store_ttl_and_size(tmp_path):
+    df = pd.DataFrame({"a": range(1000)})
+    old = spill_dataframe(df, "antigo", session_id="velha", spill_dir=str(tmp_path))
+    past = time.time() - 3600
+    os.utime(old, (past, past))
+    evict_spill_store(str(tmp_path), ttl_seconds=60)
+    assert not os.path.exists(os.path.dirname(old))
+
+    first = spill_dataframe(df, "primeiro", session_id="s", spill_dir=str(tmp_path))
+    os.utime(first, (past, past))
+    second = spill_dataframe(df, "segundo", session_id="s", spill_dir=str(tmp_path))
+    evict_spill_store(str(tmp_path), max_bytes=os.path.getsize(second))
+    assert not os.path.exists(first)
+    assert os.path.exists(second)
@@ -0,0 +1,67 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Ensure project root is on sys.path so tests can import modules from repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from suppression_index import filter_suppressed, record_distributed, suppressed_mask
+
+
+def test_distributed_contacts_are_suppressed_across_formats(tmp_path):
+    index_dir = str(tmp_path)
+    distribuido = pd.DataFrame({
+        "SOCIO1Celular1": ["+55 (67) 99999-1111", "+55 (67) 3333-4444"],
+        "CNPJ": ["12.345.678/0001-90", None],
+    })
+    assert record_distributed(distribuido, index_dir=index_dir) == 3
+    # Reenviar os mesmos contatos não altera o índice
+    assert record_distributed(distribuido, index_dir=index_dir) == 0
+
+    novo_upload = pd.DataFrame({
+        "Whats": [67999991111.0, np.nan, 67988887777.0, np.nan],
+        "CEL": ["", "(67) 3333-4444", "", ""],
+        "CNPJ": [np.nan, np.nan, np.nan, 12345678000190.0],
+    })
+    assert suppressed_mask(novo_upload, index_dir=index_dir).tolist() == [True, True, False, True]
+
+    restantes, removidos = filter_suppressed(novo_upload, index_dir=index_dir)
+    assert removidos == 3
+    assert restantes.index.tolist() == [2]
+
+
+def test_suppression_index_grows_by_generation(tmp_path):
+    index_dir = str(tmp_path)
+    rng = np.random.default_rng(0)
+    lote1 = pd.DataFrame({"Whats": rng.integers(67900000000, 67999999999, 5000).astype(str)})
+    lote2 = pd.DataFrame({"Whats": rng.integers(67900000000, 67999999999, 5000).astype(str)})
+    record_distributed(lote1, index_dir=index_dir)
+    assert not suppressed_mask(lote2, index_dir=index_dir).all()
+
+    record_distributed(lote2, index_dir=index_dir)
+    assert suppressed_mask(lote1, index_dir=index_dir).all()
+    assert suppressed_mask(lote2, index_dir=index_dir).all()
+    # A geração anterior fica em disco para leitores que ainda não viram a troca do index.json
+    assert sorted(f for f in os.listdir(index_dir) if f.endswith('.npy')) == ["bloom-1.npy", "bloom-2.npy", "keys-1.npy", "keys-2.npy"]
+
+    record_distributed(pd.DataFrame({"Whats": ["67912345678"]}), index_dir=index_dir)
+    assert sorted(f for f in os.listdir(index_dir) if f.endswith('.npy')) == ["bloom-2.npy", "bloom-3.npy", "keys-2.npy", "keys-3.npy"]
+
+
+def test_stale_reader_retries_with_current_generation(tmp_path, monkeypatch):
+    import suppression_index
+
+    index_dir = str(tmp_path)
+    record_distributed(pd.DataFrame({"Whats": ["67911111111"]}), index_dir=index_dir)
+    stale_meta = suppression_index._read_meta(index_dir)
+    record_distributed(pd.DataFrame({"Whats": ["67922222222"]}), index_dir=index_dir)
+    record_distributed(pd.DataFrame({"Whats": ["67933333333"]}), index_dir=index_dir)
+    suppression_index._LOADED.clear()
+
+    # Um leitor em outro processo leu o index.json da geração 1, já apagada do disco
+    metas = [stale_meta]
+    read_meta = suppression_index._read_meta
+    monkeypatch.setattr(suppression_index, "_read_meta", lambda d: metas.pop() if metas else read_meta(d))
+    leads = pd.DataFrame({"Whats": ["67911111111", "67933333333", "67944444444"]})
+    assert suppressed_mask(leads, index_dir=index_dir).tolist() == [True, True, False]
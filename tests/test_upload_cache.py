@@ -0,0 +1,85 @@
+import sys
+import os
+import io
+import pandas as pd
+
+# Ensure project root is on sys.path so tests can import modules from repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import upload_cache
+from upload_cache import load_data_cached, evict_cache
+
+
+class _Upload(io.BytesIO):
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def _csv(rows):
+    return ("NOME;Whats;CEL;DDD;FONE\n" + "".join(f"CLIENTE {i};;;67;99{i:07d}\n" for i in range(rows))).encode("utf-8")
+
+
+def test_load_data_cached_hits_on_same_content(tmp_path, monkeypatch):
+    calls = []
+    original = upload_cache.load_data
+
+    def _counting_load(*args, **kwargs):
+        calls.append(1)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(upload_cache, "load_data", _counting_load)
+    cache_dir = str(tmp_path)
+
+    df1, st1, err1 = load_data_cached(_Upload(_csv(20), "a.csv"), cache_dir=cache_dir)
+    df2, st2, err2 = load_data_cached(_Upload(_csv(20), "b.csv"), cache_dir=cache_dir)
+    assert err1 is None and err2 is None
+    assert st1 == st2 == "Lemit"
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(df1, df2)
+
+    chunks, _, _ = load_data_cached(_Upload(_csv(20), "c.csv"), cache_dir=cache_dir, chunksize=8)
+    assert [len(c) for c in chunks] == [8, 8, 4]
+    assert len(calls) == 1
+
+
+def test_evict_cache_respects_size_limit(tmp_path):
+    cache_dir = str(tmp_path)
+    for i in range(3):
+        load_data_cached(_Upload(_csv(100 + i), f"{i}.csv"), cache_dir=cache_dir)
+    evict_cache(cache_dir, max_bytes=0)
+    assert not [f for f in os.listdir(cache_dir) if f.endswith(".parquet")]
+
+
+def test_load_data_cached_projection_reuses_full_entry(tmp_path):
+    cache_dir = str(tmp_path)
+    load_data_cached(_Upload(_csv(20), "a.csv"), cache_dir=cache_dir)
+    df, structure_type, err = load_data_cached(_Upload(_csv(20), "a.csv"), usecols=["FONE", "NOME"], cache_dir=cache_dir)
+    assert err is None
+    assert structure_type == "Lemit"
+    assert df.columns.tolist() == ["NOME", "FONE"]
+
+
+def test_cached_load_equals_uncached_load(tmp_path):
+    cache_dir = str(tmp_path)
+    df = pd.DataFrame({
+        "NOME": ["ANA", None, "CAIO"],
+        "CEP": [79000000, "79.000-001", None],
+        "Numero": [10, 20, 30],
+        "Complemento": [None, None, None],
+    })
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    data = buffer.getvalue()
+
+    miss, _, err = load_data_cached(_Upload(data, "a.xlsx"), cache_dir=cache_dir)
+    assert err is None
+    # A coluna com tipos misturados também entra no cache
+    assert [f for f in os.listdir(cache_dir) if f.endswith(".parquet")]
+    hit, _, _ = load_data_cached(_Upload(data, "a.xlsx"), cache_dir=cache_dir)
+    pd.testing.assert_frame_equal(hit, miss)
+    assert miss["NOME"].isna().tolist() == [False, True, False]
+    assert miss["CEP"].tolist()[:2] == ["79000000", "79.000-001"]
+
+    chunks, _, _ = load_data_cached(_Upload(data, "a.xlsx"), cache_dir=cache_dir, chunksize=2)
+    pd.testing.assert_frame_equal(pd.concat(list(chunks)), miss)
@@ -5,7 +5,14 @@ import pytest
 # Ensure project root is on sys.path so tests can import modules from repository
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from report_generator import clean_phone_number, normalize_cep, best_match_column
+import io
+import zipfile
+import numpy as np
+import pandas as pd
+from datetime import date
+
+import report_generator
+from report_generator import clean_phone_number, normalize_cep, best_match_column, montar_linhas_pessoas, COLUNAS_PESSOAS_AGENDOR, montar_linhas_negocios, COLUNAS_NEGOCIOS, criar_handoff_pessoas, lotes_do_handoff, linhas_do_handoff, consultores_do_handoff, _nome_arquivo_unico
 
 
 def test_clean_phone_number_basic():
@@ -35,3 +42,130 @@ def test_best_match_column():
     # whatsapp detection
     bestw = best_match_column(cols, ["Whats", "WhatsApp", "Telefone"])
     assert bestw.lower().startswith('wh') or 'telefone' in bestw.lower() or bestw in cols
+
+
+def _linhas_pessoas_por_linha(df_lote, consultor_formatado, default_cargo, default_descricao, default_uf):
+    # Laço por linha que a montagem colunar substituiu
+    dados_finais = []
+    for _, row in df_lote.iterrows():
+        whatsapp_val = row.get("Whats")
+        whatsapp_str = f"+55{str(whatsapp_val).strip()}" if whatsapp_val and pd.notna(whatsapp_val) and str(whatsapp_val).strip() else ""
+        celular_val = row.get("CEL")
+        celular_str = str(celular_val) if celular_val and pd.notna(celular_val) else ""
+        descricao_val = default_descricao.strip() if default_descricao and str(default_descricao).strip() else None
+        if not descricao_val:
+            descricao_val = row.get("Razao Social") or row.get("Fantasia") or row.get("Empresa") or ""
+        cep_val = ""
+        if "CEP" in row and pd.notna(row.get("CEP")):
+            cep_val = normalize_cep(row.get("CEP"))
+        linha = {col: "" for col in COLUNAS_PESSOAS_AGENDOR}
+        linha.update({
+            "Nome": row.get("NOME", ""), "Cargo": default_cargo, "Usuário responsável": consultor_formatado,
+            "Categoria": "Lead", "Origem": "Reobote", "Descrição": descricao_val, "WhatsApp": whatsapp_str,
+            "Celular": celular_str, "Estado": default_uf, "Cidade": row.get("Cidade", ""),
+            "Bairro": row.get("Bairro", ""), "Rua": row.get("Rua", ""), "Número": row.get("Número", ""),
+            "Complemento": row.get("Complemento", ""), "CEP": cep_val,
+        })
+        dados_finais.append(linha)
+    return pd.DataFrame(dados_finais, columns=COLUNAS_PESSOAS_AGENDOR)
+
+
+def test_montar_linhas_pessoas_igual_ao_laco_por_linha():
+    df = pd.DataFrame({
+        "NOME": ["Ana", "Bruno", "Carla", "Davi"],
+        "Whats": ["67999991111", " 67988887777 ", "", np.nan],
+        "CEL": ["6733334444", "", "", "67911112222"],
+        "Razao Social": ["ANA ME", "", np.nan, None],
+        "Fantasia": ["", "BRUNO PECAS", "", None],
+        "CEP": ["79.800-000", np.nan, 79800000.0, "123"],
+        "Número": [10, 20, 30, 40],
+        "Cidade": ["Dourados", "Campo Grande", None, "Maracaju"],
+    }, index=[3, 5, 8, 9])
+    for descricao in ["", "  Lista de outubro "]:
+        esperado = _linhas_pessoas_por_linha(df, "ana.souza", "Lead Automovel", descricao, "MS")
+        obtido = montar_linhas_pessoas(df, "ana.souza", "Lead Automovel", descricao, "MS")
+        pd.testing.assert_frame_equal(obtido, esperado)
+
+    # Vários lotes de uma vez: usuário por linha
+    usuarios = np.array(["a.x", "a.x", "b.y", "b.y"], dtype=object)
+    obtido = montar_linhas_pessoas(df, usuarios, "Lead", "", "MS")
+    assert obtido["Usuário responsável"].tolist() == usuarios.tolist()
+
+
+def test_montar_linhas_negocios_igual_ao_laco_por_linha():
+    nomes = pd.Series(["Ana", "Bruno", np.nan], index=[4, 7, 9])
+    whatsapp = pd.Series(["67999991111", np.nan, "6733334444"], index=[4, 7, 9])
+    data_arquivo = date(2026, 10, 19)
+    esperado = []
+    for nome, whats in zip(nomes, whatsapp):
+        # Linha montada como no antigo laço por linha
+        whats = str(whats) if pd.notna(whats) else ""
+        esperado.append({
+            "Título do negócio": f"10/26 - RB - AUTO CG - {nome}/ESPs", "Empresa relacionada": "",
+            "Pessoa relacionada": nome, "Usuário responsável": "ana.souza", "Data de início": "19/10/2026",
+            "Data de conclusão": f"+55{whats}" if whats else "", "Valor Total": "", "Funil": "Funil de Vendas",
+            "Etapa": "Prospecção", "Status": "Em andamento", "Motivo de perda": "",
+            "Descrição do motivo de perda": "", "Ranking": "", "Descrição": "", "Produtos e Serviços": "",
+        })
+    obtido = montar_linhas_negocios(nomes, "ana.souza", whatsapp, data_arquivo, "auto", "cg")
+    pd.testing.assert_frame_equal(obtido, pd.DataFrame(esperado, columns=COLUNAS_NEGOCIOS))
+
+
+def test_handoff_pessoas_lotes_do_manifesto():
+    leads = pd.DataFrame({"NOME": ["Ana", "Bruno", "Carla"], "Whats": ["67999991111", "67988887777", "67977776666"]})
+    pessoas = montar_linhas_pessoas(leads, np.array(["ana.souza", "ana.souza", "bia.lima"], dtype=object), "Lead", "", "MS")
+    handoff = criar_handoff_pessoas(pessoas, [
+        {"arquivo": "PESSOAS_AUTO_ANA.xlsx", "consultor": "Ana Souza", "equipe": "Equipe 1", "data": date(2026, 10, 19), "lote": 0, "inicio": 0, "fim": 2},
+        {"arquivo": "PESSOAS_AUTO_BIA.xlsx", "consultor": "Bia Lima", "equipe": "Outros", "data": date(2026, 10, 19), "lote": 1, "inicio": 2, "fim": 3},
+    ])
+    assert handoff["manifesto"]["lote"].dtype == np.int64
+    lotes = [(entrada.consultor, lote["Nome"].tolist()) for entrada, lote in lotes_do_handoff(handoff)]
+    assert lotes == [("Ana Souza", ["Ana", "Bruno"]), ("Bia Lima", ["Carla"])]
+    assert linhas_do_handoff(handoff).tolist() == [0, 1, 2]
+
+
+def test_nome_arquivo_unico_por_lote():
+    usados = {"PESSOAS_AUTO_ANA_19-10-2026.xlsx": b"", "PESSOAS_AUTO_ANA_19-10-2026_2.xlsx": b""}
+    assert _nome_arquivo_unico("PESSOAS_AUTO_BIA_19-10-2026", ".xlsx", usados) == "PESSOAS_AUTO_BIA_19-10-2026.xlsx"
+    assert _nome_arquivo_unico("PESSOAS_AUTO_ANA_19-10-2026", ".xlsx", usados) == "PESSOAS_AUTO_ANA_19-10-2026_3.xlsx"
+
+
+def _handoff_alternado(total=12, por_lote=3):
+    # Pessoas de `total` leads em lotes de `por_lote`, alternando entre Ana e Bia (vários lotes por consultor)
+    nomes = [f"Lead {i}" for i in range(total)]
+    leads = pd.DataFrame({"NOME": nomes, "Whats": [f"6799999{i:04d}" for i in range(total)]})
+    consultores = ["Ana Souza", "Bia Lima"]
+    lotes = []
+    for lote, inicio in enumerate(range(0, total, por_lote)):
+        consultor = consultores[lote % 2]
+        lotes.append({"arquivo": f"PESSOAS_AUTO_{consultor.split()[0].upper()}_{lote}.xlsx", "consultor": consultor, "equipe": "Outros",
+                      "data": date(2026, 10, 19), "lote": lote, "inicio": inicio, "fim": min(inicio + por_lote, total)})
+    usuarios = np.array([lotes[i // por_lote]["consultor"].lower().replace(" ", ".") for i in range(total)], dtype=object)
+    return criar_handoff_pessoas(montar_linhas_pessoas(leads, usuarios, "Lead", "", "MS"), lotes), nomes
+
+
+def test_consultores_do_handoff_junta_os_lotes_de_cada_consultor():
+    handoff, nomes = _handoff_alternado()
+    por_consultor = [(consultor, pessoas["Nome"].tolist()) for consultor, pessoas in consultores_do_handoff(handoff)]
+    assert por_consultor == [
+        ("Ana Souza", nomes[0:3] + nomes[6:9]),
+        ("Bia Lima", nomes[3:6] + nomes[9:12]),
+    ]
+
+
+def test_negocios_do_handoff_recebe_todos_os_leads(monkeypatch):
+    handoff, nomes = _handoff_alternado()
+    downloads = []
+    monkeypatch.setattr(report_generator.st, "download_button", lambda *args, **kwargs: downloads.append(kwargs["data"]))
+    report_generator.processar_e_gerar_negocios(3, date(2026, 10, 19), "auto", "", handoff=handoff)
+
+    with zipfile.ZipFile(io.BytesIO(downloads[-1])) as zf:
+        arquivos = {nome: pd.read_excel(io.BytesIO(zf.read(nome))) for nome in zf.namelist()}
+    # Dois lotes de Pessoas por consultor viram dois dias de Negócios, sem sobrescrever arquivos
+    assert sorted(arquivos) == [
+        "NEGOCIOS_ANA_AUTO_19-10-2026.xlsx", "NEGOCIOS_ANA_AUTO_20-10-2026.xlsx",
+        "NEGOCIOS_BIA_AUTO_19-10-2026.xlsx", "NEGOCIOS_BIA_AUTO_20-10-2026.xlsx",
+    ]
+    recebidos = pd.concat(arquivos.values())["Pessoa relacionada"].tolist()
+    assert sorted(recebidos) == sorted(nomes)
+    assert arquivos["NEGOCIOS_ANA_AUTO_20-10-2026.xlsx"]["Pessoa relacionada"].tolist() == nomes[6:9]
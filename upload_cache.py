@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_ingestion import load_data, content_hash, profile_usecols, _upload_buffer, PROFILE_USECOLS
+
+# Cache em disco dos DataFrames já parseados, indexado pelo hash do conteúdo do upload.
+# Cada entrada é um arquivo Parquet (<hash>.parquet) + um JSON com metadados (<hash>.json).
+UPLOAD_CACHE_DIR = os.path.join('.cache', 'uploads')
+UPLOAD_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Incrementar quando a forma de parsear os arquivos mudar, invalidando entradas antigas
+UPLOAD_CACHE_VERSION = 2
+
+
+def _entry_paths(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.parquet"), os.path.join(cache_dir, f"{key}.json")
+
+
+def _upload_hash(file_input):
+    """Hash do conteúdo de um UploadedFile, objeto file-like ou caminho, sem copiar o buffer."""
+    with _upload_buffer(file_input) as view:
+        if view is None:
+            return None
+        return content_hash(view)
+
+
+def upload_cache_key(file_input):
+    """Calcula a chave do cache (hash do conteúdo) de um upload, ou None se ilegível.
+
+    Para uma lista de uploads, a chave combina o nome e o conteúdo de cada arquivo
+    (o nome entra porque vira a coluna de origem no DataFrame unificado).
+    """
+    if isinstance(file_input, (list, tuple)):
+        parts = []
+        for f in file_input:
+            digest = _upload_hash(f)
+            if digest is None:
+                return None
+            parts.append(f"{getattr(f, 'name', f)}:{digest}")
+        return f"v{UPLOAD_CACHE_VERSION}-m{content_hash('|'.join(parts).encode('utf-8'))}"
+    digest = _upload_hash(file_input)
+    if digest is None:
+        return None
+    return f"v{UPLOAD_CACHE_VERSION}-{digest}"
+
+
+def evict_cache(cache_dir=UPLOAD_CACHE_DIR, max_bytes=UPLOAD_CACHE_MAX_BYTES):
+    """Remove as entradas menos usadas recentemente até o cache caber em `max_bytes`."""
+    try:
+        entries = [e for e in os.scandir(cache_dir) if e.is_file() and e.name.endswith('.parquet')]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    total = sum(e.stat().st_size for e in entries)
+    for entry in entries:
+        if total <= max_bytes:
+            break
+        key = entry.name[:-len('.parquet')]
+        size = entry.stat().st_size
+        for path in _entry_paths(key, cache_dir):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+        logging.info(f"[UPLOAD_CACHE] Entrada {key} removida do cache ({size} bytes).")
+
+
+def _object_columns(df):
+    return [col for col in df.columns if df[col].dtype == object]
+
+
+def _normalize_objects(df):
+    """Deixa as colunas object representáveis no Parquet sem mudar o resultado da leitura.
+
+    Nulos viram NaN (o Parquet os devolveria como None) e colunas com tipos misturados
+    (comuns em XLSX: números e textos na mesma coluna) viram texto, com os nulos mantidos.
+    A carga sem cache passa pela mesma normalização, então cache hit e miss são iguais.
+    """
+    for col in _object_columns(df):
+        notna = df[col].notna().to_numpy()
+        mixed = pd.api.types.infer_dtype(df[col], skipna=True).startswith('mixed')
+        if notna.all() and not mixed:
+            continue
+        values = df[col].to_numpy(dtype=object).copy()
+        if mixed:
+            values[notna] = [str(v) for v in values[notna]]
+        values[~notna] = np.nan
+        df[col] = values
+    return df
+
+
+def _restore_objects(df, object_columns):
+    """Desfaz as conversões do Parquet nas colunas que eram object (ex: None -> NaN, int64 -> object)."""
+    for col in object_columns:
+        if col in df.columns:
+            values = df[col].astype(object)
+            df[col] = values.where(values.notna(), np.nan)
+    return df
+
+
+def _projection_key(key, usecols):
+    """Chave da entrada que guarda apenas as colunas `usecols` de um upload."""
+    return f"{key}-p{content_hash(json.dumps(sorted(map(str, usecols))).encode('utf-8'))[:12]}"
+
+
+def get_cached_upload(key, cache_dir=UPLOAD_CACHE_DIR, chunksize=None, columns=None):
+    """Retorna (df, structure_type) do cache, ou None se a chave não estiver presente.
+
+    Com `chunksize`, o primeiro valor é um gerador de DataFrames lidos em lotes do Parquet.
+    Com `columns`, apenas essas colunas são lidas (na ordem do arquivo original).
+    """
+    data_path, meta_path = _entry_paths(key, cache_dir)
+    if not os.path.exists(data_path) or not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        now = time.time()
+        os.utime(data_path, (now, now)) # Marca como usado recentemente (LRU)
+        object_columns = meta.get("object_columns", [])
+        if columns is not None:
+            wanted = set(columns)
+            columns = [c for c in pq.read_schema(data_path).names if c in wanted]
+        if chunksize:
+            parquet_file = pq.ParquetFile(data_path)
+
+            def _generate():
+                start = 0
+                for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+                    chunk = _restore_objects(batch.to_pandas(), object_columns)
+                    chunk.index = pd.RangeIndex(start, start + len(chunk))
+                    start += len(chunk)
+                    yield chunk
+
+            return _generate(), meta.get("structure_type")
+        return _restore_objects(pd.read_parquet(data_path, columns=columns), object_columns), meta.get("structure_type")
+    except Exception as e:
+        logging.warning(f"[UPLOAD_CACHE] Falha ao ler a entrada {key}: {e}")
+        return None
+
+
+def _write_meta(meta_path, structure_type, rows, object_columns):
+    tmp_meta = meta_path + ".tmp"
+    with open(tmp_meta, 'w', encoding='utf-8') as f:
+        json.dump({"structure_type": structure_type, "rows": rows, "object_columns": [str(c) for c in object_columns], "created": time.time()}, f)
+    os.replace(tmp_meta, meta_path)
+
+
+def put_cached_upload(key, df, structure_type, cache_dir=UPLOAD_CACHE_DIR, max_bytes=UPLOAD_CACHE_MAX_BYTES):
+    """Grava o DataFrame parseado no cache. Falhas de serialização apenas desativam o cache.
+
+    O DataFrame já deve ter passado por `_normalize_objects`.
+    """
+    data_path, meta_path = _entry_paths(key, cache_dir)
+    tmp_data = data_path + ".tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        df.to_parquet(tmp_data, index=False)
+        os.replace(tmp_data, data_path)
+        _write_meta(meta_path, structure_type, len(df), _object_columns(df))
+    except Exception as e:
+        logging.warning(f"[UPLOAD_CACHE] DataFrame não pôde ser gravado no cache ({key}): {e}")
+        if os.path.exists(tmp_data):
+            os.remove(tmp_data)
+        return False
+    evict_cache(cache_dir, max_bytes)
+    return True
+
+
+def _write_through_chunks(key, chunks, structure_type, cache_dir, max_bytes):
+    """Repassa os blocos ao consumidor enquanto os grava no cache em um único Parquet."""
+    data_path, meta_path = _entry_paths(key, cache_dir)
+    tmp_data = data_path + ".tmp"
+    writer = None
+    rows = 0
+    object_columns = []
+    caching = True
+    completed = False
+    try:
+        for chunk in chunks:
+            chunk = _normalize_objects(chunk)
+            if caching:
+                try:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        os.makedirs(cache_dir, exist_ok=True)
+                        writer = pq.ParquetWriter(tmp_data, table.schema)
+                    elif table.schema != writer.schema:
+                        table = table.cast(writer.schema)
+                    writer.write_table(table)
+                    rows += len(chunk)
+                    object_columns += [col for col in _object_columns(chunk) if col not in object_columns]
+                except Exception as e:
+                    # Tipos divergentes entre blocos: segue sem cache para este arquivo
+                    logging.info(f"[UPLOAD_CACHE] Gravação em blocos abortada ({key}): {e}")
+                    caching = False
+            yield chunk
+        completed = True
+    finally:
+        if writer is not None:
+            writer.close()
+        # Só publica a entrada se o arquivo foi lido até o fim
+        if completed and caching and writer is not None:
+            os.replace(tmp_data, data_path)
+            _write_meta(meta_path, structure_type, rows, object_columns)
+            evict_cache(cache_dir, max_bytes)
+        elif os.path.exists(tmp_data):
+            os.remove(tmp_data)
+
+
+def load_data_cached(file_input, chunksize=None, usecols=None, arrow=False, cache_dir=UPLOAD_CACHE_DIR, max_bytes=UPLOAD_CACHE_MAX_BYTES):
+    """Versão com cache de `load_data`: mesmo retorno (df, structure_type, err).
+
+    Uploads idênticos (mesmo conteúdo) são servidos do cache em Parquet, evitando
+    reprocessar o arquivo a cada rerun do Streamlit. Cargas projetadas (`usecols`)
+    aproveitam a entrada completa quando ela existe; senão ganham uma entrada própria.
+    """
+    if file_input is None:
+        return load_data(file_input, chunksize=chunksize, usecols=usecols, arrow=arrow)
+
+    if isinstance(usecols, str) and usecols == PROFILE_USECOLS:
+        # Resolve as colunas do perfil pelo cabeçalho, para que a chave de projeção seja estável
+        usecols, err = profile_usecols(file_input)
+        if err:
+            return pd.DataFrame(), None, err
+
+    key = upload_cache_key(file_input)
+    if key is not None and arrow and not chunksize:
+        # Os dtypes (string[pyarrow]) vão para o Parquet, então a entrada é separada
+        key = f"{key}-arrow"
+    if key is not None:
+        cached = get_cached_upload(key, cache_dir, chunksize=chunksize, columns=usecols)
+        if cached is None and usecols is not None:
+            key = _projection_key(key, usecols)
+            cached = get_cached_upload(key, cache_dir, chunksize=chunksize)
+        if cached is not None:
+            df, structure_type = cached
+            print(f"DEBUG: load_data_cached: cache hit {key}")
+            return df, structure_type, None
+
+    df, structure_type, err = load_data(file_input, chunksize=chunksize, usecols=usecols, arrow=arrow)
+    if err is None and key is not None:
+        if chunksize:
+            df = _write_through_chunks(key, df, structure_type, cache_dir, max_bytes)
+        elif not df.empty:
+            df = _normalize_objects(df)
+            put_cached_upload(key, df, structure_type, cache_dir, max_bytes)
+    return df, structure_type, err